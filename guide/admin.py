@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from guide.models import Guide, GuideElement
+from guide.models import (ChangeLog, Guide, GuideCurrentVersion,
+                          GuideElement, Job)
 
 
 @admin.register(Guide)
@@ -11,3 +12,20 @@ class GuideAdmin(admin.ModelAdmin):
 @admin.register(GuideElement)
 class GuideElementAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(GuideCurrentVersion)
+class GuideCurrentVersionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'guide', 'refreshed_on', 'valid_until')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'processed', 'total',
+                    'created_at', 'finished_at')
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('id', 'entity', 'action', 'object_id', 'guide_id',
+                    'created_at')
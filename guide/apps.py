@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GuideConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guide'
+
+    def ready(self):
+        from guide import signals  # noqa: F401
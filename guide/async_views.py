@@ -0,0 +1,158 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from guide.conditional import (aguides_list_stamp, get_not_modified,
+                               guide_stamp, patch_stamp_headers)
+from guide.models import Guide
+from guide.paginators import StandardResultsSetPagination
+from guide.serializers import GuideElementSerializer, GuideSerializer
+from guide.services import (actual_guides, aget_guide_source, aguide_elements,
+                            aresolve_guide, avalidate_elements)
+
+
+class AsyncAPIView(View):
+    """
+    Базовое асинхронное представление API. Отвечает в том же формате, что
+    и представления DRF из guide.views, но обращается к базе данных через
+    асинхронный ORM и не занимает поток под запрос при работе под ASGI.
+    Поддерживается разбивка по номеру страницы.
+    """
+    pagination_class = StandardResultsSetPagination
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Как и APIView, API не использует сессионную аутентификацию
+        view.csrf_exempt = True
+        return view
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status,
+                            content_type=self.renderer.media_type)
+
+    def get_page_size(self):
+        pagination = self.pagination_class
+        try:
+            page_size = int(self.request.GET[
+                pagination.page_size_query_param])
+        except (KeyError, ValueError):
+            return pagination.page_size
+        if page_size <= 0:
+            return pagination.page_size
+        if pagination.max_page_size:
+            return min(page_size, pagination.max_page_size)
+        return page_size
+
+    async def paginate(self, source, serializer_class):
+        """
+        Разбивает queryset source на страницы так же, как
+        PageNumberPagination.
+        """
+        page_size = self.get_page_size()
+        count = await source.acount()
+        page_number = self.request.GET.get(
+            self.pagination_class.page_query_param, 1)
+        try:
+            page_number = int(page_number)
+            if page_number < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            page_number = None
+        last_page = max((count + page_size - 1) // page_size, 1)
+        if page_number is None or page_number > last_page:
+            message = PageNumberPagination.invalid_page_message
+            return self.render({'detail': str(message).format(
+                page_number=self.request.GET.get('page'),
+                message='Invalid page.')}, status=404)
+        offset = (page_number - 1) * page_size
+        page = [obj async for obj in source[offset:offset + page_size]]
+        url = self.request.build_absolute_uri()
+        param = self.pagination_class.page_query_param
+        next_url = previous_url = None
+        if page_number < last_page:
+            next_url = replace_query_param(url, param, page_number + 1)
+        if page_number == 2:
+            previous_url = remove_query_param(url, param)
+        elif page_number > 2:
+            previous_url = replace_query_param(url, param, page_number - 1)
+        return self.render({
+            'count': count,
+            'next': next_url,
+            'previous': previous_url,
+            'results': serializer_class(page, many=True).data,
+        })
+
+
+class AsyncGuideList(AsyncAPIView):
+    """
+    Асинхронное получение списка справочников, см. GuideList.
+    """
+
+    async def get(self, request):
+        date = request.GET.get('date', None)
+        if date == 'actual':
+            date = timezone.localdate()
+        stamp = await aguides_list_stamp(date)
+        response = get_not_modified(request, stamp)
+        if response is not None:
+            return patch_stamp_headers(response, request, stamp)
+        if date is None:
+            queryset = Guide.objects.order_by('id')
+        else:
+            try:
+                queryset = actual_guides(date).order_by('id')
+            except ValidationError as e:
+                return self.render({"error": e.messages}, status=400)
+        response = await self.paginate(queryset, GuideSerializer)
+        if response.status_code != 200:
+            return response
+        return patch_stamp_headers(response, request, stamp)
+
+
+class AsyncGuideElementsList(AsyncAPIView):
+    """
+    Асинхронное получение и проверка элементов заданного справочника,
+    см. GuideElementsList.
+    """
+
+    async def get(self, request):
+        guide_name = request.GET.get('name', None)
+        if guide_name is None:
+            return self.render({"error": "Не указан url-параметр name"},
+                               status=400)
+        version = request.GET.get('version', None)
+        guide = await aresolve_guide(guide_name, version)
+        stamp = guide_stamp(guide, version is not None)
+        if stamp is not None:
+            response = get_not_modified(request, stamp)
+            if response is not None:
+                return patch_stamp_headers(response, request, stamp)
+        source = (await aguide_elements(guide)).order_by('id')
+        response = await self.paginate(source, GuideElementSerializer)
+        if stamp is None or response.status_code != 200:
+            return response
+        return patch_stamp_headers(response, request, stamp)
+
+    async def post(self, request):
+        guide_name = request.GET.get('name', None)
+        if guide_name is None:
+            return self.render({"error": "Не указан url-параметр name"},
+                               status=400)
+        try:
+            data = json.loads(request.body or b'null')
+        except ValueError as e:
+            return self.render(
+                {'detail': f'JSON parse error - {e}'}, status=400)
+        guide = await aget_guide_source(guide_name,
+                                        request.GET.get('version', None))
+        if not isinstance(data, list):
+            data = [data]
+        return self.render(await avalidate_elements(guide, data))
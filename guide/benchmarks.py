@@ -0,0 +1,232 @@
+import datetime as dt
+import json
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+from django.db import connection, connections, transaction
+from django.test import Client
+
+from guide.compression import available_encoders
+from guide.importers import import_elements
+from guide.models import Guide
+from guide.profiling import QueryTimeline
+from guide.renderers import COMPACT_RENDERERS, MessagePackRenderer
+from guide.services import guide_elements
+
+BENCH_PREFIX = 'bench-'
+
+WORDS = ('острый', 'хронический', 'синдром', 'инфекция', 'неуточненный',
+         'поражение', 'вирусный', 'перелом', 'воспаление', 'недостаточность')
+
+
+def generate_dataset(names, versions, elements, skew=1.0, seed=0,
+                     stdout=None):
+    """
+    Создает воспроизводимый набор справочников bench-<n> с versions версиями
+    каждый. Число элементов в версии распределено по закону Ципфа с
+    показателем skew так, что в среднем на версию приходится elements
+    элементов; skew=0 дает одинаковый размер всех справочников.
+    Возвращает общее число созданных элементов.
+    """
+    rnd = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, names + 1)]
+    scale = elements * names / sum(weights)
+    start = dt.date(2020, 1, 1)
+    total = 0
+    with transaction.atomic():
+        Guide.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        for number, weight in enumerate(weights):
+            size = max(1, round(weight * scale))
+            name = f'{BENCH_PREFIX}{number}'
+            for version in range(versions):
+                guide = Guide.objects.create(
+                    name=name, short_name=name, version=str(version + 1),
+                    start_date=start + dt.timedelta(days=180 * version))
+                rows = (
+                    (f'{number}.{code}',
+                     ' '.join(rnd.choices(WORDS, k=3)) + f' {code}')
+                    for code in range(size)
+                )
+                import_elements(guide, rows)
+                total += size
+            if stdout is not None:
+                stdout.write(f'{name}: {versions} x {size} элементов')
+    return total
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Scenario:
+    """
+    Сценарий нагрузки: HTTP-запрос к сервису, выполняемый через
+    тестовый клиент Django со всем стеком middleware.
+    """
+
+    def __init__(self, name, method, path, payload=None, headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.headers = headers or {}
+
+    def request(self, client):
+        if self.method == 'post':
+            return client.post(self.path, self.payload,
+                               content_type='application/json',
+                               headers=self.headers)
+        return client.get(self.path, headers=self.headers)
+
+    def run(self, client, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client)
+        latencies = []
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        for _ in range(iterations):
+            begin = time.perf_counter()
+            response = self.request(client)
+            if response.streaming:
+                # Потоковый ответ формируется при чтении
+                for _ in response.streaming_content:
+                    pass
+            latencies.append((time.perf_counter() - begin) * 1000)
+        cpu_time = time.process_time() - cpu_started
+        elapsed = time.perf_counter() - started
+        # Запросы к базе данных считаются отдельным прогоном, чтобы учет
+        # запросов не влиял на время. Учитываются запросы ко всем базам:
+        # шардам элементов и репликам
+        queries = QueryTimeline(time.perf_counter(), 0)
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(
+                    db.execute_wrapper(queries.wrapper(db.alias)))
+            response = self.request(client)
+            if response.streaming:
+                response_bytes = sum(map(len, response.streaming_content))
+            else:
+                response_bytes = len(response.content)
+        return {
+            'path': self.path,
+            'method': self.method.upper(),
+            'status': response.status_code,
+            'iterations': iterations,
+            'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p90_ms': round(percentile(latencies, 0.9), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'throughput_rps': round(iterations / elapsed, 1),
+            # Процессорное время на запрос: сервер и клиент в одном
+            # процессе, поэтому включает и разбор ответа тестовым клиентом
+            'cpu_ms': round(cpu_time / iterations * 1000, 3),
+            'queries': queries.count,
+            'response_bytes': response_bytes,
+            'content_encoding': response.get('Content-Encoding'),
+        }
+
+
+def build_scenarios(batch_sizes=(1, 100, 1000)):
+    """
+    Строит сценарии для всех представлений на данных generate_dataset.
+    Самый крупный справочник (bench-0) используется как «горячий».
+    """
+    hot = Guide.objects.filter(name=f'{BENCH_PREFIX}0').order_by(
+        '-start_date').first()
+    if hot is None:
+        raise ValueError('Нет данных: выполните generate_guides')
+    hot_elements = guide_elements(hot)
+    elements = list(hot_elements.order_by('id').values_list(
+        'element_code', 'value')[:max(batch_sizes)])
+    name = hot.name
+    scenarios = [
+        Scenario('get-guides', 'get', '/api/get-guides'),
+        Scenario('get-guides-actual', 'get', '/api/get-guides?date=actual'),
+        Scenario('get-guides-date', 'get',
+                 '/api/get-guides?date=2020-06-01'),
+        Scenario('get-elements', 'get', f'/api/get-elements?name={name}'),
+        Scenario('get-elements-large-page', 'get',
+                 f'/api/get-elements?name={name}&page_size=1000'),
+        Scenario('get-elements-large-page-gzip', 'get',
+                 f'/api/get-elements?name={name}&page_size=1000',
+                 headers={'Accept-Encoding': 'gzip'}),
+        Scenario('get-elements-deep-page', 'get',
+                 f'/api/get-elements?name={name}&page='
+                 f'{max(1, hot_elements.count() // 10)}'),
+        Scenario('get-elements-fast', 'get',
+                 f'/api/get-elements?name={name}&page_size=1000&fast=1'),
+        Scenario('get-elements-cursor', 'get',
+                 f'/api/get-elements?name={name}&pagination=cursor'),
+        Scenario('guide-table', 'get', '/'),
+        Scenario('guide-elements-table', 'get',
+                 f'/guide-elements/{hot.pk}'),
+    ]
+    if MessagePackRenderer in COMPACT_RENDERERS:
+        scenarios.append(Scenario(
+            'get-elements-large-page-msgpack', 'get',
+            f'/api/get-elements?name={name}&page_size=1000',
+            headers={'Accept': MessagePackRenderer.media_type}))
+    if 'zstd' in available_encoders():
+        scenarios.append(Scenario(
+            'get-elements-large-page-zstd', 'get',
+            f'/api/get-elements?name={name}&page_size=1000',
+            headers={'Accept-Encoding': 'zstd'}))
+    for size in batch_sizes:
+        payload = json.dumps([
+            {'element_code': code, 'value': value if index % 2 else 'x'}
+            for index, (code, value) in enumerate(elements[:size])
+        ])
+        scenarios.append(Scenario(f'validate-{size}', 'post',
+                                  f'/api/get-elements?name={name}',
+                                  payload))
+    return scenarios
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scenarios, iterations=50, warmup=5, only=None):
+    client = Client()
+    results = {}
+    for scenario in scenarios:
+        if only and scenario.name not in only:
+            continue
+        results[scenario.name] = scenario.run(client, iterations, warmup)
+    return {
+        'commit': current_commit(),
+        'created_at': dt.datetime.now().isoformat(timespec='seconds'),
+        'database': connection.vendor,
+        'scenarios': results,
+    }
+
+
+def compare_results(previous, current):
+    """
+    Возвращает строки сравнения p50 и числа запросов с прошлым прогоном.
+    """
+    lines = []
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / max(
+            before['p50_ms'], 1e-9) * 100
+        line = (f'{name}: p50 {before["p50_ms"]} -> {result["p50_ms"]} мс '
+                f'({change:+.1f}%), запросов {before["queries"]} -> '
+                f'{result["queries"]}')
+        if before.get('response_bytes') is not None:
+            line += (f', размер {before["response_bytes"]} -> '
+                     f'{result["response_bytes"]} байт')
+        lines.append(line)
+    return lines
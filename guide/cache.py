@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Максимальное число версий справочников в кэше процесса
+    'MAX_VERSIONS': 32,
+    # Максимальное суммарное число элементов во всех версиях кэша
+    # (порядка 200 байт на элемент). Версии крупнее этого лимита не
+    # кэшируются, их элементы ищутся в базе данных.
+    'MAX_ELEMENTS': 200_000,
+    # Время жизни записи в секундах: освобождает память версий, которые
+    # давно не проверялись. Актуальность снимка проверяется по ревизии
+    # справочника при каждом обращении.
+    'TTL': 300,
+}
+
+
+def get_cache_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_ELEMENTS_CACHE', {})
+
+
+class GuideSnapshot:
+    """
+    Неизменяемый снимок кодов и значений элементов одной версии
+    справочника для проверки элементов по коду.
+    """
+
+    def __init__(self, guide, rows):
+        self.guide_pk = guide.pk
+        self.revision = guide.revision
+        self.loaded_at = time.monotonic()
+        self.values = dict(rows)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, code, default=None):
+        return self.values.get(code, default)
+
+
+class GuideElementsCache:
+    """
+    LRU-кэш снимков элементов справочников, ключ - id версии справочника.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._elements = 0
+        # Поколение увеличивается при каждой инвалидации, чтобы не сохранить
+        # в кэш снимок, прочитанный до конкурентной записи
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'versions': len(self._entries),
+                'elements': self._elements,
+            }
+
+    def _is_fresh(self, snapshot):
+        ttl = get_cache_settings()['TTL']
+        return ttl is None or time.monotonic() - snapshot.loaded_at < ttl
+
+    def _lookup(self, guide):
+        with self._lock:
+            snapshot = self._entries.get(guide.pk)
+            # Снимок другой ревизии устарел: элементы изменены, возможно,
+            # другим процессом
+            if snapshot is not None and (
+                    snapshot.revision != guide.revision or
+                    not self._is_fresh(snapshot)):
+                self._remove(guide.pk)
+                snapshot = None
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(guide.pk)
+            self.hits += 1
+            return snapshot
+
+    def _remove(self, key):
+        snapshot = self._entries.pop(key)
+        self._elements -= len(snapshot)
+
+    def _store(self, snapshot, generation):
+        options = get_cache_settings()
+        if len(snapshot) > options['MAX_ELEMENTS']:
+            return
+        key = snapshot.guide_pk
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (
+                len(self._entries) >= options['MAX_VERSIONS'] or
+                self._elements + len(snapshot) > options['MAX_ELEMENTS']
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = snapshot
+            self._elements += len(snapshot)
+
+    def get_snapshot(self, guide, elements):
+        """
+        Возвращает снимок элементов справочника guide, прочитанного из базы
+        в этом запросе. Снимок другой ревизии не используется. При промахе
+        загружает снимок из queryset elements. Если справочник слишком
+        велик для кэша, возвращает None.
+        """
+        snapshot = self._lookup(guide)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            generation = self._generation
+        if elements.count() > get_cache_settings()['MAX_ELEMENTS']:
+            return None
+        rows = elements.values_list('element_code', 'value')
+        snapshot = GuideSnapshot(guide, rows.iterator(chunk_size=5000))
+        self._store(snapshot, generation)
+        return snapshot
+
+    def invalidate_guide(self, guide_pk):
+        with self._lock:
+            self._generation += 1
+            if guide_pk in self._entries:
+                self._remove(guide_pk)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._elements = 0
+
+
+elements_cache = GuideElementsCache()
+
+
+def invalidate_guide(guide_pk):
+    elements_cache.invalidate_guide(guide_pk)
@@ -0,0 +1,179 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from guide.models import ChangeLog, Guide
+from guide.sharding import element_objects
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Число изменений в ответе api/changes по умолчанию и наибольшее
+    'PAGE_SIZE': 1000,
+    'MAX_PAGE_SIZE': 10000,
+}
+
+GUIDE_FIELDS = ('name', 'short_name', 'description', 'version',
+                'start_date', 'base_id')
+ELEMENT_FIELDS = ('guide_id', 'element_code', 'value', 'removed')
+
+# Ограничение на число параметров в одном запросе, как в services
+CHUNK_SIZE = 900
+# Ключ рекомендательной блокировки PostgreSQL для записи в журнал
+LOCK_KEY = 0x67756964
+
+
+def get_changes_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_CHANGES', {})
+
+
+def encode_token(change_id):
+    return base64.urlsafe_b64encode(
+        f'c{change_id}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """
+    Возвращает id записи журнала из токена. Для неверного токена
+    выбрасывает ValueError.
+    """
+    try:
+        value = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f'Неверный токен: {token}')
+    if not value.startswith('c') or not value[1:].isdigit():
+        raise ValueError(f'Неверный токен: {token}')
+    return int(value[1:])
+
+
+def _lock_log():
+    # Клиент продолжает чтение с последнего полученного id, поэтому записи
+    # должны становиться видимыми в порядке id. SQLite выполняет пишущие
+    # транзакции по одной, в PostgreSQL транзакции, пишущие в журнал,
+    # упорядочиваются блокировкой до своего завершения.
+    if connection.vendor == 'postgresql' and connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [LOCK_KEY])
+
+
+def _entry(entity, action, object_id, guide_id, data=None):
+    return ChangeLog(entity=entity, action=action, object_id=object_id,
+                     guide_id=guide_id, data=data)
+
+
+def _guide_data(guide):
+    data = {field: getattr(guide, field) for field in GUIDE_FIELDS}
+    data['base'] = data.pop('base_id')
+    return data
+
+
+def _element_data(element):
+    data = {field: getattr(element, field) for field in ELEMENT_FIELDS}
+    data['guide'] = data.pop('guide_id')
+    return data
+
+
+def record_change(instance, action):
+    """
+    Записывает в журнал изменение справочника или элемента instance.
+    """
+    if not get_changes_settings()['ENABLED']:
+        return
+    deleted = action == ChangeLog.DELETE
+    if isinstance(instance, Guide):
+        entry = _entry(ChangeLog.GUIDE, action, instance.pk, instance.pk,
+                       None if deleted else _guide_data(instance))
+    else:
+        entry = _entry(ChangeLog.ELEMENT, action, instance.pk,
+                       instance.guide_id,
+                       None if deleted else _element_data(instance))
+    _lock_log()
+    entry.save()
+
+
+def record_guide(guide_pk):
+    """
+    Записывает в журнал текущее состояние справочника после изменения
+    через update(), которое не отправляет сигналы.
+    """
+    guide = Guide.objects.filter(pk=guide_pk).first()
+    if guide is not None:
+        record_change(guide, ChangeLog.SAVE)
+
+
+def record_elements(guide_pk, codes):
+    """
+    Записывает в журнал текущее состояние элементов справочника с кодами
+    codes после записи через bulk_create, которая не отправляет сигналы.
+    """
+    if not get_changes_settings()['ENABLED'] or not codes:
+        return
+    _lock_log()
+    for start in range(0, len(codes), CHUNK_SIZE):
+        elements = element_objects(guide_pk).filter(
+            guide=guide_pk, element_code__in=codes[start:start + CHUNK_SIZE])
+        ChangeLog.objects.bulk_create(
+            _entry(ChangeLog.ELEMENT, ChangeLog.SAVE, element.pk, guide_pk,
+                   _element_data(element))
+            for element in elements)
+
+
+def record_removed_elements(guide_pk, ids):
+    """
+    Записывает в журнал удаление элементов справочника с id из ids без
+    отправки сигналов, например при переносе элементов в другой шард.
+    """
+    if not get_changes_settings()['ENABLED'] or not ids:
+        return
+    _lock_log()
+    ChangeLog.objects.bulk_create(
+        _entry(ChangeLog.ELEMENT, ChangeLog.DELETE, pk, guide_pk)
+        for pk in ids)
+
+
+def changes_after(token=None, limit=None):
+    """
+    Возвращает изменения после токена token (с начала журнала, если токен
+    не указан), не более limit: список словарей {entity, action, id,
+    guide, data}, токен для следующего запроса и признак, что изменения
+    еще есть. id элементов уникальны в пределах справочника guide.
+    """
+    options = get_changes_settings()
+    if limit is None:
+        limit = options['PAGE_SIZE']
+    limit = max(1, min(limit, options['MAX_PAGE_SIZE']))
+    after = 0 if token is None else decode_token(token)
+    rows = list(ChangeLog.objects.filter(id__gt=after).order_by(
+        'id').values_list('id', 'entity', 'action', 'object_id',
+                          'guide_id', 'data')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        {'entity': entity, 'action': action, 'id': object_id,
+         'guide': guide_id, 'data': data}
+        for _, entity, action, object_id, guide_id, data in rows
+    ]
+    last = rows[-1][0] if rows else after
+    return changes, encode_token(last), has_more
+
+
+def compact_changes():
+    """
+    Сжимает журнал: удаляет записи, после которых есть более поздняя
+    запись того же объекта, и записи элементов удаленного позже
+    справочника. Клиент с любым токеном по-прежнему получает итоговое
+    состояние каждого объекта. Возвращает число удаленных записей.
+    """
+    guide_deleted = ChangeLog.objects.filter(
+        entity=ChangeLog.GUIDE, action=ChangeLog.DELETE,
+        object_id=OuterRef('guide_id'), id__gt=OuterRef('id'))
+    removed, _ = ChangeLog.objects.filter(
+        entity=ChangeLog.ELEMENT).filter(Exists(guide_deleted)).delete()
+    superseded = ChangeLog.objects.filter(
+        entity=OuterRef('entity'), guide_id=OuterRef('guide_id'),
+        object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    count, _ = ChangeLog.objects.filter(Exists(superseded)).delete()
+    return removed + count
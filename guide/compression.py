@@ -0,0 +1,178 @@
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULTS = {
+    # Ответы меньше этого размера в байтах не сжимаются
+    'MIN_SIZE': 512,
+    'GZIP_LEVEL': 6,
+    'ZSTD_LEVEL': 3,
+}
+
+# Уже сжатые форматы
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip',
+                        'application/gzip', 'application/zstd')
+
+
+def get_compression_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_COMPRESSION', {})
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Отдает клиенту все сжатое к этому моменту, не завершая поток
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encoders():
+    """
+    Доступные кодировки в порядке предпочтения сервера.
+    """
+    options = get_compression_settings()
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = lambda: ZstdEncoder(options['ZSTD_LEVEL'])
+    encoders['gzip'] = lambda: GzipEncoder(options['GZIP_LEVEL'])
+    return encoders
+
+
+def parse_accept_encoding(header):
+    """
+    Разбирает заголовок Accept-Encoding в словарь {кодировка: q}.
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """
+    Выбирает кодировку сжатия по заголовку Accept-Encoding: с наибольшим
+    q, при равенстве - предпочтительную для сервера. Возвращает None,
+    если клиент не принимает ни одну из доступных кодировок.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in available_encoders():
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compress_stream(encoder, chunks):
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def _acompress_stream(encoder, chunks):
+    async for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы zstd (если установлен пакет zstandard) или gzip
+    в зависимости от Accept-Encoding. Потоковые ответы сжимаются по мере
+    формирования: каждый фрагмент сразу отправляется клиенту.
+    Работает и в синхронном, и в асинхронном режиме.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request,
+                                     await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not response.streaming and (
+                len(response.content) < get_compression_settings()[
+                    'MIN_SIZE']):
+            return response
+        if response.has_header('Content-Encoding') or response.get(
+                'Content-Type', '').startswith(INCOMPRESSIBLE_TYPES):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+        encoder = available_encoders()[coding]()
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_stream(
+                    encoder, response.streaming_content)
+            else:
+                response.streaming_content = _compress_stream(
+                    encoder, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # ETag описывает несжатое содержимое, поэтому становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,127 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from guide.models import Guide
+
+DEFAULTS = {
+    # max-age для ответов по явно указанной версии справочника
+    'VERSIONED_MAX_AGE': 300,
+    # max-age для ответов, зависящих от текущей даты или списка справочников
+    'MAX_AGE': 0,
+}
+
+# Параметры запроса, влияющие на содержимое ответа
+VARYING_PARAMS = ('name', 'version', 'date', 'page', 'page_size', 'cursor',
+                  'pagination', 'format')
+
+
+def get_http_cache_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_HTTP_CACHE', {})
+
+
+class ChangeStamp:
+    """
+    Отметка изменения данных ответа: из нее строятся ETag и Last-Modified.
+    """
+
+    def __init__(self, parts, last_modified, versioned=False):
+        self.parts = parts
+        self.last_modified = last_modified
+        self.versioned = versioned
+
+    def etag(self, request):
+        digest = hashlib.sha1()
+        for part in self.parts:
+            digest.update(f'{part}\0'.encode())
+        for param in VARYING_PARAMS:
+            digest.update(
+                f'{param}={request.GET.getlist(param)}\0'.encode())
+        digest.update(request.META.get('HTTP_ACCEPT', '').encode())
+        return quote_etag(digest.hexdigest())
+
+    def last_modified_timestamp(self):
+        if self.last_modified is None:
+            return None
+        return int(self.last_modified.timestamp())
+
+
+# Last-Modified передается, только если дата изменения ответа не может
+# уменьшиться. Дата изменения версии растет при каждой записи, но
+# актуальная версия может смениться более старой (при переходе на
+# следующую версию или удалении), а наибольшая дата изменения списка
+# уменьшается при удалении справочника. Такие ответы проверяются только
+# по ETag.
+
+def guide_stamp(guide, versioned):
+    if guide is None:
+        return None
+    return ChangeStamp(('guide', guide.pk, guide.revision, guide.updated_at),
+                       guide.updated_at if versioned else None, versioned)
+
+
+def guides_list_stamp(*parts):
+    stats = Guide.objects.aggregate(last=Max('updated_at'), total=Count('id'))
+    return ChangeStamp(('guides', stats['total'], stats['last']) + parts,
+                       None)
+
+
+async def aguides_list_stamp(*parts):
+    stats = await Guide.objects.aaggregate(last=Max('updated_at'),
+                                           total=Count('id'))
+    return ChangeStamp(('guides', stats['total'], stats['last']) + parts,
+                       None)
+
+
+def get_not_modified(request, stamp):
+    """
+    Возвращает ответ 304, если данные не изменились с момента, указанного
+    в If-None-Match или If-Modified-Since, иначе None.
+    """
+    return get_conditional_response(
+        request, etag=stamp.etag(request),
+        last_modified=stamp.last_modified_timestamp())
+
+
+def patch_stamp_headers(response, request, stamp):
+    """
+    Добавляет к ответу ETag, Last-Modified и Cache-Control.
+    """
+    response['ETag'] = stamp.etag(request)
+    last_modified = stamp.last_modified_timestamp()
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    options = get_http_cache_settings()
+    max_age = (options['VERSIONED_MAX_AGE'] if stamp.versioned
+               else options['MAX_AGE'])
+    patch_cache_control(response, public=True, max_age=max_age)
+    if not max_age:
+        patch_cache_control(response, must_revalidate=True)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def conditional_get(method):
+    """
+    Декоратор GET-обработчика: получает отметку изменения из
+    view.get_change_stamp(), отвечает 304 на If-None-Match и
+    If-Modified-Since без выполнения обработчика, а к полному ответу
+    добавляет ETag, Last-Modified и Cache-Control.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        stamp = self.get_change_stamp()
+        if stamp is None:
+            return method(self, request, *args, **kwargs)
+        response = get_not_modified(request, stamp)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return patch_stamp_headers(response, request, stamp)
+    return wrapper
@@ -0,0 +1,75 @@
+import json
+
+from django.db import connections
+from django.db.models.functions import Collate
+
+from guide.services import guide_elements
+
+DIFF_CHUNK_SIZE = 5000
+
+# Побайтовые сопоставления, при которых порядок строк в СУБД совпадает
+# с порядком сравнения строк в Python. В SQLite он такой по умолчанию.
+BINARY_COLLATIONS = {
+    'postgresql': 'C',
+    'mysql': 'utf8mb4_bin',
+}
+
+
+def ordered_elements(guide, chunk_size=DIFF_CHUNK_SIZE):
+    """
+    Возвращает итератор пар (код, значение) элементов справочника guide,
+    упорядоченных по коду элемента. Строки читаются пачками.
+    """
+    queryset = guide_elements(guide)
+    collation = BINARY_COLLATIONS.get(connections[queryset.db].vendor)
+    ordering = ('element_code' if collation is None
+                else Collate('element_code', collation))
+    return queryset.order_by(ordering).values_list(
+        'element_code', 'value').iterator(chunk_size=chunk_size)
+
+
+def diff_elements(old_rows, new_rows):
+    """
+    Сравнивает два упорядоченных по коду итератора пар (код, значение)
+    слиянием, храня в памяти только текущие строки. Возвращает итератор
+    изменений вида {"change": "added" | "removed" | "changed", ...}.
+    """
+    missing = object()
+    old_rows, new_rows = iter(old_rows), iter(new_rows)
+    old = next(old_rows, missing)
+    new = next(new_rows, missing)
+    while old is not missing or new is not missing:
+        if new is missing or (old is not missing and old[0] < new[0]):
+            yield {'change': 'removed', 'element_code': old[0],
+                   'value': old[1]}
+            old = next(old_rows, missing)
+        elif old is missing or new[0] < old[0]:
+            yield {'change': 'added', 'element_code': new[0],
+                   'value': new[1]}
+            new = next(new_rows, missing)
+        else:
+            if old[1] != new[1]:
+                yield {'change': 'changed', 'element_code': new[0],
+                       'old_value': old[1], 'value': new[1]}
+            old = next(old_rows, missing)
+            new = next(new_rows, missing)
+
+
+def diff_lines(old_guide, new_guide):
+    """
+    Возвращает итератор строк NDJSON с изменениями между версиями
+    old_guide и new_guide. Последняя строка - итог
+    {"summary": {"added": 0, "removed": 0, "changed": 0}}.
+    """
+    summary = {'added': 0, 'removed': 0, 'changed': 0}
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    batch = []
+    for change in diff_elements(ordered_elements(old_guide),
+                                ordered_elements(new_guide)):
+        summary[change['change']] += 1
+        batch.append(dumps(change) + '\n')
+        if len(batch) >= DIFF_CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    batch.append(dumps({'summary': summary}) + '\n')
+    yield ''.join(batch)
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from guide.services import guide_elements
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Порядок полей совпадает с выдачей GuideElementSerializer
+EXPORT_FIELDS = ('id', 'element_code', 'value', 'guide')
+
+
+def export_rows(guide, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Возвращает итератор кортежей (id, код, значение, id справочника) по всем
+    элементам справочника guide в порядке id. Строки читаются из базы
+    пачками по chunk_size (на PostgreSQL - через серверный курсор),
+    без создания экземпляров модели.
+    """
+    return guide_elements(guide).order_by('id').values_list(
+        'id', 'element_code', 'value', 'guide_id'
+    ).iterator(chunk_size=chunk_size)
+
+
+def export_batches(guide, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Возвращает итератор списков строк, как у export_rows, выбирая каждый
+    список отдельным запросом после id последней строки. Между пачками
+    курсор базы данных не остается открытым, поэтому их обработка может
+    писать в базу данных.
+    """
+    queryset = guide_elements(guide).order_by('id').values_list(
+        'id', 'element_code', 'value', 'guide_id')
+    last = None
+    while True:
+        batch = queryset if last is None else queryset.filter(id__gt=last)
+        batch = list(batch[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def _batched(lines, size=EXPORT_CHUNK_SIZE):
+    # Отдаем строки пачками, чтобы не вызывать запись в сокет на каждую
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def ndjson_lines(rows):
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for row in rows:
+        yield dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson; charset=utf-8'),
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+}
+
+
+def export_elements(guide, file_format):
+    """
+    Возвращает итератор фрагментов выгрузки всех элементов справочника
+    guide в формате file_format.
+    """
+    lines, _ = EXPORT_FORMATS[file_format]
+    return _batched(lines(export_rows(guide)))
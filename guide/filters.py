@@ -1,11 +1,17 @@
 import django_filters
 
 from guide.models import Guide, GuideElement
+from guide.search import filter_contains
+
+
+def search_filter(queryset, name, value):
+    # Поиск подстроки по индексу, см. guide.search
+    return filter_contains(queryset, name, value)
 
 
 class GuideFilter(django_filters.FilterSet):
     # MySQL не поддерживает операторы с учетом регистра
-    name = django_filters.CharFilter(lookup_expr='contains')
+    name = django_filters.CharFilter(method=search_filter)
     start_date = django_filters.DateFilter(lookup_expr='gte', label='От даты')
 
     class Meta:
@@ -15,8 +21,8 @@ class GuideFilter(django_filters.FilterSet):
 
 class GuideElementFilter(django_filters.FilterSet):
     # MySQL не поддерживает операторы с учетом регистра
-    element_code = django_filters.CharFilter(lookup_expr='contains')
-    value = django_filters.CharFilter(lookup_expr='contains')
+    element_code = django_filters.CharFilter(method=search_filter)
+    value = django_filters.CharFilter(method=search_filter)
 
     class Meta:
         model = GuideElement
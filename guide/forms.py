@@ -2,6 +2,8 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
 from django import forms
 
+from guide.models import Guide
+
 
 class GuideEnterForm(forms.Form):
     name = forms.CharField(max_length=255, label='Наименование',
@@ -13,6 +15,11 @@ class GuideEnterForm(forms.Form):
     version = forms.CharField(max_length=63, label='Версия')
     start_date = forms.DateField(
         label='Дата начала действия справочника этой версии')
+    base = forms.ModelChoiceField(
+        queryset=Guide.objects.order_by('name', 'start_date'),
+        label='Базовая версия', required=False,
+        help_text='Новая версия унаследует элементы базовой и будет хранить '
+                  'только отличия от нее')
 
     helper = FormHelper()
     helper.form_method = 'POST'
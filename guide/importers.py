@@ -0,0 +1,172 @@
+import csv
+import json
+
+from django.db import connections, transaction
+
+from guide.changes import record_elements
+from guide.models import GuideElement
+from guide.services import (VALIDATION_CHUNK_SIZE, elements_changed,
+                            guide_elements)
+from guide.sharding import element_objects, guide_database
+
+IMPORT_BATCH_SIZE = 5000
+
+# Значение строки загрузки, удаляющей элемент из версии
+REMOVED = object()
+
+CODE_MAX_LENGTH = GuideElement._meta.get_field('element_code').max_length
+VALUE_MAX_LENGTH = GuideElement._meta.get_field('value').max_length
+
+
+def _decode_lines(lines, encoding='utf-8'):
+    first = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_csv_rows(lines, removals=False):
+    """
+    Построчно разбирает CSV с колонками element_code, value.
+    Строка заголовка, если она есть, пропускается.
+    С removals=True допускается третья колонка removed: строка со
+    значением 1 в ней удаляет элемент (значение REMOVED).
+    """
+    reader = csv.reader(_decode_lines(lines))
+    for number, row in enumerate(reader):
+        if number == 0 and row[:2] == ['element_code', 'value']:
+            continue
+        if removals and len(row) == 3:
+            yield row[0], REMOVED if row[2] == '1' else row[1]
+            continue
+        if len(row) != 2:
+            yield None, None
+            continue
+        yield row[0], row[1]
+
+
+def iter_ndjson_rows(lines, removals=False):
+    """
+    Построчно разбирает NDJSON, где каждая строка - объект
+    {"element_code": "Код", "value": "Значение"}.
+    С removals=True объект {"element_code": "Код", "removed": true}
+    удаляет элемент (значение REMOVED).
+    """
+    for line in _decode_lines(lines):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None, None
+            continue
+        if not isinstance(item, dict):
+            yield None, None
+            continue
+        if removals and item.get('removed') is True:
+            yield item.get('element_code'), REMOVED
+            continue
+        yield item.get('element_code'), item.get('value')
+
+
+ROW_READERS = {
+    'csv': iter_csv_rows,
+    'ndjson': iter_ndjson_rows,
+}
+
+
+def _is_valid(code, value):
+    return (
+        isinstance(code, str) and 0 < len(code) <= CODE_MAX_LENGTH and (
+            value is REMOVED or
+            isinstance(value, str) and len(value) <= VALUE_MAX_LENGTH)
+    )
+
+
+def _existing_codes(elements, codes):
+    existing = set()
+    for start in range(0, len(codes), VALIDATION_CHUNK_SIZE):
+        existing.update(elements.filter(
+            element_code__in=codes[start:start + VALIDATION_CHUNK_SIZE]
+        ).values_list('element_code', flat=True))
+    return existing
+
+
+def _write_batch(guide, batch, result):
+    values = {code: value for code, value in batch.items()
+              if value is not REMOVED}
+    # Обновленными считаются только собственные элементы версии:
+    # элемент базовой версии в производной версии добавляется
+    own = _existing_codes(element_objects(guide).filter(
+        guide=guide, removed=False), list(values))
+    # Удаляются только элементы, которые видны в версии
+    removals = _existing_codes(guide_elements(guide), [
+        code for code, value in batch.items() if value is REMOVED])
+    # Загруженный элемент отменяет отметку удаления в этой версии, а
+    # удаление сохраняется как отметка, скрывающая и элемент базовой
+    # версии
+    options = {'update_conflicts': True,
+               'update_fields': ['value', 'removed']}
+    features = connections[guide_database(guide)].features
+    if features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['guide', 'element_code']
+    element_objects(guide).bulk_create(
+        [GuideElement(guide=guide, element_code=code, value=value)
+         for code, value in values.items()] +
+        [GuideElement(guide=guide, element_code=code, value='',
+                      removed=True)
+         for code in removals],
+        **options
+    )
+    record_elements(guide.pk, list(values) + list(removals))
+    result['updated'] += len(own)
+    result['inserted'] += len(values) - len(own)
+    result['removed'] += len(removals)
+
+
+def import_elements(guide, rows, batch_size=IMPORT_BATCH_SIZE,
+                    progress=None):
+    """
+    Загружает в справочник guide элементы из итератора пар
+    (код элемента, значение). Элементы записываются пачками по batch_size
+    через bulk_create с обновлением значения при совпадении кода.
+    Значение REMOVED удаляет элемент с этим кодом из версии, в том числе
+    унаследованный от базовой версии.
+    Вся загрузка выполняется в одной транзакции. После каждой пачки
+    вызывается progress(число прочитанных строк); исключение из progress
+    отменяет загрузку.
+    Возвращает словарь с числом добавленных, обновленных, удаленных и
+    отклоненных строк.
+    """
+    result = {'inserted': 0, 'updated': 0, 'removed': 0, 'rejected': 0}
+    read = 0
+    # Транзакции в базе элементов и в основной базе (ревизия справочника,
+    # журнал изменений)
+    with transaction.atomic(using=guide_database(guide)), \
+            transaction.atomic():
+        # Повтор кода внутри пачки нельзя передать в один INSERT ... ON
+        # CONFLICT, поэтому пачка хранится как словарь: побеждает последнее
+        # значение
+        batch = {}
+        for code, value in rows:
+            read += 1
+            if not _is_valid(code, value):
+                result['rejected'] += 1
+                continue
+            batch[code] = value
+            if len(batch) >= batch_size:
+                _write_batch(guide, batch, result)
+                batch = {}
+                if progress is not None:
+                    progress(read)
+        if batch:
+            _write_batch(guide, batch, result)
+        if progress is not None:
+            progress(read)
+        # bulk_create не отправляет сигналы post_save
+        elements_changed(guide.pk)
+    return result
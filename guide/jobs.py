@@ -0,0 +1,360 @@
+import datetime as dt
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections
+from django.utils import timezone
+
+from guide.exporters import EXPORT_FORMATS, export_batches
+from guide.importers import ROW_READERS, import_elements
+from guide.models import Guide, Job
+from guide.search import get_backend
+from guide.services import guide_elements
+from guide.sharding import element_databases
+from guide.snapshots import (build_snapshot, rebuild_snapshot,
+                             snapshots_enabled)
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DIR': None,
+    # Пауза между проверками очереди, в секундах
+    'POLL_INTERVAL': 1,
+    # Задача, прогресс которой не обновлялся столько секунд, считается
+    # брошенной остановленным обработчиком и возвращается в очередь
+    'STALE_AFTER': 300,
+    # Как часто сохранять прогресс задачи, в секундах
+    'PROGRESS_INTERVAL': 1,
+}
+
+# Обработчики задач по типу: функция(задача, контекст) -> результат
+JOB_HANDLERS = {}
+
+
+def get_jobs_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_JOBS', {})
+
+
+def export_path(job):
+    return job_file(f'export-{job.pk}.{job.params["file_format"]}')
+
+
+def job_file(name):
+    directory = get_jobs_settings()['DIR']
+    if directory is None:
+        raise ImproperlyConfigured('Не задан каталог задач GUIDE_JOBS["DIR"]')
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / name
+
+
+# Прогресс и отмена выполняемой задачи передаются через файлы каталога
+# задач, а не через базу данных: задача может выполняться в одной
+# транзакции, изменения которой не видны до ее фиксации, а SQLite на время
+# записи блокирует всю базу данных.
+
+def progress_path(job):
+    return job_file(f'progress-{job.pk}.json')
+
+
+def cancel_path(job):
+    return job_file(f'cancel-{job.pk}')
+
+
+def job_handler(kind):
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """
+    Передается обработчику задачи: сохраняет прогресс и прерывает
+    задачу исключением JobCancelled, если запрошена отмена.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._saved_at = 0
+
+    def progress(self, processed, total=None, force=False):
+        job = self.job
+        job.processed = processed
+        if total is not None:
+            job.total = total
+        now = time.monotonic()
+        if not force and now - self._saved_at < get_jobs_settings()[
+                'PROGRESS_INTERVAL']:
+            return
+        self._saved_at = now
+        path = progress_path(job)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as output:
+            json.dump({'processed': job.processed, 'total': job.total},
+                      output)
+        os.replace(tmp_name, path)
+        if cancel_path(job).exists():
+            raise JobCancelled
+
+
+def load_progress(job):
+    """
+    Дополняет выполняемую задачу job прогрессом и отметкой отмены,
+    сохраненными обработчиком.
+    """
+    if job.status != Job.RUNNING:
+        return job
+    try:
+        with open(progress_path(job)) as source:
+            progress = json.load(source)
+    except (OSError, ValueError):
+        progress = {}
+    job.processed = progress.get('processed', job.processed)
+    job.total = progress.get('total', job.total)
+    job.cancel_requested = cancel_path(job).exists()
+    return job
+
+
+def submit_job(kind, params, total=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    return Job.objects.create(kind=kind, params=params, total=total)
+
+
+def save_job_input(lines):
+    """
+    Сохраняет входные данные задачи в файл каталога задач. Возвращает
+    путь к файлу и число строк в нем.
+    """
+    path = job_file(f'input-{uuid.uuid4().hex}')
+    count = 0
+    with open(path, 'wb') as output:
+        for line in lines:
+            output.write(line)
+            count += 1
+    return str(path), count
+
+
+def cancel_job(job):
+    """
+    Отменяет задачу: задача из очереди отменяется сразу, выполняемая -
+    при следующем сохранении прогресса.
+    """
+    # Запись в базу данных только для задачи из очереди: выполняемая
+    # задача может удерживать блокировку SQLite до конца работы
+    if job.status == Job.QUEUED and Job.objects.filter(
+            pk=job.pk, status=Job.QUEUED).update(
+            status=Job.CANCELLED, cancel_requested=True,
+            finished_at=timezone.now()):
+        _remove_input(job)
+    elif job.status in (Job.QUEUED, Job.RUNNING):
+        cancel_path(job).touch()
+    job.refresh_from_db()
+    return load_progress(job)
+
+
+def job_eta(job):
+    """
+    Оценка оставшегося времени выполнения задачи в секундах по средней
+    скорости обработки или None, если оценить нельзя.
+    """
+    if job.status != Job.RUNNING or not job.processed or not job.total or (
+            job.started_at is None):
+        return None
+    elapsed = (timezone.now() - job.started_at).total_seconds()
+    remaining = max(job.total - job.processed, 0)
+    return round(elapsed / job.processed * remaining, 1)
+
+
+def requeue_stale_jobs():
+    """
+    Возвращает в очередь выполняемые задачи, обработчик которых перестал
+    сохранять прогресс.
+    """
+    stale_after = get_jobs_settings()['STALE_AFTER']
+    deadline = timezone.now() - dt.timedelta(seconds=stale_after)
+    requeued = 0
+    for job in Job.objects.filter(status=Job.RUNNING,
+                                  started_at__lt=deadline):
+        try:
+            idle = time.time() - progress_path(job).stat().st_mtime
+        except FileNotFoundError:
+            idle = stale_after
+        if idle >= stale_after:
+            requeued += Job.objects.filter(
+                pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+                status=Job.QUEUED, worker='')
+    return requeued
+
+
+def claim_job(worker):
+    """
+    Забирает первую задачу из очереди. Задачу получает только один
+    обработчик: условный UPDATE выполняется атомарно на любой СУБД.
+    """
+    while True:
+        pk = Job.objects.filter(status=Job.QUEUED).order_by('id').values_list(
+            'pk', flat=True).first()
+        if pk is None:
+            return None
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, worker=worker, started_at=now):
+            return Job.objects.get(pk=pk)
+
+
+def _remove_input(job):
+    path = job.params.get('input')
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _finish(job, status, **fields):
+    Job.objects.filter(pk=job.pk).update(
+        status=status, processed=job.processed, total=job.total,
+        finished_at=timezone.now(), **fields)
+    for path in (progress_path(job), cancel_path(job)):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def run_job(job):
+    context = JobContext(job)
+    try:
+        result = JOB_HANDLERS[job.kind](job, context)
+    except JobCancelled:
+        _finish(job, Job.CANCELLED, cancel_requested=True)
+    except Exception:
+        _finish(job, Job.FAILED, error=traceback.format_exc())
+    else:
+        _finish(job, Job.DONE, result=result)
+    finally:
+        if job.kind == 'import':
+            _remove_input(job)
+
+
+def run_worker(workers=1, once=False, stdout=None):
+    """
+    Выполняет задачи из очереди в workers потоках. С once=True
+    завершается, когда очередь пуста.
+    """
+    poll_interval = get_jobs_settings()['POLL_INTERVAL']
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def loop(number):
+        worker = f'{prefix}:{number}'
+        while True:
+            try:
+                close_old_connections()
+                requeue_stale_jobs()
+                job = claim_job(worker)
+                if job is None:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                run_job(job)
+                if stdout is not None:
+                    job.refresh_from_db()
+                    stdout.write(f'{job}: {job.get_status_display()}')
+            except DatabaseError:
+                # Например, "database is locked" в SQLite при нескольких
+                # обработчиках. Задача, состояние которой не сохранилось,
+                # вернется в очередь через STALE_AFTER
+                logger.exception('Ошибка базы данных в обработчике %s',
+                                 worker)
+                close_old_connections()
+                time.sleep(poll_interval)
+        close_old_connections()
+
+    threads = [threading.Thread(target=loop, args=(number,), daemon=True)
+               for number in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@job_handler('import')
+def import_job(job, context):
+    guide = Guide.objects.get(pk=job.params['guide'])
+    reader = ROW_READERS[job.params['file_format']]
+    with open(job.params['input'], 'rb') as source:
+        return import_elements(guide, reader(source, removals=True),
+                               progress=context.progress)
+
+
+@job_handler('export')
+def export_job(job, context):
+    guide = Guide.objects.get(pk=job.params['guide'])
+    file_format = job.params['file_format']
+    lines, _ = EXPORT_FORMATS[file_format]
+    total = guide_elements(guide).count()
+    context.progress(0, total, force=True)
+    path = export_path(job)
+    count = 0
+
+    def rows():
+        nonlocal count
+        for batch in export_batches(guide):
+            yield from batch
+            count += len(batch)
+            context.progress(count)
+
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for line in lines(rows()):
+            output.write(line)
+    context.progress(count, force=True)
+    return {'rows': count, 'file_format': file_format}
+
+
+@job_handler('snapshots')
+def snapshots_job(job, context):
+    if not snapshots_enabled():
+        raise ValueError('Снимки отключены в GUIDE_SNAPSHOTS')
+    if job.params.get('guide') is not None:
+        # Пересборка после изменения справочника (schedule_rebuild)
+        context.progress(0, 1, force=True)
+        elements = rebuild_snapshot(job.params['guide'])
+        context.progress(1)
+        return {'guides': 1, 'elements': elements}
+    guides = Guide.objects.order_by('pk')
+    if job.params.get('name') is not None:
+        guides = guides.filter(name=job.params['name'])
+    context.progress(0, guides.count(), force=True)
+    elements = 0
+    for number, guide in enumerate(guides.iterator(), start=1):
+        elements += build_snapshot(guide)
+        context.progress(number)
+    return {'guides': job.processed, 'elements': elements}
+
+
+@job_handler('search_index')
+def search_index_job(job, context):
+    databases = [DEFAULT_DB_ALIAS] + [
+        alias for alias in element_databases() if alias != DEFAULT_DB_ALIAS]
+    context.progress(0, len(databases), force=True)
+    for done, alias in enumerate(databases, 1):
+        get_backend(alias).rebuild()
+        context.progress(done)
+    return {}
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from guide.benchmarks import build_scenarios, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержки, пропускную способность и число SQL-запросов '
+            'представлений справочников на данных generate_guides')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--batch-sizes', default='1,100,1000',
+                            help='Размеры пакетов проверки через запятую')
+        parser.add_argument('--scenario', action='append', dest='only',
+                            help='Запустить только указанные сценарии')
+        parser.add_argument('--output', help='Файл для сохранения в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        batch_sizes = [int(size)
+                       for size in options['batch_sizes'].split(',')]
+        try:
+            scenarios = build_scenarios(batch_sizes)
+        except ValueError as e:
+            raise CommandError(e)
+        results = run_benchmarks(scenarios, options['iterations'],
+                                 options['warmup'], options['only'])
+        for name, result in results['scenarios'].items():
+            self.stdout.write(
+                f'{name:<32} p50 {result["p50_ms"]:>9} мс  '
+                f'p99 {result["p99_ms"]:>9} мс  '
+                f'CPU {result["cpu_ms"]:>9} мс  '
+                f'{result["throughput_rps"]:>8} rps  '
+                f'{result["response_bytes"]:>9} байт  '
+                f'SQL {result["queries"]:>3}  HTTP {result["status"]}')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as source:
+                previous = json.load(source)
+            for line in compare_results(previous, results):
+                self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'))
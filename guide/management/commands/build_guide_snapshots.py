@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from guide.models import Guide
+from guide.snapshots import build_snapshot, snapshots_enabled
+
+
+class Command(BaseCommand):
+    help = ('Собирает файлы снимков справочников для поиска элементов '
+            'по коду через отображение в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', help='Наименование справочника')
+        parser.add_argument('--guide-version', help='Версия справочника')
+
+    def handle(self, *args, **options):
+        if not snapshots_enabled():
+            raise CommandError('Снимки отключены в GUIDE_SNAPSHOTS')
+        guides = Guide.objects.order_by('pk')
+        if options['name'] is not None:
+            guides = guides.filter(name=options['name'])
+        if options['guide_version'] is not None:
+            guides = guides.filter(version=options['guide_version'])
+        for guide in guides.iterator():
+            count = build_snapshot(guide)
+            self.stdout.write(f'{guide}: {count} элементов')
+        self.stdout.write(self.style.SUCCESS('Снимки собраны'))
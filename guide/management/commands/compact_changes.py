@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from guide.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = ('Сжимает журнал изменений справочников: удаляет записи, '
+            'замененные более поздними')
+
+    def handle(self, *args, **options):
+        removed = compact_changes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {removed}'))
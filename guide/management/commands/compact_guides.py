@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from guide.versions import MAX_CHAIN_DEPTH, compact_guides
+
+
+class Command(BaseCommand):
+    help = ('Сворачивает длинные цепочки версий справочников, построенных '
+            'на базовых версиях')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-depth', type=int, default=MAX_CHAIN_DEPTH,
+            help='Допустимое число базовых версий в цепочке, 0 - свернуть '
+                 'все версии')
+
+    def handle(self, *args, **options):
+        flattened = compact_guides(options['max_depth'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Свернуто версий: {len(flattened)}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from guide.benchmarks import generate_dataset
+
+
+class Command(BaseCommand):
+    help = ('Создает воспроизводимый синтетический набор справочников '
+            'bench-<n> для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=20,
+                            help='Число наименований справочников')
+        parser.add_argument('--versions', type=int, default=2,
+                            help='Число версий каждого справочника')
+        parser.add_argument('--elements', type=int, default=1000,
+                            help='Среднее число элементов в версии')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Показатель распределения Ципфа размеров '
+                                 'справочников, 0 - без перекоса')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        total = generate_dataset(
+            options['names'], options['versions'], options['elements'],
+            skew=options['skew'], seed=options['seed'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Создано элементов: {total}'))
@@ -0,0 +1,22 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from guide.sharding import rebalance_shards
+
+
+class Command(BaseCommand):
+    help = ('Переносит элементы справочников в шарды, назначенные им при '
+            'текущем наборе шардов GUIDE_SHARDS')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только вывести справочники, которые будут перенесены')
+
+    def handle(self, *args, **options):
+        try:
+            moved = rebalance_shards(options['dry_run'], stdout=self.stdout)
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено справочников: {len(moved)}'))
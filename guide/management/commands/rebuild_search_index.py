@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from guide.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Создает и перестраивает индексы подстрочного поиска справочников'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        backend = get_backend(options['database'])
+        backend.install()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс поиска перестроен ({type(backend).__name__})'))
@@ -0,0 +1,46 @@
+import datetime as dt
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from guide.services import rollover_current_versions
+
+
+def seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = timezone.make_aware(dt.datetime.combine(
+        now.date() + dt.timedelta(days=1), dt.time()))
+    return (midnight - now).total_seconds()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает актуальные версии справочников, у которых '
+            'вступила в действие следующая версия. Запускается в полночь '
+            'по часовому поясу TIME_ZONE')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Дата в формате YYYY-MM-DD, '
+                                           'по умолчанию сегодня')
+        parser.add_argument('--forever', action='store_true',
+                            help='Не завершаться, а повторять пересчет '
+                                 'каждую полночь')
+
+    def handle(self, *args, **options):
+        date = None
+        if options['date'] is not None:
+            try:
+                date = dt.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Неверный формат даты')
+        self.rollover(date)
+        while options['forever']:
+            time.sleep(seconds_until_midnight() + 1)
+            self.rollover(None)
+
+    def rollover(self, date):
+        names = rollover_current_versions(date)
+        for name in names:
+            self.stdout.write(f'{name}: актуальная версия пересчитана')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано наименований: {len(names)}'))
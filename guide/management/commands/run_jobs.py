@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from guide.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди api/jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Число одновременно выполняемых задач')
+        parser.add_argument('--once', action='store_true',
+                            help='Завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        run_worker(options['workers'], options['once'], stdout=self.stdout)
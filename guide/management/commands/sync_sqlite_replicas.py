@@ -0,0 +1,47 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from guide.routers import get_replica_settings
+
+
+def sqlite_path(name):
+    # Имя базы может быть URI вида file:<путь>?mode=ro
+    name = str(name)
+    if name.startswith('file:'):
+        name = name[len('file:'):].partition('?')[0]
+    return name
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из GUIDE_REPLICAS '
+            'для локальной проверки чтения с реплик')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = get_replica_settings()['DATABASES']
+        if not replicas:
+            raise CommandError('Реплики не заданы: укажите файлы в '
+                               'переменной окружения GUIDE_SQLITE_REPLICAS')
+        databases = [primary] + [settings.DATABASES[alias]
+                                 for alias in replicas]
+        if any(not database['ENGINE'].endswith('sqlite3')
+               for database in databases):
+            raise CommandError('Копирование поддерживается только для '
+                               'SQLite')
+        source = sqlite3.connect(sqlite_path(primary['NAME']))
+        try:
+            for alias in replicas:
+                path = sqlite_path(settings.DATABASES[alias]['NAME'])
+                target = sqlite3.connect(path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: {path}')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено реплик: {len(replicas)}'))
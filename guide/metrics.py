@@ -0,0 +1,312 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from guide.cache import elements_cache
+
+DEFAULTS = {
+    # Каталог для объединения метрик нескольких рабочих процессов.
+    # Если не задан, /metrics отдает метрики только своего процесса.
+    'MULTIPROCESS_DIR': None,
+    # Как часто процесс сохраняет свои метрики в каталог, в секундах
+    'FLUSH_INTERVAL': 5,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+# Поля RouteStats после гистограммы
+COUNT, LATENCY, QUERIES, SQL_TIME, REQUEST_BYTES, RESPONSE_BYTES = range(6)
+
+
+def get_metrics_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_METRICS', {})
+
+
+class ThreadMetrics:
+    """
+    Метрики одного потока. Пишет в них только свой поток, поэтому
+    обновление не требует блокировок; при выдаче метрики всех потоков
+    суммируются.
+    """
+
+    def __init__(self):
+        # (маршрут, метод, статус) -> [бакеты..., счетчики по индексам выше]
+        self.routes = {}
+
+    def observe(self, key, latency, queries, sql_time, request_bytes,
+                response_bytes):
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = [0] * (len(LATENCY_BUCKETS) + 6)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                stats[index] += 1
+        base = len(LATENCY_BUCKETS)
+        stats[base + COUNT] += 1
+        stats[base + LATENCY] += latency
+        stats[base + QUERIES] += queries
+        stats[base + SQL_TIME] += sql_time
+        stats[base + REQUEST_BYTES] += request_bytes
+        stats[base + RESPONSE_BYTES] += response_bytes
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._flushed_at = 0
+
+    def current(self):
+        metrics = getattr(self._local, 'metrics', None)
+        if metrics is None:
+            metrics = self._local.metrics = ThreadMetrics()
+            # Блокировка нужна только при первой записи потока
+            with self._lock:
+                self._threads.append(metrics)
+        return metrics
+
+    def collect(self):
+        """
+        Возвращает сумму метрик всех потоков процесса.
+        """
+        routes = {}
+        with self._lock:
+            threads = list(self._threads)
+        for metrics in threads:
+            for key, stats in list(metrics.routes.items()):
+                total = routes.setdefault(key, [0] * len(stats))
+                for index, value in enumerate(stats):
+                    total[index] += value
+        cache = elements_cache.stats()
+        return {'routes': routes, 'cache': cache}
+
+    def flush(self, force=False):
+        """
+        Сохраняет метрики процесса в каталог MULTIPROCESS_DIR не чаще
+        FLUSH_INTERVAL секунд.
+        """
+        options = get_metrics_settings()
+        directory = options['MULTIPROCESS_DIR']
+        now = time.monotonic()
+        if directory is None or (
+                not force and now - self._flushed_at < options[
+                    'FLUSH_INTERVAL']):
+            return
+        self._flushed_at = now
+        data = self.collect()
+        data['routes'] = [[list(key), stats]
+                          for key, stats in data['routes'].items()]
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as output:
+            json.dump(data, output)
+        os.replace(tmp_name, os.path.join(directory,
+                                          f'metrics-{os.getpid()}.json'))
+
+
+registry = Registry()
+
+
+def collect_all():
+    """
+    Возвращает метрики всех процессов, если задан MULTIPROCESS_DIR,
+    иначе только текущего процесса.
+    """
+    directory = get_metrics_settings()['MULTIPROCESS_DIR']
+    if directory is None:
+        return registry.collect()
+    registry.flush(force=True)
+    routes = {}
+    cache = {}
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for key, stats in data['routes']:
+            total = routes.setdefault(tuple(key), [0] * len(stats))
+            for index, value in enumerate(stats):
+                total[index] += value
+        for name, value in data['cache'].items():
+            cache[name] = cache.get(name, 0) + value
+    return {'routes': routes, 'cache': cache}
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items())
+
+
+def render_metrics(data):
+    """
+    Формирует текст метрик в формате Prometheus.
+    """
+    base = len(LATENCY_BUCKETS)
+    counters = (
+        ('guide_http_requests_total', 'Число запросов', COUNT),
+        ('guide_db_queries_total', 'Число SQL-запросов', QUERIES),
+        ('guide_db_query_seconds_total', 'Время выполнения SQL-запросов',
+         SQL_TIME),
+        ('guide_http_request_bytes_total', 'Размер тел запросов',
+         REQUEST_BYTES),
+        ('guide_http_response_bytes_total', 'Размер тел ответов',
+         RESPONSE_BYTES),
+    )
+    routes = sorted(data['routes'].items())
+    lines = []
+    for name, help_text, index in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (route, method, status), stats in routes:
+            labels = _labels(route=route, method=method, status=status)
+            lines.append(f'{name}{{{labels}}} {stats[base + index]}')
+    name = 'guide_http_request_duration_seconds'
+    lines.append(f'# HELP {name} Время обработки запроса')
+    lines.append(f'# TYPE {name} histogram')
+    for (route, method, status), stats in routes:
+        labels = _labels(route=route, method=method, status=status)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} '
+                         f'{stats[index]}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} '
+                     f'{stats[base + COUNT]}')
+        lines.append(f'{name}_sum{{{labels}}} {stats[base + LATENCY]}')
+        lines.append(f'{name}_count{{{labels}}} {stats[base + COUNT]}')
+    cache = data['cache']
+    for key in ('hits', 'misses', 'evictions'):
+        name = f'guide_elements_cache_{key}_total'
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {cache.get(key, 0)}')
+    for key in ('versions', 'elements'):
+        name = f'guide_elements_cache_{key}'
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {cache.get(key, 0)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(collect_all()),
+                        content_type='text/plain; version=0.0.4')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+
+
+def count_queries(counter):
+    """
+    Возвращает контекст, в котором counter учитывает запросы ко всем базам
+    данных.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики запросов к URL приложения guide: число запросов,
+    гистограмму времени обработки, число и время SQL-запросов, размеры
+    запросов и ответов. Работает и в синхронном, и в асинхронном режиме,
+    поэтому под ASGI асинхронные представления выполняются без переключения
+    в поток.
+    Тело потокового ответа формируется после выхода из промежуточного
+    слоя, поэтому такой ответ учитывается при закрытии потока: вместе с
+    его размером, SQL-запросами и временем формирования тела.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with count_queries(counter):
+            response = self.get_response(request)
+        return self.observe(request, response, started, counter)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        # Асинхронный ORM выполняет запросы в потоке с контекстом запроса,
+        # то есть через те же соединения
+        with count_queries(counter):
+            response = await self.get_response(request)
+        return self.observe(request, response, started, counter)
+
+    def observe(self, request, response, started, counter):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.app_name != 'guide':
+            return response
+        key = (match.route, request.method, response.status_code)
+        request_bytes = int(request.META.get('CONTENT_LENGTH') or 0)
+
+        def record(response_bytes):
+            registry.current().observe(
+                key, time.perf_counter() - started, counter.count,
+                counter.time, request_bytes, response_bytes)
+            registry.flush()
+
+        if not response.streaming:
+            record(len(response.content))
+        elif response.is_async:
+            response.streaming_content = _acount_stream(
+                response.streaming_content, counter, record)
+        else:
+            response.streaming_content = _count_stream(
+                response.streaming_content, counter, record)
+        return response
+
+
+def _count_stream(chunks, counter, record):
+    size = 0
+    try:
+        with count_queries(counter):
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+    finally:
+        # Поток прочитан или закрыт сервером
+        record(size)
+
+
+async def _acount_stream(chunks, counter, record):
+    size = 0
+    try:
+        with count_queries(counter):
+            async for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+    finally:
+        record(size)
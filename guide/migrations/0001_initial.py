@@ -0,0 +1,130 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:20
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('guide', 'Справочник'), ('element', 'Элемент справочника')], max_length=15, verbose_name='Объект')),
+                ('action', models.CharField(choices=[('save', 'Добавление или изменение'), ('delete', 'Удаление')], max_length=15, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('guide_id', models.BigIntegerField(verbose_name='id справочника')),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Данные')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение справочника',
+                'verbose_name_plural': 'Журнал изменений справочников',
+                'indexes': [models.Index(fields=['entity', 'guide_id', 'object_id', 'id'], name='guide_chang_entity_da8e9d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Guide',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255, null=True, verbose_name='Наименование')),
+                ('short_name', models.CharField(blank=True, max_length=63, null=True, verbose_name='Короткое наименование')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('version', models.CharField(max_length=63, verbose_name='Версия')),
+                ('start_date', models.DateField(verbose_name='Дата начала действия справочника этой версии')),
+                ('revision', models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Ревизия')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('shard', models.CharField(blank=True, editable=False, max_length=63, verbose_name='Шард элементов')),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='derived', to='guide.guide', verbose_name='Базовая версия')),
+            ],
+            options={
+                'verbose_name': 'Справочник',
+                'verbose_name_plural': 'Справочники',
+            },
+        ),
+        migrations.CreateModel(
+            name='GuideCurrentVersion',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Наименование')),
+                ('refreshed_on', models.DateField(verbose_name='Дата, на которую определена версия')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='Действует до')),
+                ('guide', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='guide.guide')),
+            ],
+            options={
+                'verbose_name': 'Актуальная версия справочника',
+                'verbose_name_plural': 'Актуальные версии справочников',
+            },
+        ),
+        migrations.CreateModel(
+            name='GuideElement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('element_code', models.CharField(max_length=63, verbose_name='Код элемента')),
+                ('value', models.CharField(max_length=255, verbose_name='Значение элемента')),
+                ('removed', models.BooleanField(default=False, verbose_name='Удален')),
+                ('guide', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='elements', to='guide.guide')),
+            ],
+            options={
+                'verbose_name': 'Элемент справочника',
+                'verbose_name_plural': 'Элементы справочника',
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=31, verbose_name='Тип')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка'), ('cancelled', 'Отменена')], default='queued', max_length=15, verbose_name='Состояние')),
+                ('params', models.JSONField(default=dict, verbose_name='Параметры')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('processed', models.PositiveBigIntegerField(default=0, verbose_name='Обработано')),
+                ('total', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Всего')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Запрошена отмена')),
+                ('worker', models.CharField(blank=True, max_length=255, verbose_name='Обработчик')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'indexes': [models.Index(fields=['status', 'id'], name='guide_job_status_0819cd_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['version', 'start_date'], name='guide_guide_version_6a7df9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['name', 'start_date'], name='guide_guide_name_bdaf63_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='guide',
+            unique_together={('name', 'version')},
+        ),
+        migrations.AddIndex(
+            model_name='guidecurrentversion',
+            index=models.Index(fields=['valid_until'], name='guide_guide_valid_u_04b4c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guideelement',
+            index=models.Index(fields=['element_code'], name='guide_guide_element_cad928_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guideelement',
+            index=models.Index(fields=['guide', 'id'], name='guide_guide_guide_i_cc7eae_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='guideelement',
+            unique_together={('guide', 'element_code')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guide', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='guide',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='derived', to='guide.guide', verbose_name='Базовая версия'),
+        ),
+    ]
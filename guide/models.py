@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -11,12 +12,29 @@ class Guide(models.Model):
     version = models.CharField('Версия', max_length=63)
     start_date = models.DateField(
         'Дата начала действия справочника этой версии')
+    # Отметка изменения версии: увеличивается при любой записи элементов,
+    # используется для ETag и проверки актуальности кэшей
+    revision = models.PositiveBigIntegerField('Ревизия', default=0,
+                                              editable=False)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    # Версия, построенная на базовой, хранит только добавленные,
+    # измененные и удаленные относительно нее элементы. Базовую версию
+    # можно удалить только вместе с построенными на ней
+    base = models.ForeignKey('self', on_delete=models.RESTRICT,
+                             related_name='derived', blank=True, null=True,
+                             verbose_name='Базовая версия')
+    # База данных (шард), в которой хранятся элементы версии; пусто -
+    # default. Назначается при создании и меняется командой
+    # rebalance_shards
+    shard = models.CharField('Шард элементов', max_length=63, blank=True,
+                             editable=False)
 
     class Meta:
         verbose_name = 'Справочник'
         verbose_name_plural = 'Справочники'
         indexes = [
-            models.Index(fields=['version', 'start_date'])
+            models.Index(fields=['version', 'start_date']),
+            models.Index(fields=['name', 'start_date']),
         ]
         unique_together = ('name', 'version')
 
@@ -24,21 +42,148 @@ class Guide(models.Model):
         return f'{self.short_name} version-{self.version}'
 
 
+class GuideCurrentVersion(models.Model):
+    """
+    Актуальная версия справочника с наименованием name. Запись
+    пересчитывается при изменении справочников этого наименования и
+    командой rollover_guides, когда наступает дата начала действия
+    следующей версии.
+    """
+    name = models.CharField('Наименование', max_length=255, primary_key=True)
+    # Пусто, если ни одна версия еще не вступила в действие
+    guide = models.ForeignKey(Guide, on_delete=models.CASCADE,
+                              related_name='+', blank=True, null=True)
+    refreshed_on = models.DateField('Дата, на которую определена версия')
+    # Дата начала действия следующей версии: с нее запись устаревает
+    valid_until = models.DateField('Действует до', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Актуальная версия справочника'
+        verbose_name_plural = 'Актуальные версии справочников'
+        indexes = [
+            models.Index(fields=['valid_until']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.guide_id}'
+
+    def is_valid_on(self, date):
+        return self.refreshed_on <= date and (
+            self.valid_until is None or date < self.valid_until)
+
+
 class GuideElement(models.Model):
+    # Элементы могут храниться в другой базе, чем справочник (см.
+    # guide.sharding), поэтому связь не проверяется ограничением СУБД
     guide = models.ForeignKey(Guide, on_delete=models.CASCADE,
-                              related_name='elements')
+                              related_name='elements', db_constraint=False)
     element_code = models.CharField('Код элемента', max_length=63,
                                     unique=False)
     value = models.CharField('Значение элемента', max_length=255,
                              unique=False)
+    # Отметка удаления элемента базовой версии в производной версии
+    removed = models.BooleanField('Удален', default=False)
 
     class Meta:
         verbose_name = 'Элемент справочника'
         verbose_name_plural = 'Элементы справочника'
         indexes = [
-            models.Index(fields=['element_code', ])
+            models.Index(fields=['element_code', ]),
+            # Курсорная разбивка элементов справочника по id
+            models.Index(fields=['guide', 'id']),
         ]
         unique_together = ('guide', 'element_code')
 
     def __str__(self) -> str:
         return self.element_code
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений справочников и элементов для инкрементальной
+    синхронизации (api/changes). Записи только добавляются; команда
+    compact_changes удаляет записи, замененные более поздними.
+    """
+    GUIDE = 'guide'
+    ELEMENT = 'element'
+    ENTITIES = (
+        (GUIDE, 'Справочник'),
+        (ELEMENT, 'Элемент справочника'),
+    )
+    SAVE = 'save'
+    DELETE = 'delete'
+    ACTIONS = (
+        (SAVE, 'Добавление или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField('Объект', max_length=15, choices=ENTITIES)
+    action = models.CharField('Действие', max_length=15, choices=ACTIONS)
+    object_id = models.BigIntegerField('id объекта')
+    # Справочник объекта: для справочника - он сам
+    guide_id = models.BigIntegerField('id справочника')
+    # Состояние объекта после изменения, для удаления - пусто
+    data = models.JSONField('Данные', encoder=DjangoJSONEncoder, blank=True,
+                            null=True)
+    created_at = models.DateTimeField('Дата изменения', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение справочника'
+        verbose_name_plural = 'Журнал изменений справочников'
+        indexes = [
+            # Поиск более поздних записей того же объекта при сжатии.
+            # id элементов в разных шардах могут совпадать, поэтому
+            # объект определяется и справочником
+            models.Index(fields=['entity', 'guide_id', 'object_id', 'id']),
+        ]
+
+    def __str__(self) -> str:
+        return f'#{self.pk} {self.action} {self.entity} {self.object_id}'
+
+
+class Job(models.Model):
+    """
+    Фоновая задача: загрузка, выгрузка или пересборка снимков и индексов.
+    Задачи выполняет команда run_jobs.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+        (CANCELLED, 'Отменена'),
+    )
+
+    kind = models.CharField('Тип', max_length=31)
+    status = models.CharField('Состояние', max_length=15, choices=STATUSES,
+                              default=QUEUED)
+    params = models.JSONField('Параметры', default=dict)
+    result = models.JSONField('Результат', blank=True, null=True)
+    error = models.TextField('Ошибка', blank=True)
+    processed = models.PositiveBigIntegerField('Обработано', default=0)
+    total = models.PositiveBigIntegerField('Всего', blank=True, null=True)
+    cancel_requested = models.BooleanField('Запрошена отмена', default=False)
+    worker = models.CharField('Обработчик', max_length=255, blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    started_at = models.DateTimeField('Начата', blank=True, null=True)
+    finished_at = models.DateTimeField('Завершена', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind} #{self.pk}'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
@@ -0,0 +1,60 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Псевдоним кэша из CACHES
+    'CACHE': 'default',
+    # Время хранения страницы в секундах. Изменение данных меняет ключ
+    # страницы, поэтому срок ограничивает только занимаемую память.
+    'TIMEOUT': 300,
+}
+
+
+def get_page_cache_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_PAGE_CACHE', {})
+
+
+def page_cache_key(request, stamp):
+    """
+    Ключ страницы: адрес, все url-параметры (фильтры, страница, курсор)
+    и отметка изменения данных страницы.
+    """
+    digest = hashlib.sha1()
+    digest.update(f'{request.path}\0'.encode())
+    for param in sorted(request.GET):
+        digest.update(f'{param}={request.GET.getlist(param)}\0'.encode())
+    for part in stamp.parts:
+        digest.update(f'{part}\0'.encode())
+    return f'guide-page:{digest.hexdigest()}'
+
+
+class CachedPageMixin:
+    """
+    Кэширует отрисованные HTML-страницы. Ключ содержит отметку изменения
+    данных из get_change_stamp(), поэтому запись через GUI, admin или API
+    делает закэшированные страницы недоступными без явной очистки.
+    """
+
+    def get_change_stamp(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        options = get_page_cache_settings()
+        stamp = self.get_change_stamp() if options['ENABLED'] else None
+        if stamp is None:
+            return super().get(request, *args, **kwargs)
+        cache = caches[options['CACHE']]
+        key = page_cache_key(request, stamp)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, rendered.content,
+                                           options['TIMEOUT']))
+        return response
@@ -1,7 +1,130 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# Значение url-параметра pagination, включающее курсорную разбивку
+CURSOR_MODE = 'cursor'
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = None
+    max_page_size = 1000
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) разбивка по возрастанию id: без COUNT(*) и OFFSET,
+    результаты стабильны при конкурентных вставках.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+
+def is_cursor_mode(request):
+    params = getattr(request, 'query_params', request.GET)
+    return (params.get('pagination') == CURSOR_MODE or
+            IdCursorPagination.cursor_query_param in params)
+
+
+class OptInCursorPagination(StandardResultsSetPagination):
+    """
+    Постраничная разбивка по номеру страницы, а при url-параметре
+    ?pagination=cursor (или переданном курсоре) - курсорная разбивка по id.
+    """
+    cursor_class = IdCursorPagination
+    cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not is_cursor_mode(request):
+            self.cursor = None
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor = self.cursor_class()
+        return self.cursor.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return self.cursor.get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor is None:
+            return super().to_html()
+        return self.cursor.to_html()
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            super().get_schema_operation_parameters(view) +
+            self.cursor_class().get_schema_operation_parameters(view)
+        )
+
+
+class KeysetPage:
+    """
+    Страница курсорной разбивки для HTML-таблиц. Повторяет интерфейс
+    django.core.paginator.Page, который используется в шаблонах.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self.object_list[-1].pk if self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return self.object_list[0].pk if self.object_list else None
+
+
+class KeysetPaginator:
+    """
+    Курсорная разбивка queryset по pk для HTML-таблиц. Страница задается
+    pk последнего элемента предыдущей страницы (after) или первого элемента
+    следующей страницы (before). Запрос COUNT(*) не выполняется.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @staticmethod
+    def _parse_cursor(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def get_page(self, after=None, before=None):
+        after = self._parse_cursor(after)
+        before = self._parse_cursor(before)
+        if before is not None:
+            rows = list(self.queryset.filter(
+                pk__lt=before).order_by('-pk')[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            return KeysetPage(rows[:self.per_page][::-1],
+                              has_next=True, has_previous=has_previous)
+        queryset = self.queryset.order_by('pk')
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        rows = list(queryset[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page],
+                          has_next=len(rows) > self.per_page,
+                          has_previous=after is not None)
@@ -0,0 +1,306 @@
+import cProfile
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Каталог профилей; в нем хранятся последние MAX_PROFILES профилей
+    'DIR': None,
+    # Запрос с заголовком X-Guide-Profile: <TOKEN> профилируется всегда
+    'TOKEN': None,
+    # Доля случайно профилируемых запросов, от 0 до 1
+    'SAMPLE_RATE': 0,
+    'MAX_PROFILES': 50,
+    # Число функций с наибольшим собственным временем в профиле
+    'TOP_FUNCTIONS': 30,
+    # Число SQL-запросов, сохраняемых в хронологии запроса
+    'MAX_QUERIES': 500,
+}
+
+PROFILE_HEADER = 'HTTP_X_GUIDE_PROFILE'
+# Заголовок ответа с id сохраненного профиля
+PROFILE_ID_HEADER = 'X-Guide-Profile-Id'
+# Длина текста SQL-запроса в хронологии
+SQL_MAX_LENGTH = 1000
+# Число функций профиля на странице списка
+LIST_TOP_FUNCTIONS = 5
+
+PROFILE_ID = re.compile(r'^\d{20}-\d+$')
+
+
+def get_profiling_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_PROFILING', {})
+
+
+def profiles_dir():
+    return Path(get_profiling_settings()['DIR'])
+
+
+class QueryTimeline:
+    """
+    Хронология SQL-запросов: смещение от начала запроса, длительность,
+    база и текст запроса без параметров.
+    """
+
+    def __init__(self, started, limit):
+        self.started = started
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.time = 0.0
+
+    def wrapper(self, alias):
+        def execute_wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                self.count += 1
+                self.time += duration
+                if len(self.queries) < self.limit:
+                    self.queries.append({
+                        'start_ms': (started - self.started) * 1000,
+                        'duration_ms': duration * 1000,
+                        'database': alias,
+                        'sql': str(sql)[:SQL_MAX_LENGTH],
+                        'many': many,
+                    })
+        return execute_wrapper
+
+
+def top_functions(profiler, limit):
+    """
+    Функции профиля с наибольшим собственным временем.
+    """
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, own, total, _) in (
+            stats.stats.items()):
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'own_ms': own * 1000,
+            'total_ms': total * 1000,
+        })
+    rows.sort(key=lambda row: row['own_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _write_atomic(path, write):
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            write(output)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def save_profile(profile, profiler):
+    """
+    Сохраняет сводку профиля (JSON) и статистику cProfile (.prof, для
+    pstats или snakeviz), затем удаляет самые старые профили сверх
+    MAX_PROFILES. Возвращает id профиля.
+    """
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # id упорядочены по времени создания
+    profile_id = f'{time.time_ns():020d}-{os.getpid()}'
+    profile['id'] = profile_id
+    profiler.create_stats()
+    _write_atomic(directory / f'{profile_id}.prof',
+                  lambda output: marshal.dump(profiler.stats, output))
+    _write_atomic(directory / f'{profile_id}.json',
+                  lambda output: output.write(
+                      json.dumps(profile, ensure_ascii=False).encode()))
+    _prune(directory, get_profiling_settings()['MAX_PROFILES'])
+    return profile_id
+
+
+def _prune(directory, keep):
+    ids = sorted(path.stem for path in directory.glob('*.json'))
+    for profile_id in ids[:max(0, len(ids) - keep)]:
+        for suffix in ('.json', '.prof'):
+            try:
+                (directory / f'{profile_id}{suffix}').unlink()
+            except FileNotFoundError:
+                # Профиль уже удален другим процессом
+                pass
+
+
+def list_profiles():
+    """
+    Сохраненные профили, начиная с последнего.
+    """
+    if get_profiling_settings()['DIR'] is None:
+        return []
+    profiles = []
+    for path in sorted(profiles_dir().glob('*.json'), reverse=True):
+        try:
+            with open(path, encoding='utf-8') as source:
+                profiles.append(json.load(source))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def load_profile(profile_id):
+    if get_profiling_settings()['DIR'] is None or (
+            not PROFILE_ID.match(profile_id)):
+        raise Http404
+    try:
+        with open(profiles_dir() / f'{profile_id}.json',
+                  encoding='utf-8') as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        raise Http404
+
+
+class RequestProfile:
+    """
+    Профиль выполняемого запроса: cProfile и хронология SQL-запросов.
+    """
+
+    def __init__(self, max_queries):
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.timeline = QueryTimeline(self.started, max_queries)
+
+
+@contextmanager
+def profiling(max_queries):
+    """
+    Профилирует код внутри блока. Возвращает RequestProfile или None,
+    если уже работает другой профилировщик (Python 3.12+).
+    """
+    profile = RequestProfile(max_queries)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(
+                profile.timeline.wrapper(connection.alias)))
+        try:
+            profile.profiler.enable()
+        except ValueError:
+            yield None
+            return
+        try:
+            yield profile
+        finally:
+            profile.profiler.disable()
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует выбранные запросы к URL приложения guide: время функций
+    (cProfile) и хронологию SQL-запросов. Запрос профилируется, если в нем
+    передан заголовок X-Guide-Profile с TOKEN, или случайно с долей
+    SAMPLE_RATE. Без GUIDE_PROFILING промежуточный слой не подключается,
+    остальные запросы проходят без дополнительной работы.
+    cProfile учитывает только работу в потоке запроса: тело потокового
+    ответа формируется после выхода из промежуточного слоя. Под ASGI
+    асинхронный запрос профилируется в потоке цикла событий, запросы к
+    базе данных попадают только в хронологию SQL-запросов.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = get_profiling_settings()
+        if not options['ENABLED'] or options['DIR'] is None or (
+                not options['TOKEN'] and not options['SAMPLE_RATE']):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.token = options['TOKEN']
+        self.sample_rate = options['SAMPLE_RATE']
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_requested(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token is not None and self.token:
+            return hmac.compare_digest(token.encode(), self.token.encode())
+        return self.sample_rate and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_requested(request):
+            return self.get_response(request)
+        with profiling(get_profiling_settings()['MAX_QUERIES']) as profile:
+            response = self.get_response(request)
+        return self.save(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.is_requested(request):
+            return await self.get_response(request)
+        with profiling(get_profiling_settings()['MAX_QUERIES']) as profile:
+            response = await self.get_response(request)
+        return self.save(request, response, profile)
+
+    def save(self, request, response, profile):
+        if profile is None:
+            return response
+        duration = time.perf_counter() - profile.started
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.app_name != 'guide':
+            return response
+        timeline = profile.timeline
+        summary = {
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.route,
+            'status': response.status_code,
+            'duration_ms': duration * 1000,
+            'queries': timeline.count,
+            'sql_ms': timeline.time * 1000,
+            'functions': top_functions(
+                profile.profiler,
+                get_profiling_settings()['TOP_FUNCTIONS']),
+            'timeline': timeline.queries,
+        }
+        response[PROFILE_ID_HEADER] = save_profile(summary,
+                                                   profile.profiler)
+        return response
+
+
+def profiles_view(request):
+    profiles = list_profiles()
+    for profile in profiles:
+        profile['top'] = profile['functions'][:LIST_TOP_FUNCTIONS]
+    return render(request, 'profiles.html', {'profiles': profiles})
+
+
+def profile_view(request, profile_id):
+    return render(request, 'profile.html',
+                  {'profile': load_profile(profile_id)})
+
+
+def profile_stats_view(request, profile_id):
+    """
+    Отдает статистику cProfile профиля для pstats или snakeviz.
+    """
+    load_profile(profile_id)
+    return FileResponse(open(profiles_dir() / f'{profile_id}.prof', 'rb'),
+                        as_attachment=True,
+                        filename=f'{profile_id}.prof')
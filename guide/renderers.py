@@ -0,0 +1,104 @@
+import json
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+DEFAULTS = {
+    'ENABLED': False,
+}
+
+# Значение url-параметра fast, включающее быстрый путь для запроса
+FAST_QUERY_PARAM = 'fast'
+
+
+def get_fast_read_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_FAST_READ', {})
+
+
+def is_fast_read(request):
+    params = getattr(request, 'query_params', request.GET)
+    return (get_fast_read_settings()['ENABLED'] or
+            params.get(FAST_QUERY_PARAM) in ('1', 'true'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер для быстрого пути чтения. Использует orjson, если он
+    установлен, иначе стандартный json. Результат побайтно совпадает с
+    JSONRenderer для данных из строк, чисел, None, списков и словарей.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if orjson is not None:
+            try:
+                content = orjson.dumps(data)
+            except TypeError:
+                return super().render(data, accepted_media_type,
+                                      renderer_context)
+        else:
+            content = json.dumps(
+                data, ensure_ascii=False, allow_nan=not self.strict,
+                separators=(',', ':')).encode()
+        # Как и JSONRenderer, экранируем разделители строк для JavaScript
+        return content.replace(
+            b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def to_columns(rows):
+    """
+    Преобразует список одинаковых словарей в колоночный вид
+    {"fields": [имена полей], "columns": [[значения поля], ...]}.
+    Если элементы списка не словари, возвращает список без изменений.
+    """
+    if not rows:
+        return {'fields': [], 'columns': []}
+    if not all(isinstance(row, dict) for row in rows):
+        return rows
+    fields = list(rows[0])
+    return {
+        'fields': fields,
+        'columns': [[row.get(field) for row in rows] for field in fields],
+    }
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Компактный двоичный формат MessagePack. Списки записей передаются
+    по колонкам, чтобы имена полей не повторялись в каждой записи;
+    остальные поля ответа (count, next, previous, ошибки) - как есть.
+    Доступен, если установлен пакет msgpack.
+    """
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, list):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'),
+                                                   list):
+            data = dict(data, results=to_columns(data['results']))
+        return msgpack.packb(data, use_bin_type=True)
+
+
+# Дополнительные форматы ответов списков справочников и элементов
+COMPACT_RENDERERS = [MessagePackRenderer] if msgpack is not None else []
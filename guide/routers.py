@@ -0,0 +1,179 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+DEFAULTS = {
+    # Псевдонимы реплик из DATABASES, с которых выполняется чтение
+    'DATABASES': [],
+    # Как часто перепроверять доступность реплики, в секундах
+    'CHECK_INTERVAL': 5,
+    # Сколько секунд после записи запросы клиента читают с основной базы,
+    # пока изменения доходят до реплик; 0 - только до конца запроса
+    'PIN_SECONDS': 5,
+    # Модели, которые читаются с реплик; остальные (очередь задач, журнал
+    # изменений, пользователи, сессии, admin, contenttypes) всегда
+    # читаются с основной базы
+    'REPLICA_MODELS': ['guide.guide', 'guide.guidecurrentversion',
+                       'guide.guideelement'],
+}
+
+# Cookie, по которой запросы клиента после записи читают с основной базы
+PIN_COOKIE = 'guide_primary'
+
+
+def get_replica_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_REPLICAS', {})
+
+
+class RoutingState:
+    """
+    Состояние маршрутизации запроса: после первой записи все чтения
+    выполняются с основной базы.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('guide_routing_state', default=None)
+# Состояние вне запроса (команды, обработчики задач) - на поток
+_local = threading.local()
+
+
+def current_state():
+    state = _state.get()
+    if state is None:
+        state = getattr(_local, 'state', None)
+        if state is None:
+            state = _local.state = RoutingState()
+    return state
+
+
+class ReplicaHealth:
+    """
+    Доступность реплик. Реплика проверяется запросом SELECT 1 не чаще
+    CHECK_INTERVAL секунд; недоступная реплика исключается из выбора до
+    следующей проверки.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        healthy, checked_at = self._checked.get(alias, (True, None))
+        if checked_at is not None and now - checked_at < (
+                get_replica_settings()['CHECK_INTERVAL']):
+            return healthy
+        healthy = self._check(alias)
+        with self._lock:
+            self._checked[alias] = (healthy, now)
+        return healthy
+
+    def mark_failed(self, alias):
+        with self._lock:
+            self._checked[alias] = (False, time.monotonic())
+
+    def _check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            connections[alias].close()
+            return False
+        return True
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """
+    Направляет запись на основную базу, а чтение - по кругу на доступные
+    реплики из GUIDE_REPLICAS. После записи чтение до конца запроса (и
+    PIN_SECONDS для того же клиента) выполняется с основной базы, чтобы
+    клиент видел свои изменения. Внутри транзакции основной базы чтение
+    также выполняется с нее: реплики не видят незафиксированных
+    изменений. С реплик читаются только модели REPLICA_MODELS. Если
+    доступных реплик нет, чтение выполняется с основной базы.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def db_for_read(self, model, **hints):
+        options = get_replica_settings()
+        replicas = options['DATABASES']
+        if not replicas or current_state().pinned or (
+                model._meta.label_lower not in options['REPLICA_MODELS']) or (
+                connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        start = next(self._counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if replica_health.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = current_state()
+        state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replica_settings()['DATABASES']
+
+
+class ReplicaPinMiddleware:
+    """
+    Задает состояние маршрутизации на время запроса. Если запрос
+    выполнил запись, ставит cookie, по которой следующие PIN_SECONDS
+    запросы клиента читают с основной базы. Работает и в синхронном, и в
+    асинхронном режиме: асинхронный ORM выполняет запросы в потоке с
+    контекстом запроса и видит то же состояние.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    def pin(self, response, state):
+        pin_seconds = get_replica_settings()['PIN_SECONDS']
+        if state.wrote and pin_seconds:
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds,
+                                httponly=True, samesite='Lax')
+        return response
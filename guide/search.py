@@ -0,0 +1,226 @@
+import logging
+import weakref
+
+from django.db import DatabaseError, connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+
+from guide.models import Guide, GuideElement
+
+logger = logging.getLogger(__name__)
+
+# Триграммный индекс не находит подстроки короче трех символов,
+# для них выполняется обычный поиск LIKE
+MIN_INDEXED_LENGTH = 3
+
+# Поля, по которым строится индекс подстрочного поиска
+SEARCH_FIELDS = {
+    Guide: ('name',),
+    GuideElement: ('element_code', 'value'),
+}
+
+
+# Наличие таблиц индекса в базе соединения:
+# {соединение Django: (соединение СУБД, {модель: есть ли таблица})}
+_installed_tables = weakref.WeakKeyDictionary()
+
+
+def search_table(model):
+    return f'{model._meta.db_table}_search'
+
+
+class ContainsBackend:
+    """
+    Поиск подстроки без индекса: LIKE '%x%'. Используется для СУБД без
+    поддержки триграммных индексов. На PostgreSQL с индексами pg_trgm
+    такой же запрос выполняется по GIN-индексу.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def models(self):
+        """
+        Модели из SEARCH_FIELDS, таблицы которых есть в этой базе: в шардах
+        элементов хранится только таблица элементов.
+        """
+        return {model: fields for model, fields in SEARCH_FIELDS.items()
+                if router.allow_migrate_model(self.connection.alias, model)}
+
+    def install(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def filter(self, queryset, fields, term):
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__contains': term})
+        return queryset.filter(condition)
+
+
+class SqliteFtsBackend(ContainsBackend):
+    """
+    Поиск подстроки по виртуальным таблицам FTS5 с токенизатором trigram.
+    Таблицы хранят только индекс (external content), а триггеры
+    поддерживают его при любых изменениях, включая bulk_create.
+    """
+
+    def _statements(self, model, fields):
+        table = model._meta.db_table
+        search = search_table(model)
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+        delete = (f"INSERT INTO {search}({search}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+        insert = (f"INSERT INTO {search}(rowid, {columns}) "
+                  f"VALUES (new.id, {new_values});")
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {search} USING fts5("
+            f"{columns}, content='{table}', content_rowid='id', "
+            f"tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {search}_ai AFTER INSERT "
+            f"ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {search}_ad AFTER DELETE "
+            f"ON {table} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {search}_au AFTER UPDATE "
+            f"ON {table} BEGIN {delete} {insert} END",
+        ]
+
+    def is_installed(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s", [search_table(model)])
+            return cursor.fetchone() is not None
+
+    def has_index(self, model):
+        """
+        Проверяет наличие таблицы индекса модели model. Результат
+        запоминается до переподключения к базе.
+        """
+        self.connection.ensure_connection()
+        raw_connection = self.connection.connection
+        cached = _installed_tables.get(self.connection)
+        if cached is None or cached[0] is not raw_connection:
+            cached = _installed_tables[self.connection] = (
+                raw_connection, {})
+        tables = cached[1]
+        if model not in tables:
+            tables[model] = self.is_installed(model)
+        return tables[model]
+
+    def install(self):
+        for model, fields in self.models().items():
+            created = not self.is_installed(model)
+            with self.connection.cursor() as cursor:
+                for statement in self._statements(model, fields):
+                    cursor.execute(statement)
+            if created:
+                self._rebuild_table(model)
+        _installed_tables.pop(self.connection, None)
+
+    def _rebuild_table(self, model):
+        search = search_table(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search}({search}) VALUES ('rebuild')")
+
+    def rebuild(self):
+        for model in self.models():
+            self._rebuild_table(model)
+
+    def filter(self, queryset, fields, term):
+        """
+        Индекс без учета регистра отбирает кандидатов, а условие LIKE
+        оставляет из них те же записи, что и поиск без индекса, поэтому
+        результат не зависит от длины строки и наличия индекса. Без
+        таблицы индекса (не создана или SQLite собран без trigram)
+        выполняется поиск без индекса.
+        """
+        if len(term) < MIN_INDEXED_LENGTH or not self.has_index(
+                queryset.model):
+            return super().filter(queryset, fields, term)
+        search = search_table(queryset.model)
+        query = '{{{}}} : "{}"'.format(' '.join(fields),
+                                       term.replace('"', '""'))
+        candidates = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {search} WHERE {search} MATCH %s', [query]))
+        return super().filter(candidates, fields, term)
+
+
+class PostgresTrigramBackend(ContainsBackend):
+    """
+    Поиск подстроки по GIN-индексам pg_trgm: PostgreSQL использует их для
+    LIKE '%x%', поэтому сам запрос не отличается от ContainsBackend.
+    """
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for model, fields in self.models().items():
+                table = model._meta.db_table
+                for field in fields:
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {table}_{field}_trgm '
+                        f'ON {table} USING gin ({field} gin_trgm_ops)')
+
+
+BACKENDS = {
+    'sqlite': SqliteFtsBackend,
+    'postgresql': PostgresTrigramBackend,
+}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, ContainsBackend)(connection)
+
+
+def install_search_index(using='default'):
+    """
+    Создает индексы подстрочного поиска. Если СУБД их не поддерживает,
+    поиск продолжит работать без индекса.
+    """
+    try:
+        get_backend(using).install()
+    except DatabaseError as e:
+        logger.warning('Индекс поиска не создан: %s', e)
+
+
+def filter_contains(queryset, field, term):
+    """
+    Оставляет в queryset записи, у которых поле field содержит term.
+    """
+    if not term:
+        return queryset
+    return get_backend(queryset.db).filter(queryset, (field,), term)
+
+
+def search_elements(queryset, term, prefix=False):
+    """
+    Ищет term в кодах и значениях элементов queryset. Кандидаты отбираются
+    по индексу, затем ранжируются: точное совпадение кода, код начинается
+    с term, код содержит term, значение начинается с term, значение
+    содержит term; при равенстве - более короткие коды выше.
+    С prefix=True остаются только совпадения по началу кода или значения.
+    """
+    candidates = get_backend(queryset.db).filter(
+        queryset, ('element_code', 'value'), term)
+    if prefix:
+        candidates = candidates.filter(
+            Q(element_code__startswith=term) | Q(value__startswith=term))
+    return candidates.annotate(
+        rank=Case(
+            When(element_code=term, then=Value(0)),
+            When(element_code__startswith=term, then=Value(1)),
+            When(element_code__contains=term, then=Value(2)),
+            When(value__startswith=term, then=Value(3)),
+            default=Value(4),
+            output_field=IntegerField(),
+        ),
+        code_length=Length('element_code'),
+    ).order_by('rank', 'code_length', 'id')
@@ -1,17 +1,107 @@
+import datetime as dt
+
 from rest_framework import serializers
 
-from guide.models import Guide, GuideElement
+from guide.changes import decode_token
+from guide.jobs import job_eta
+from guide.models import Guide, GuideElement, Job
 
 
 class GuideSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Guide
-        fields = '__all__'
+        # Служебные отметки изменения передаются в заголовках ETag и
+        # Last-Modified, а базовая версия и шард относятся к способу
+        # хранения элементов
+        exclude = ('revision', 'updated_at', 'base', 'shard')
 
 
 class GuideElementSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GuideElement
-        fields = '__all__'
+        fields = ('id', 'element_code', 'value', 'guide')
+
+
+class GuideElementSearchSerializer(GuideElementSerializer):
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta(GuideElementSerializer.Meta):
+        fields = ('id', 'element_code', 'value', 'guide', 'rank')
+
+
+class JobSerializer(serializers.ModelSerializer):
+    eta_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'processed', 'total', 'eta_seconds',
+                  'cancel_requested', 'created_at', 'started_at',
+                  'finished_at', 'result', 'error')
+
+    def get_eta_seconds(self, job):
+        return job_eta(job)
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """
+    Параметры запроса журнала изменений.
+    """
+    after = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_after(self, value):
+        try:
+            decode_token(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class RowEncoder:
+    """
+    Преобразует кортежи из values_list в словари с теми же ключами и
+    значениями, что и to_representation сериализатора, без создания
+    экземпляров модели и вызова полей сериализатора для каждой строки.
+    Поддерживаются поля модели: числа, строки, даты и первичные ключи
+    связанных объектов.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.names = []
+        self.columns = []
+        self.converters = []
+        for name, field in serializer_class().fields.items():
+            model_field = model._meta.get_field(field.source)
+            self.names.append(name)
+            self.columns.append(model_field.attname)
+            if isinstance(field, serializers.DateField):
+                self.converters.append(dt.date.isoformat)
+            elif isinstance(field, serializers.CharField):
+                self.converters.append(str)
+            else:
+                self.converters.append(None)
+        self.names = tuple(self.names)
+        self.columns = tuple(self.columns)
+        self.converters = tuple(self.converters)
+        if all(converter is None or converter is str
+               for converter in self.converters):
+            # Строки из базы уже имеют нужный тип
+            self.encode = self._encode_plain
+
+    def _encode_plain(self, row):
+        return dict(zip(self.names, row))
+
+    def encode(self, row):
+        return {
+            name: value if converter is None or value is None
+            else converter(value)
+            for name, converter, value in zip(self.names, self.converters,
+                                              row)
+        }
+
+    def encode_many(self, rows):
+        encode = self.encode
+        return [encode(row) for row in rows]
@@ -0,0 +1,469 @@
+import datetime as dt
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from guide.cache import GuideSnapshot, elements_cache, invalidate_guide
+from guide.models import Guide, GuideCurrentVersion
+from guide.sharding import element_objects
+from guide.snapshots import SnapshotFile, open_snapshot, schedule_rebuild
+
+# Ограничение на число параметров в одном запросе: SQLite до 3.32
+# допускает не более 999 переменных, у остальных СУБД лимит выше.
+VALIDATION_CHUNK_SIZE = 900
+
+
+def resolve_guide(name, version=None, date=None):
+    """
+    Возвращает справочник по наименованию и версии. Если версия не указана,
+    возвращает актуальную на дату date (по умолчанию на сегодня) версию.
+    Актуальная на сегодня версия берется из GuideCurrentVersion, если
+    запись для наименования не устарела.
+    Если справочник не найден, возвращает None.
+    """
+    queryset = Guide.objects.filter(name=name)
+    if version is not None:
+        return queryset.filter(version=version).first()
+    today = timezone.localdate()
+    if date is None:
+        date = today
+    if name is not None and date == today:
+        pointer = GuideCurrentVersion.objects.select_related(
+            'guide').filter(name=name).first()
+        if pointer is not None and pointer.is_valid_on(date):
+            return pointer.guide
+    return queryset.filter(
+        start_date__lte=date).order_by('-start_date', '-pk').first()
+
+
+def valid_pointers(date):
+    """
+    Возвращает queryset записей GuideCurrentVersion, действующих на дату
+    date.
+    """
+    return GuideCurrentVersion.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gt=date),
+        refreshed_on__lte=date)
+
+
+def actual_guides(date):
+    """
+    Возвращает queryset справочников, актуальных на дату date: для каждого
+    наименования - версию с наибольшей датой начала действия не позже date.
+    Выбирается одним запросом с коррелированным подзапросом, который
+    использует индекс (name, start_date). На сегодняшнюю дату версии
+    наименований с действующей записью GuideCurrentVersion берутся из нее.
+    """
+    candidates = Guide.objects.filter(start_date__lte=date)
+    latest = candidates.filter(name=OuterRef('name'))
+    # Справочники без наименования считаются одной группой
+    latest_unnamed = candidates.filter(name__isnull=True)
+    condition = (
+        Q(pk=Subquery(latest.order_by('-start_date', '-pk').values('pk')[:1]))
+        | Q(name__isnull=True, pk=Subquery(
+            latest_unnamed.order_by('-start_date', '-pk').values('pk')[:1]))
+    )
+    if date == timezone.localdate():
+        pointers = valid_pointers(date)
+        condition = Q(pk__in=pointers.values('guide')) | (
+            ~Exists(pointers.filter(name=OuterRef('name'))) & condition)
+    return candidates.filter(condition)
+
+
+def refresh_current_version(name, date=None):
+    """
+    Пересчитывает запись GuideCurrentVersion для наименования name на дату
+    date (по умолчанию на сегодня). Если справочников с таким
+    наименованием нет, удаляет запись.
+    """
+    if name is None:
+        return
+    if date is None:
+        date = timezone.localdate()
+    guides = Guide.objects.filter(name=name)
+    current = guides.filter(start_date__lte=date).order_by(
+        '-start_date', '-pk').first()
+    next_start = guides.filter(start_date__gt=date).order_by(
+        'start_date').values_list('start_date', flat=True).first()
+    if current is None and next_start is None:
+        GuideCurrentVersion.objects.filter(name=name).delete()
+        return
+    GuideCurrentVersion.objects.update_or_create(
+        name=name, defaults={'guide': current, 'refreshed_on': date,
+                             'valid_until': next_start})
+
+
+def rollover_current_versions(date=None):
+    """
+    Пересчитывает устаревшие на дату date записи GuideCurrentVersion и
+    создает недостающие. Возвращает список пересчитанных наименований.
+    """
+    if date is None:
+        date = timezone.localdate()
+    stale = GuideCurrentVersion.objects.exclude(
+        pk__in=valid_pointers(date).values('pk')).values_list(
+        'name', flat=True)
+    missing = Guide.objects.exclude(name__isnull=True).exclude(
+        name__in=GuideCurrentVersion.objects.values('name')).values_list(
+        'name', flat=True).distinct()
+    names = sorted(set(stale) | set(missing))
+    for name in names:
+        with transaction.atomic():
+            refresh_current_version(name, date)
+    return names
+
+
+def derived_guides(guide_pk):
+    """
+    Возвращает список pk версий, построенных на версии guide_pk напрямую
+    или через другие версии.
+    """
+    result = []
+    frontier = [guide_pk]
+    while frontier:
+        frontier = [pk for pk in Guide.objects.filter(
+            base__in=frontier).values_list('pk', flat=True)
+            if pk not in result and pk != guide_pk]
+        result.extend(frontier)
+    return result
+
+
+def touch_guide(guide_pk):
+    """
+    Отмечает изменение элементов справочника: увеличивает ревизию и
+    обновляет дату изменения у него и у построенных на нем версий.
+    Возвращает список pk отмеченных версий.
+    """
+    pks = [guide_pk] + derived_guides(guide_pk)
+    Guide.objects.filter(pk__in=pks).update(
+        revision=F('revision') + 1, updated_at=timezone.now())
+    return pks
+
+
+def elements_changed(guide_pk):
+    """
+    Вызывается после изменения элементов справочника guide_pk: отмечает
+    изменение, сбрасывает кэш процесса и планирует пересборку снимков
+    для него и построенных на нем версий.
+    """
+    for pk in touch_guide(guide_pk):
+        invalidate_guide(pk)
+        # Повторный сброс после фиксации, чтобы не остался снимок,
+        # прочитанный другим потоком до фиксации
+        transaction.on_commit(partial(invalidate_guide, pk))
+        schedule_rebuild(pk)
+
+
+def base_chain(guide):
+    """
+    Возвращает список pk версий, из которых складываются элементы guide:
+    сама версия, ее базовая версия, базовая версия базовой и т.д.
+    Список запоминается в объекте guide.
+    """
+    chain = getattr(guide, '_base_chain', None)
+    if chain is None:
+        chain = [guide.pk]
+        base_pk = guide.base_id
+        while base_pk is not None and base_pk not in chain:
+            chain.append(base_pk)
+            base_pk = Guide.objects.filter(pk=base_pk).values_list(
+                'base_id', flat=True).first()
+        guide._base_chain = chain
+    return chain
+
+
+def guide_elements(guide):
+    """
+    Возвращает queryset элементов справочника guide. Для версии,
+    построенной на базовой, это ее собственные элементы и элементы базовых
+    версий, код которых не встречается в более новых версиях цепочки;
+    удаленные элементы исключаются. Запрос выполняется в базе, где
+    хранятся элементы справочника.
+    """
+    if guide is None:
+        return element_objects(guide).none()
+    elements = element_objects(guide)
+    if guide.base_id is None:
+        return elements.filter(guide=guide, removed=False)
+    chain = base_chain(guide)
+    condition = Q(guide=chain[0])
+    for depth, pk in enumerate(chain[1:], start=1):
+        overridden = elements.filter(
+            guide__in=chain[:depth], element_code=OuterRef('element_code'))
+        condition |= Q(guide=pk) & ~Exists(overridden)
+    return elements.filter(condition, removed=False)
+
+
+async def aguide_elements(guide):
+    """
+    Асинхронный вариант guide_elements: цепочка базовых версий читается
+    в отдельном потоке.
+    """
+    if guide is None or guide.base_id is None or hasattr(
+            guide, '_base_chain'):
+        return guide_elements(guide)
+    return await sync_to_async(guide_elements)(guide)
+
+
+def get_guide_source(name, version=None, date=None, lookup=False):
+    """
+    Возвращает источник элементов справочника для проверки по коду:
+    снимок из кэша процесса, если версия в нем помещается, иначе сам
+    справочник. Справочник определяется одним запросом, по его ревизии
+    проверяется актуальность снимка.
+    С lookup=True вместо загрузки снимка в память процесса используется
+    файл снимка, отображенный в память, если он собран для текущей
+    ревизии.
+    Если справочник не найден, возвращает None.
+    """
+    guide = resolve_guide(name, version, date)
+    if guide is None:
+        return None
+    if lookup:
+        snapshot_file = open_snapshot(guide)
+        if snapshot_file is not None:
+            return snapshot_file
+    return guide_source(guide)
+
+
+def guide_source(guide):
+    """
+    Возвращает снимок элементов уже найденного справочника guide из кэша
+    процесса или сам справочник, если снимок не помещается в кэш.
+    Снимок устаревшей ревизии перечитывается.
+    """
+    if guide is None:
+        return None
+    snapshot = elements_cache.get_snapshot(guide, guide_elements(guide))
+    return guide if snapshot is None else snapshot
+
+
+def _as_text(value):
+    # Приводим значения к строке так же, как это делает CharField
+    # при подготовке параметров запроса.
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_values(guide, codes, chunk_size=VALIDATION_CHUNK_SIZE):
+    """
+    Возвращает словарь {код элемента: значение} для тех кодов из codes,
+    которые есть в справочнике guide. Для снимка из кэша поиск выполняется
+    в памяти, иначе по одному запросу на каждые chunk_size кодов.
+    """
+    found = {}
+    if guide is None:
+        return found
+    if isinstance(guide, (GuideSnapshot, SnapshotFile)):
+        for code in codes:
+            value = guide.get(code)
+            if value is not None:
+                found[code] = value
+        return found
+    codes = list(codes)
+    elements = guide_elements(guide)
+    for chunk in _chunks(codes, chunk_size):
+        found.update(
+            elements.filter(
+                element_code__in=chunk
+            ).values_list('element_code', 'value')
+        )
+    return found
+
+
+def _parse_items(items):
+    pairs = []
+    for elem in items:
+        if isinstance(elem, dict):
+            pairs.append((_as_text(elem.get('element_code')),
+                          _as_text(elem.get('value'))))
+        else:
+            pairs.append((None, None))
+    codes = {code for code, value in pairs
+             if code is not None and value is not None}
+    return pairs, codes
+
+
+def _compare(pairs, found):
+    return {
+        index: value is not None and found.get(code) == value
+        for index, (code, value) in enumerate(pairs)
+    }
+
+
+def validate_elements(guide, items):
+    """
+    Проверяет список элементов items вида
+    [{"element_code": "Код", "value": "Значение"}, ...]
+    на наличие в справочнике guide (или его снимке из кэша).
+    Возвращает словарь {индекс элемента: результат проверки}.
+    """
+    pairs, codes = _parse_items(items)
+    return _compare(pairs, fetch_values(guide, codes))
+
+
+def validate_rows(guide, rows, batch_size=VALIDATION_CHUNK_SIZE):
+    """
+    Проверяет элементы из итератора пар (код, значение) на наличие в
+    справочнике guide (или его снимке) пачками по batch_size и по мере
+    чтения возвращает результаты
+    {"index": 0, "element_code": "Код", "valid": true}.
+    В памяти держится только текущая пачка.
+    """
+    index = 0
+    batch = []
+
+    def check(batch):
+        found = fetch_values(guide, {
+            code for code, value in batch
+            if code is not None and value is not None})
+        for number, (code, value) in enumerate(batch, start=index):
+            yield {'index': number, 'element_code': code,
+                   'valid': value is not None and found.get(code) == value}
+
+    for code, value in rows:
+        batch.append((_as_text(code), _as_text(value)))
+        if len(batch) >= batch_size:
+            yield from check(batch)
+            index += len(batch)
+            batch = []
+    if batch:
+        yield from check(batch)
+
+
+def _source_pk(source):
+    if isinstance(source, (GuideSnapshot, SnapshotFile)):
+        return source.guide_pk
+    return source.pk
+
+
+def _parse_date(value):
+    if value is None or isinstance(value, dt.date):
+        return value
+    try:
+        return dt.date.fromisoformat(str(value))
+    except ValueError:
+        raise ValidationError(f'Неверный формат даты: {value}')
+
+
+def check_elements_batch(items, resolve=False):
+    """
+    Проверяет элементы разных справочников за один вызов. Каждый элемент
+    items имеет вид
+    {"name": "Справочник", "version": "Версия", "date": "YYYY-MM-DD",
+     "element_code": "Код", "value": "Значение"},
+    где version и date необязательны (без них берется актуальная на
+    сегодня версия). Элементы группируются по найденной версии
+    справочника, и каждая группа проверяется одним поиском по множеству
+    кодов.
+    Возвращает словарь {индекс элемента: результат проверки}, а с
+    resolve=True - {индекс элемента: значение элемента с этим кодом или
+    None}; value в этом режиме не требуется.
+    При неверной дате вызывает ValidationError.
+    """
+    today = timezone.localdate()
+    keys = []
+    pairs = []
+    for elem in items:
+        if not isinstance(elem, dict) or elem.get('name') is None:
+            keys.append(None)
+            pairs.append((None, None))
+            continue
+        version = _as_text(elem.get('version'))
+        date = None if version is not None else (
+            _parse_date(elem.get('date')) or today)
+        keys.append((_as_text(elem['name']), version, date))
+        pairs.append((_as_text(elem.get('element_code')),
+                      _as_text(elem.get('value'))))
+    # Каждое сочетание (справочник, версия, дата) ищется один раз, а
+    # сочетания, указывающие на одну версию, проверяются вместе
+    sources = {}
+    codes_by_pk = {}
+    for key, (code, value) in zip(keys, pairs):
+        if key is None or code is None or (not resolve and value is None):
+            continue
+        if key not in sources:
+            sources[key] = get_guide_source(*key, lookup=True)
+        source = sources[key]
+        if source is not None:
+            codes_by_pk.setdefault(_source_pk(source), (source, set()))[
+                1].add(code)
+    found = {pk: fetch_values(source, codes)
+             for pk, (source, codes) in codes_by_pk.items()}
+    result = {}
+    for index, (key, (code, value)) in enumerate(zip(keys, pairs)):
+        source = sources.get(key)
+        values = {} if source is None else found.get(_source_pk(source), {})
+        if resolve:
+            result[index] = values.get(code)
+        else:
+            result[index] = value is not None and values.get(code) == value
+    return result
+
+
+# Асинхронные варианты для представлений из guide.async_views
+
+async def aresolve_guide(name, version=None, date=None):
+    """
+    Асинхронный вариант resolve_guide.
+    """
+    queryset = Guide.objects.filter(name=name)
+    if version is not None:
+        return await queryset.filter(version=version).afirst()
+    today = timezone.localdate()
+    if date is None:
+        date = today
+    if name is not None and date == today:
+        pointer = await GuideCurrentVersion.objects.select_related(
+            'guide').filter(name=name).afirst()
+        if pointer is not None and pointer.is_valid_on(date):
+            return pointer.guide
+    return await queryset.filter(
+        start_date__lte=date).order_by('-start_date', '-pk').afirst()
+
+
+async def aget_guide_source(name, version=None, date=None):
+    """
+    Асинхронный вариант get_guide_source(lookup=True). Загрузка снимка
+    в кэш при промахе выполняется в отдельном потоке.
+    """
+    guide = await aresolve_guide(name, version, date)
+    if guide is None:
+        return None
+    snapshot_file = open_snapshot(guide)
+    if snapshot_file is not None:
+        return snapshot_file
+    return await sync_to_async(guide_source)(guide)
+
+
+async def afetch_values(guide, codes, chunk_size=VALIDATION_CHUNK_SIZE):
+    """
+    Асинхронный вариант fetch_values.
+    """
+    if guide is None or isinstance(guide, (GuideSnapshot, SnapshotFile)):
+        return fetch_values(guide, codes)
+    found = {}
+    elements = await aguide_elements(guide)
+    for chunk in _chunks(list(codes), chunk_size):
+        async for code, value in elements.filter(
+                element_code__in=chunk).values_list('element_code', 'value'):
+            found[code] = value
+    return found
+
+
+async def avalidate_elements(guide, items):
+    """
+    Асинхронный вариант validate_elements.
+    """
+    pairs, codes = _parse_items(items)
+    return _compare(pairs, await afetch_values(guide, codes))
@@ -0,0 +1,235 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from guide.models import Guide, GuideElement
+
+# Число элементов, копируемых одним запросом при переносе
+MOVE_BATCH_SIZE = 5000
+
+DEFAULTS = {
+    # Псевдонимы баз из DATABASES, по которым распределяются элементы
+    # справочников. Пустой список - все элементы хранятся в default.
+    'DATABASES': [],
+    # Выводимые из работы шарды из DATABASES: элементы из них читаются,
+    # но новые справочники в них не размещаются, а rebalance_shards
+    # переносит их элементы в остальные шарды. После переноса шард можно
+    # убрать из DATABASES.
+    'DRAINING': [],
+}
+
+
+def get_shard_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_SHARDS', {})
+
+
+def sharding_enabled():
+    return bool(get_shard_settings()['DATABASES'])
+
+
+def element_databases():
+    """
+    Базы, в которых могут храниться элементы справочников.
+    """
+    return get_shard_settings()['DATABASES'] or [DEFAULT_DB_ALIAS]
+
+
+def placement_databases():
+    """
+    Базы, в которых размещаются элементы справочников: шарды, кроме
+    выводимых из работы.
+    """
+    options = get_shard_settings()
+    databases = [alias for alias in element_databases()
+                 if alias not in options['DRAINING']]
+    if not databases:
+        raise ImproperlyConfigured(
+            'Все шарды GUIDE_SHARDS выводятся из работы (DRAINING)')
+    return databases
+
+
+def shard_for_name(name):
+    """
+    Шард для справочника с наименованием name. Выбирается rendezvous-
+    хешированием: при добавлении или удалении шарда меняется шард только у
+    справочников, которые переходят на новый или лежали на удаленном.
+    """
+    key = (name or '').encode()
+
+    def score(alias):
+        return hashlib.blake2b(alias.encode() + b'\0' + key,
+                               digest_size=8).digest()
+
+    return max(placement_databases(), key=score)
+
+
+def guide_database(guide):
+    """
+    База, в которой хранятся элементы справочника guide (объект или pk).
+    """
+    if not sharding_enabled() or guide is None:
+        return DEFAULT_DB_ALIAS
+    if isinstance(guide, Guide):
+        shard = guide.shard
+    else:
+        shard = Guide.objects.filter(pk=guide).values_list(
+            'shard', flat=True).first()
+    return shard or DEFAULT_DB_ALIAS
+
+
+def element_objects(guide):
+    """
+    Менеджер элементов для базы справочника guide (объекта или pk). Без
+    шардирования чтение элементов распределяется маршрутизатором реплик.
+    """
+    if not sharding_enabled():
+        return GuideElement.objects
+    return GuideElement.objects.using(guide_database(guide))
+
+
+def placement_shard(guide):
+    """
+    Шард для элементов справочника guide: версия, построенная на базовой,
+    хранится вместе с базовой, чтобы элементы цепочки выбирались одним
+    запросом, остальные - по наименованию.
+    """
+    if guide.base_id is not None:
+        return guide_database(guide.base_id)
+    return shard_for_name(guide.name)
+
+
+def is_current_copy(element):
+    """
+    Проверяет, что element прочитан из базы, где сейчас хранятся элементы
+    его справочника, а не из оставшейся после переноса копии.
+    """
+    if not sharding_enabled():
+        return True
+    shard = Guide.objects.filter(pk=element.guide_id).values_list(
+        'shard', flat=True).first()
+    # Справочник уже удален: элементы удаляются вместе с ним
+    if shard is None:
+        return True
+    return element._state.db == (shard or DEFAULT_DB_ALIAS)
+
+
+def target_shard(guide):
+    """
+    Шард, в котором элементы справочника guide должны храниться при
+    текущем наборе шардов: шард наименования первой версии цепочки
+    базовых версий.
+    """
+    # Импорт здесь, так как services использует этот модуль
+    from guide.services import base_chain
+    root = base_chain(guide)[-1]
+    if root != guide.pk:
+        guide = Guide.objects.get(pk=root)
+    return shard_for_name(guide.name)
+
+
+def move_guide(guide, target, batch_size=MOVE_BATCH_SIZE):
+    """
+    Переносит элементы справочника guide в базу target: копирует их,
+    переключает справочник на новую базу и удаляет старые строки.
+    До переключения чтение идет из старой базы. id элементов в новой базе
+    назначаются заново, в журнал изменений записываются удаление старых и
+    добавление новых элементов. Возвращает число перенесенных элементов.
+    """
+    from guide.changes import record_elements, record_removed_elements
+    from guide.services import elements_changed
+    source = guide_database(guide)
+    rows = list(GuideElement.objects.using(source).filter(
+        guide=guide).order_by('id').values_list(
+        'id', 'element_code', 'value', 'removed'))
+    with transaction.atomic(using=target):
+        # Остатки прерванного переноса
+        GuideElement.objects.using(target).filter(guide=guide).delete()
+        for start in range(0, len(rows), batch_size):
+            GuideElement.objects.using(target).bulk_create(
+                GuideElement(guide_id=guide.pk, element_code=code,
+                             value=value, removed=removed)
+                for _, code, value, removed in rows[start:start + batch_size])
+    with transaction.atomic():
+        Guide.objects.filter(pk=guide.pk).update(shard=target)
+        guide.shard = target
+        record_removed_elements(guide.pk, [row[0] for row in rows])
+        record_elements(guide.pk, [row[1] for row in rows])
+        elements_changed(guide.pk)
+    # Сигналы удаления старых строк не записывают изменений: строки уже
+    # не относятся к текущей базе справочника (is_current_copy)
+    GuideElement.objects.using(source).filter(guide=guide).delete()
+    return len(rows)
+
+
+def rebalance_shards(dry_run=False, stdout=None):
+    """
+    Переносит элементы справочников, хранящиеся не в том шарде, который
+    выбирает target_shard для текущего набора шардов. Пока цепочка версий
+    переносится, часть ее элементов читается из старой базы, а часть - из
+    новой, поэтому переносить лучше при остановленной записи. Возвращает
+    список пар (справочник, новый шард).
+    Если элементы хранятся в базе, которой нет в GUIDE_SHARDS, ничего не
+    переносит и вызывает ImproperlyConfigured: такой шард нужно вернуть в
+    DATABASES и указать в DRAINING.
+    """
+    unknown = sorted(set(Guide.objects.exclude(shard='').exclude(
+        shard__in=element_databases()).values_list('shard', flat=True)))
+    if unknown:
+        raise ImproperlyConfigured(
+            f'Элементы справочников хранятся в базах, которых нет в '
+            f'GUIDE_SHARDS: {", ".join(unknown)}. Укажите их в DATABASES '
+            f'и DRAINING, чтобы перенести элементы в остальные шарды')
+    moved = []
+    for guide in Guide.objects.order_by('pk'):
+        current = guide_database(guide)
+        target = target_shard(guide)
+        if current == target:
+            continue
+        count = 0 if dry_run else move_guide(guide, target)
+        moved.append((guide, target))
+        if stdout is not None:
+            stdout.write(f'{guide}: {current} -> {target}, '
+                         f'{count} элементов')
+    return moved
+
+
+class ShardRouter:
+    """
+    Направляет запросы к элементам, связанные с конкретным справочником
+    или элементом, в базу его шарда. Запросы без такой подсказки должны
+    указывать базу явно через element_objects; остальные модели
+    обрабатывают следующие маршрутизаторы.
+    """
+
+    def _db_for_element(self, hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, Guide):
+            return guide_database(instance)
+        if isinstance(instance, GuideElement):
+            return instance._state.db or guide_database(instance.guide_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if model is GuideElement:
+            return self._db_for_element(hints)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model is GuideElement:
+            return self._db_for_element(hints)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {type(obj1), type(obj2)} <= {Guide, GuideElement}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # На шардах, кроме default, создается только таблица элементов
+        if db == DEFAULT_DB_ALIAS or db not in element_databases():
+            return None
+        return app_label == 'guide' and model_name == 'guideelement'
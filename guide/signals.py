@@ -0,0 +1,72 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from guide.cache import invalidate_guide
+from guide.changes import record_change
+from guide.models import ChangeLog, Guide, GuideCurrentVersion, GuideElement
+from guide.search import install_search_index
+from guide.services import elements_changed, refresh_current_version
+from guide.sharding import (element_objects, guide_database,
+                            is_current_copy, placement_shard,
+                            sharding_enabled)
+from guide.snapshots import remove_snapshot, schedule_rebuild
+
+
+@receiver(pre_save, sender=Guide)
+def place_guide(sender, instance, **kwargs):
+    # Шард назначается только новой версии: элементы существующей
+    # переносит команда rebalance_shards
+    if instance._state.adding and not instance.shard and sharding_enabled():
+        instance.shard = placement_shard(instance)
+
+
+@receiver(pre_delete, sender=Guide)
+def delete_sharded_elements(sender, instance, **kwargs):
+    # Каскадное удаление Django находит элементы только в базе справочника
+    if guide_database(instance) != DEFAULT_DB_ALIAS:
+        element_objects(instance).filter(guide=instance).delete()
+
+
+@receiver(post_save, sender=Guide)
+def guide_changed(sender, instance, **kwargs):
+    # При смене наименования пересчитывается и прежнее наименование
+    names = set(GuideCurrentVersion.objects.filter(
+        guide=instance.pk).values_list('name', flat=True))
+    names.add(instance.name)
+    for name in names:
+        refresh_current_version(name)
+    record_change(instance, ChangeLog.SAVE)
+    invalidate_guide(instance.pk)
+    schedule_rebuild(instance.pk)
+
+
+@receiver(post_delete, sender=Guide)
+def guide_deleted(sender, instance, **kwargs):
+    refresh_current_version(instance.name)
+    record_change(instance, ChangeLog.DELETE)
+    invalidate_guide(instance.pk)
+    remove_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=GuideElement)
+def guide_element_changed(sender, instance, **kwargs):
+    if not is_current_copy(instance):
+        return
+    record_change(instance, ChangeLog.SAVE)
+    elements_changed(instance.guide_id)
+
+
+@receiver(post_delete, sender=GuideElement)
+def guide_element_deleted(sender, instance, **kwargs):
+    if not is_current_copy(instance):
+        return
+    record_change(instance, ChangeLog.DELETE)
+    elements_changed(instance.guide_id)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    if sender.name == 'guide':
+        install_search_index(using)
@@ -0,0 +1,253 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from guide.models import Guide, Job
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIR': None,
+    # Ставить пересборку файла в очередь фоновых задач (run_jobs) после
+    # каждой фиксации изменений справочника
+    'AUTO_REBUILD': True,
+    # Число бит фильтра Блума на элемент, 0 - без фильтра
+    'BLOOM_BITS_PER_ELEMENT': 10,
+}
+
+MAGIC = b'GSNP'
+FORMAT_VERSION = 1
+# magic, версия формата, id справочника, ревизия, число элементов,
+# размер фильтра Блума в битах, число хеш-функций и выравнивание таблиц
+# смещений до 8 байт
+HEADER = struct.Struct('<4sIQQQQI4x')
+OFFSET_TYPE = 'Q'
+OFFSET_SIZE = 8
+
+
+def get_snapshot_settings():
+    return DEFAULTS | getattr(settings, 'GUIDE_SNAPSHOTS', {})
+
+
+def snapshots_enabled():
+    options = get_snapshot_settings()
+    return options['ENABLED'] and options['DIR'] is not None
+
+
+def snapshot_path(guide_pk):
+    return Path(get_snapshot_settings()['DIR']) / f'guide-{guide_pk}.snap'
+
+
+def _bloom_positions(code, bits, hashes):
+    digest = hashlib.blake2b(code, digest_size=16).digest()
+    first, second = struct.unpack('<QQ', digest)
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+def write_snapshot(path, guide, rows, bits_per_element=10):
+    """
+    Записывает в файл path снимок элементов справочника guide из итератора
+    пар (код, значение). Формат файла:
+    заголовок HEADER, смещения кодов (count + 1), смещения значений
+    (count + 1), коды, значения, биты фильтра Блума.
+    Коды упорядочены побайтно в UTF-8, что позволяет искать их бинарным
+    поиском. Файл заменяется атомарно.
+    """
+    items = sorted((code.encode(), value.encode()) for code, value in rows)
+    count = len(items)
+    bloom_bits = count * bits_per_element
+    bloom_hashes = max(1, round(bits_per_element * 0.69)) if bloom_bits else 0
+    bloom = bytearray((bloom_bits + 7) // 8)
+    code_offsets = array(OFFSET_TYPE, [0])
+    value_offsets = array(OFFSET_TYPE, [0])
+    for code, value in items:
+        code_offsets.append(code_offsets[-1] + len(code))
+        value_offsets.append(value_offsets[-1] + len(value))
+        if bloom_bits:
+            for pos in _bloom_positions(code, bloom_bits, bloom_hashes):
+                bloom[pos >> 3] |= 1 << (pos & 7)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(HEADER.pack(MAGIC, FORMAT_VERSION, guide.pk,
+                                     guide.revision, count, bloom_bits,
+                                     bloom_hashes))
+            output.write(code_offsets.tobytes())
+            output.write(value_offsets.tobytes())
+            for code, _ in items:
+                output.write(code)
+            for _, value in items:
+                output.write(value)
+            output.write(bloom)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    return count
+
+
+class SnapshotFile:
+    """
+    Снимок элементов справочника, отображенный в память только для чтения.
+    Страницы файла разделяются всеми процессами, открывшими его.
+    Поиск по коду - бинарный поиск, отсутствующие коды в большинстве
+    случаев отсекаются фильтром Блума.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, format_version, self.guide_pk, self.revision, self.count,
+         self.bloom_bits, self.bloom_hashes) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f'{path} не является снимком справочника')
+        offsets = memoryview(self._map)[HEADER.size:].cast('B')
+        table_size = (self.count + 1) * OFFSET_SIZE
+        self._code_offsets = offsets[:table_size].cast(OFFSET_TYPE)
+        self._value_offsets = offsets[
+            table_size:2 * table_size].cast(OFFSET_TYPE)
+        self._codes_start = HEADER.size + 2 * table_size
+        self._values_start = self._codes_start + self._code_offsets[-1]
+        self._bloom_start = self._values_start + self._value_offsets[-1]
+
+    def __len__(self):
+        return self.count
+
+    def _code(self, pos):
+        start = self._codes_start + self._code_offsets[pos]
+        return self._map[start:start + self._code_offsets[pos + 1] -
+                         self._code_offsets[pos]]
+
+    def _value(self, pos):
+        start = self._values_start + self._value_offsets[pos]
+        return self._map[start:start + self._value_offsets[pos + 1] -
+                         self._value_offsets[pos]].decode()
+
+    def _might_contain(self, code):
+        if not self.bloom_bits:
+            return True
+        for pos in _bloom_positions(code, self.bloom_bits,
+                                    self.bloom_hashes):
+            if not self._map[self._bloom_start + (pos >> 3)] & (
+                    1 << (pos & 7)):
+                return False
+        return True
+
+    def get(self, code, default=None):
+        code = code.encode()
+        if not self._might_contain(code):
+            return default
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._code(middle) < code:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._code(low) == code:
+            return self._value(low)
+        return default
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def open_snapshot(guide):
+    """
+    Возвращает отображенный в память снимок справочника guide, если файл
+    снимка существует и соответствует текущей ревизии справочника.
+    Новый файл, собранный другим процессом, подхватывается без перезапуска.
+    """
+    if guide is None or not snapshots_enabled():
+        return None
+    reader = _readers.get(guide.pk)
+    if reader is not None and reader.revision == guide.revision:
+        return reader
+    try:
+        reader = SnapshotFile(snapshot_path(guide.pk))
+    except (OSError, ValueError):
+        return None
+    if reader.revision != guide.revision:
+        return None
+    # Предыдущее отображение закроется, когда на него не останется ссылок
+    with _readers_lock:
+        _readers[guide.pk] = reader
+    return reader
+
+
+def build_snapshot(guide):
+    """
+    Собирает файл снимка справочника guide. Возвращает число элементов.
+    """
+    # Импорт здесь, так как services использует этот модуль
+    from guide.services import guide_elements
+    guide.refresh_from_db(fields=['revision'])
+    rows = guide_elements(guide).values_list(
+        'element_code', 'value').iterator(chunk_size=5000)
+    return write_snapshot(
+        snapshot_path(guide.pk), guide, rows,
+        get_snapshot_settings()['BLOOM_BITS_PER_ELEMENT'])
+
+
+def remove_snapshot(guide_pk):
+    if not snapshots_enabled():
+        return
+    with _readers_lock:
+        _readers.pop(guide_pk, None)
+    try:
+        os.unlink(snapshot_path(guide_pk))
+    except FileNotFoundError:
+        pass
+
+
+def _read_revision(guide_pk):
+    try:
+        with open(snapshot_path(guide_pk), 'rb') as source:
+            header = HEADER.unpack(source.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return header[3]
+
+
+def rebuild_snapshot(guide_pk):
+    """
+    Пересобирает снимок справочника guide_pk, если он собран не для
+    текущей ревизии, или удаляет снимок удаленного справочника.
+    Возвращает число элементов в пересобранном снимке.
+    """
+    guide = Guide.objects.filter(pk=guide_pk).first()
+    if guide is None:
+        remove_snapshot(guide_pk)
+    elif _read_revision(guide_pk) != guide.revision:
+        return build_snapshot(guide)
+    return 0
+
+
+def _queue_rebuild(guide_pk):
+    # Импорт здесь, так как jobs использует этот модуль
+    from guide.jobs import submit_job
+    # Несколько изменений до начала пересборки дают одну задачу
+    if not Job.objects.filter(kind='snapshots', status=Job.QUEUED,
+                              params__guide=guide_pk).exists():
+        submit_job('snapshots', {'guide': guide_pk})
+
+
+def schedule_rebuild(guide_pk):
+    """
+    Ставит пересборку снимка справочника в очередь фоновых задач после
+    фиксации текущей транзакции. Пока снимок не пересобран, он не
+    соответствует ревизии справочника и элементы ищутся без него.
+    """
+    if snapshots_enabled() and get_snapshot_settings()['AUTO_REBUILD']:
+        transaction.on_commit(partial(_queue_rebuild, guide_pk))
@@ -15,6 +15,21 @@ def url_replace(context, **kwargs):
     return urlencode(query)
 
 
+@register.simple_tag(takes_context=True)
+def cursor_url(context, **kwargs):
+    """
+    Строка запроса для перехода по курсорной разбивке: заменяет курсоры
+    after/before, сохраняя остальные параметры (фильтры).
+    """
+    query = context['request'].GET.copy()
+    for key in ('after', 'before', 'page'):
+        query.pop(key, None)
+    query['pagination'] = 'cursor'
+    for key, value in kwargs.items():
+        query[key] = value
+    return query.urlencode()
+
+
 @register.filter
 def quantity_left(quantity_list, item):
     return quantity_list.count(item)
@@ -0,0 +1,53 @@
+import datetime as dt
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+
+from guide.cache import elements_cache
+from guide.importers import import_elements
+from guide.models import Guide
+
+# Версия, действующая с этой даты, актуальна в любой день запуска тестов
+PAST = dt.date(2000, 1, 1)
+
+
+def create_guide(name, version='1', elements=(), start_date=PAST,
+                 base=None):
+    """
+    Создает версию справочника и загружает в нее элементы из пар
+    (код, значение).
+    """
+    guide = Guide.objects.create(name=name, short_name=name, version=version,
+                                 start_date=start_date, base=base)
+    if elements:
+        import_elements(guide, elements)
+        guide.refresh_from_db()
+    return guide
+
+
+def add_test_database(alias):
+    """
+    Добавляет базу alias с настройками default для тестов шардирования.
+    Вызывается при импорте модуля тестов, до создания тестовых баз:
+    тестовая база alias создается вместе с остальными.
+    """
+    if alias in connections.settings:
+        return
+    options = connections.settings[DEFAULT_DB_ALIAS]
+    connections.settings[alias] = {
+        **options, 'NAME': f'{options["NAME"]}_{alias}',
+        'TEST': {**options['TEST'], 'NAME': None}}
+
+
+@override_settings(GUIDE_SNAPSHOTS={'ENABLED': False})
+class GuideTestCase(TestCase):
+    """
+    Базовый класс тестов: кэши процесса очищаются перед каждым тестом,
+    файлы снимков не создаются.
+    """
+
+    def setUp(self):
+        super().setUp()
+        elements_cache.clear()
+        caches['default'].clear()
@@ -0,0 +1,80 @@
+import datetime as dt
+
+from rest_framework.test import APIClient
+
+from guide.cache import elements_cache
+from guide.services import check_elements_batch
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class BatchTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[('A1', 'one'), ('A2', 'two')])
+        create_guide('icd', version='2', start_date=dt.date(2001, 1, 1),
+                     elements=[('A1', 'new'), ('A3', 'three')])
+        create_guide('okved', elements=[('01', 'farming')])
+        self.client = APIClient()
+
+    def items(self, repeat=1):
+        items = [
+            {'name': 'icd', 'version': '1', 'element_code': 'A1',
+             'value': 'one'},
+            {'name': 'icd', 'version': '1', 'element_code': 'A3',
+             'value': 'three'},
+            {'name': 'icd', 'element_code': 'A1', 'value': 'new'},
+            {'name': 'icd', 'date': '2000-06-01', 'element_code': 'A2',
+             'value': 'two'},
+            # Дата и номер версии указывают на одну версию
+            {'name': 'icd', 'date': '2001-06-01', 'element_code': 'A3',
+             'value': 'three'},
+            {'name': 'icd', 'version': '2', 'element_code': 'A1',
+             'value': 'one'},
+            {'name': 'okved', 'element_code': '01', 'value': 'farming'},
+            {'name': 'missing', 'element_code': '01', 'value': 'farming'},
+            {'name': 'okved', 'element_code': '01'},
+            {'element_code': 'A1', 'value': 'one'},
+            'not an object',
+        ]
+        return items * repeat
+
+    def test_mixed_batch(self):
+        response = self.client.post('/api/check-elements', self.items(),
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            '0': True, '1': False, '2': True, '3': True, '4': True,
+            '5': False, '6': True, '7': False, '8': False, '9': False,
+            '10': False})
+
+    def test_resolve(self):
+        response = self.client.post('/api/check-elements?mode=resolve',
+                                    self.items(), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            '0': 'one', '1': None, '2': 'new', '3': 'two', '4': 'three',
+            '5': 'new', '6': 'farming', '7': None, '8': 'farming',
+            '9': None, '10': None})
+
+    def test_queries_do_not_depend_on_batch_size(self):
+        # По запросу на каждое различное сочетание (справочник, версия,
+        # дата), всего их 7; актуальная версия ищется по указателю текущей
+        # версии, а для неизвестного справочника без указателя выполняется
+        # еще один поиск. Элементы каждой из трех найденных версий
+        # читаются двумя запросами, затем берутся из кэша
+        for repeat in (1, 50):
+            elements_cache.clear()
+            with self.assertNumQueries(14):
+                check_elements_batch(self.items(repeat))
+            with self.assertNumQueries(8):
+                check_elements_batch(self.items(repeat))
+
+    def test_errors(self):
+        response = self.client.post('/api/check-elements?mode=unknown', [],
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/check-elements', [
+            {'name': 'icd', 'date': 'bad', 'element_code': 'A1',
+             'value': 'one'}], format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,30 @@
+import datetime as dt
+import json
+
+from django.test import Client
+
+from guide.benchmarks import BENCH_PREFIX, build_scenarios
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class BenchmarkTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        base = create_guide(f'{BENCH_PREFIX}0',
+                            elements=[('A1', 'one'), ('A2', 'two')])
+        create_guide(f'{BENCH_PREFIX}0', version='2', base=base,
+                     start_date=dt.date(2001, 1, 1))
+
+    def test_scenarios_use_inherited_elements(self):
+        scenarios = {scenario.name: scenario
+                     for scenario in build_scenarios(batch_sizes=(2,))}
+        payload = json.loads(scenarios['validate-2'].payload)
+        self.assertEqual([row['element_code'] for row in payload],
+                         ['A1', 'A2'])
+
+    def test_run_counts_queries(self):
+        scenario = build_scenarios(batch_sizes=(2,))[0]
+        result = scenario.run(Client(), iterations=1, warmup=0)
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
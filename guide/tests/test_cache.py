@@ -0,0 +1,55 @@
+from django.db.models import F
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from guide.cache import GuideSnapshot, elements_cache
+from guide.models import Guide, GuideElement
+from guide.services import get_guide_source, validate_elements
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class ElementsCacheTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guide = create_guide('icd', elements=[('A1', 'one'),
+                                                   ('A2', 'two')])
+
+    def test_cached_snapshot_costs_one_query(self):
+        source = get_guide_source('icd', '1')
+        self.assertIsInstance(source, GuideSnapshot)
+        # Справочник и его ревизия читаются всегда, элементы - из кэша
+        with self.assertNumQueries(1):
+            self.assertIs(get_guide_source('icd', '1'), source)
+
+    def test_element_save_invalidates_snapshot(self):
+        get_guide_source('icd')
+        element = GuideElement.objects.get(element_code='A1')
+        element.value = 'changed'
+        element.save()
+        source = get_guide_source('icd')
+        self.assertEqual(validate_elements(source, [
+            {'element_code': 'A1', 'value': 'changed'},
+            {'element_code': 'A1', 'value': 'one'}]), {0: True, 1: False})
+
+    def test_revision_from_other_process_invalidates_snapshot(self):
+        get_guide_source('icd', '1')
+        # Запись другого процесса: кэш этого процесса не сброшен, но
+        # ревизия справочника увеличена
+        GuideElement.objects.filter(element_code='A2').update(value='new')
+        Guide.objects.filter(pk=self.guide.pk).update(
+            revision=F('revision') + 1)
+        source = get_guide_source('icd', '1')
+        self.assertEqual(source.get('A2'), 'new')
+
+    def test_large_guide_is_not_cached(self):
+        with override_settings(GUIDE_ELEMENTS_CACHE={'MAX_ELEMENTS': 1}):
+            source = get_guide_source('icd', '1')
+        self.assertEqual(source, self.guide)
+        self.assertEqual(elements_cache.stats()['versions'], 0)
+
+    def test_get_pages_do_not_fill_cache(self):
+        response = APIClient().get('/api/get-elements?name=icd')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(elements_cache.stats()['versions'], 0)
@@ -0,0 +1,46 @@
+from django.test import Client
+from rest_framework.test import APIClient
+
+from guide.models import ChangeLog
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class ChangesTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guide = create_guide('icd', elements=[('A1', 'one'),
+                                                   ('A2', 'two')])
+        self.client = APIClient()
+
+    def test_pages(self):
+        response = self.client.get('/api/changes?limit=1')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['changes']), 1)
+        self.assertTrue(data['has_more'])
+        response = self.client.get(
+            f'/api/changes?after={data["next"]}&limit=100')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['has_more'])
+
+    def test_invalid_params(self):
+        response = self.client.get('/api/changes?limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.json())
+        response = self.client.get('/api/changes?limit=0')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.json())
+        response = self.client.get('/api/changes?after=bad')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('after', response.json())
+
+    def test_form_save_records_one_change(self):
+        logged = ChangeLog.objects.filter(entity=ChangeLog.GUIDE).count()
+        response = Client().post('/enter-guide', {
+            'name': 'icd', 'version': '1', 'short_name': 'ICD',
+            'start_date': '2000-01-01'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            ChangeLog.objects.filter(entity=ChangeLog.GUIDE).count(),
+            logged + 1)
@@ -0,0 +1,139 @@
+import gzip
+import json
+import unittest
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from guide.compression import (CompressionMiddleware, choose_encoding,
+                               zstandard)
+from guide.renderers import MessagePackRenderer, msgpack, to_columns
+from guide.tests.base import GuideTestCase, create_guide
+
+LARGE = 'значение ' * 200
+
+
+def compress(response, accept_encoding='gzip'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class NegotiationTests(SimpleTestCase):
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding(''))
+        self.assertEqual(choose_encoding('*'),
+                         'gzip' if zstandard is None else 'zstd')
+
+    @unittest.skipIf(zstandard is None, 'zstandard не установлен')
+    def test_zstd_preference(self):
+        self.assertEqual(choose_encoding('gzip, zstd'), 'zstd')
+        self.assertEqual(choose_encoding('gzip;q=1, zstd;q=0.5'), 'gzip')
+        self.assertEqual(choose_encoding('gzip, zstd;q=0'), 'gzip')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def test_gzip(self):
+        response = HttpResponse(LARGE, content_type='application/json')
+        response['ETag'] = '"abc"'
+        response = compress(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content).decode(), LARGE)
+
+    @unittest.skipIf(zstandard is None, 'zstandard не установлен')
+    def test_zstd(self):
+        response = compress(HttpResponse(LARGE), 'zstd')
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        content = zstandard.ZstdDecompressor().decompressobj().decompress(
+            response.content)
+        self.assertEqual(content.decode(), LARGE)
+
+    def test_not_accepted(self):
+        response = compress(HttpResponse(LARGE), 'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        # Ответ зависит от Accept-Encoding и без сжатия
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response.content.decode(), LARGE)
+
+    def test_min_size(self):
+        response = compress(HttpResponse('short'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+        with override_settings(GUIDE_COMPRESSION={'MIN_SIZE': 1}):
+            response = compress(HttpResponse('short' * 20))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_skipped_responses(self):
+        encoded = HttpResponse(LARGE)
+        encoded['Content-Encoding'] = 'br'
+        responses = [
+            encoded,
+            HttpResponse(LARGE, content_type='application/zip'),
+            StreamingHttpResponse(iter([LARGE]), content_type='image/png'),
+        ]
+        for response in responses:
+            with self.subTest(content_type=response['Content-Type']):
+                self.assertEqual(
+                    compress(response).get('Content-Encoding'),
+                    response.get('Content-Encoding'))
+
+    def test_streaming(self):
+        chunks = [LARGE, 'конец']
+        response = compress(StreamingHttpResponse(iter(chunks)))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        parts = list(response.streaming_content)
+        # Каждый фрагмент отправляется сразу, не дожидаясь конца потока
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(gzip.decompress(b''.join(parts)).decode(),
+                         ''.join(chunks))
+
+
+class CompressedViewsTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[(f'A{code}', f'значение {code}')
+                                      for code in range(100)])
+        self.client = APIClient()
+
+    def test_export_stream(self):
+        response = self.client.get('/api/export-elements?name=icd',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 100)
+
+    @unittest.skipIf(msgpack is None, 'msgpack не установлен')
+    def test_msgpack_round_trip(self):
+        url = '/api/get-elements?name=icd&page_size=20&page=2'
+        expected = self.client.get(url).json()
+        response = self.client.get(
+            url, HTTP_ACCEPT=MessagePackRenderer.media_type)
+        self.assertEqual(response['Content-Type'],
+                         MessagePackRenderer.media_type)
+        data = msgpack.unpackb(response.content, raw=False)
+        results = data.pop('results')
+        self.assertEqual(results['fields'],
+                         ['id', 'element_code', 'value', 'guide'])
+        rows = [dict(zip(results['fields'], values))
+                for values in zip(*results['columns'])]
+        self.assertEqual(dict(data, results=rows), expected)
+        self.assertLess(len(response.content),
+                        len(json.dumps(expected).encode()))
+
+    def test_to_columns(self):
+        self.assertEqual(to_columns([]), {'fields': [], 'columns': []})
+        self.assertEqual(to_columns([1, 2]), [1, 2])
+        self.assertEqual(to_columns([{'a': 1, 'b': 2}, {'a': 3, 'b': 4}]),
+                         {'fields': ['a', 'b'], 'columns': [[1, 3], [2, 4]]})
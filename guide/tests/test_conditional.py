@@ -0,0 +1,77 @@
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from guide.models import GuideElement
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class ConditionalGetTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guide = create_guide('icd', elements=[('A1', 'one')])
+        create_guide('other', elements=[('B1', 'two')])
+        self.client = APIClient()
+
+    def test_versioned_elements(self):
+        url = '/api/get-elements?name=icd&version=1'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(
+                timezone.now().timestamp() + 60))
+        self.assertEqual(response.status_code, 304)
+        element = GuideElement.objects.get(element_code='A1')
+        element.value = 'changed'
+        element.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['value'], 'changed')
+
+    def test_current_version_switch(self):
+        url = '/api/get-elements?name=icd'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Актуальная версия может смениться более старой
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        create_guide('icd', '2', [('A2', 'two')],
+                     start_date=timezone.localdate())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['element_code'], 'A2')
+
+    def test_guides_list_after_delete(self):
+        url = '/api/get-guides'
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Удаление последнего измененного справочника уменьшает наибольшую
+        # дату изменения
+        last_modified = http_date(timezone.now().timestamp() + 60)
+        create_guide('newest').delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.guide.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_async_views_use_same_stamp(self):
+        url = '/api/get-elements?name=icd&version=1'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(
+            '/api/async/get-elements?name=icd&version=1',
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,86 @@
+import datetime as dt
+import json
+
+from rest_framework.test import APIClient
+
+from guide.diff import diff_elements
+from guide.importers import REMOVED, import_elements
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class DiffElementsTests(GuideTestCase):
+
+    def test_merge(self):
+        old = [('A1', 'one'), ('A2', 'two'), ('A4', 'four')]
+        new = [('A0', 'zero'), ('A2', 'changed'), ('A4', 'four'),
+               ('A5', 'five')]
+        self.assertEqual(list(diff_elements(old, new)), [
+            {'change': 'added', 'element_code': 'A0', 'value': 'zero'},
+            {'change': 'removed', 'element_code': 'A1', 'value': 'one'},
+            {'change': 'changed', 'element_code': 'A2',
+             'old_value': 'two', 'value': 'changed'},
+            {'change': 'added', 'element_code': 'A5', 'value': 'five'},
+        ])
+
+
+class GuideElementsDiffTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.base = create_guide('icd', elements=[
+            ('A1', 'one'), ('A2', 'two'), ('A3', 'three'), ('B1', 'b')])
+        # Вторая версия хранит только отличия от первой
+        self.second = create_guide('icd', version='2', base=self.base,
+                                   start_date=dt.date(2001, 1, 1))
+        import_elements(self.second, [('A2', 'changed'), ('A1', REMOVED),
+                                      ('A4', 'four')])
+        # Третья версия возвращает удаленный во второй элемент и удаляет
+        # унаследованный из первой
+        self.third = create_guide('icd', version='3', base=self.second,
+                                  start_date=dt.date(2002, 1, 1))
+        import_elements(self.third, [('A1', 'again'), ('B1', REMOVED)])
+        self.client = APIClient()
+
+    def get_diff(self, query):
+        response = self.client.get(f'/api/diff-elements?name=icd&{query}')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines]
+
+    def test_added_removed_changed(self):
+        self.assertEqual(self.get_diff('from_version=1&to_version=2'), [
+            {'change': 'removed', 'element_code': 'A1', 'value': 'one'},
+            {'change': 'changed', 'element_code': 'A2',
+             'old_value': 'two', 'value': 'changed'},
+            {'change': 'added', 'element_code': 'A4', 'value': 'four'},
+            {'summary': {'added': 1, 'removed': 1, 'changed': 1}},
+        ])
+
+    def test_chain_of_deltas(self):
+        # Без to_version сравнение с актуальной версией, третьей
+        self.assertEqual(self.get_diff('from_version=1'), [
+            {'change': 'changed', 'element_code': 'A1',
+             'old_value': 'one', 'value': 'again'},
+            {'change': 'changed', 'element_code': 'A2',
+             'old_value': 'two', 'value': 'changed'},
+            {'change': 'added', 'element_code': 'A4', 'value': 'four'},
+            {'change': 'removed', 'element_code': 'B1', 'value': 'b'},
+            {'summary': {'added': 1, 'removed': 1, 'changed': 2}},
+        ])
+        self.assertEqual(self.get_diff('from_version=3&to_version=2'), [
+            {'change': 'removed', 'element_code': 'A1', 'value': 'again'},
+            {'change': 'added', 'element_code': 'B1', 'value': 'b'},
+            {'summary': {'added': 1, 'removed': 1, 'changed': 0}},
+        ])
+
+    def test_same_version(self):
+        self.assertEqual(self.get_diff('from_version=2&to_version=2'), [
+            {'summary': {'added': 0, 'removed': 0, 'changed': 0}},
+        ])
+
+    def test_errors(self):
+        response = self.client.get('/api/diff-elements?name=icd')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            '/api/diff-elements?name=icd&from_version=9')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from guide.exporters import EXPORT_FIELDS, export_batches
+from guide.importers import REMOVED, import_elements
+from guide.jobs import claim_job, run_job
+from guide.models import Job
+from guide.tests.base import GuideTestCase, create_guide
+
+
+def parse(file_format, content):
+    """
+    Разбирает выгрузку в список словарей с полями EXPORT_FIELDS.
+    """
+    text = content.decode()
+    if file_format == 'ndjson':
+        return [json.loads(line) for line in text.splitlines()]
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == list(EXPORT_FIELDS)
+    return [dict(zip(EXPORT_FIELDS, (int(id_), code, value, int(guide))))
+            for id_, code, value, guide in rows[1:]]
+
+
+class ExportTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(GUIDE_JOBS={'DIR': directory})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.base = create_guide('icd', elements=[
+            ('A1', 'one'), ('A2', 'two'), ('A3', 'три, "кавычки"')])
+        self.guide = create_guide('icd', version='2', base=self.base)
+        import_elements(self.guide, [('A2', 'changed'), ('A1', REMOVED),
+                                     ('A4', 'four')])
+        self.client = APIClient()
+
+    def expected(self):
+        return [
+            {'id': id_, 'element_code': code, 'value': value,
+             'guide': guide}
+            for batch in export_batches(self.guide) for
+            id_, code, value, guide in batch
+        ]
+
+    def test_expected_elements(self):
+        # Унаследованные элементы без удаленных, в порядке id
+        self.assertEqual(
+            [(row['element_code'], row['value']) for row in self.expected()],
+            [('A3', 'три, "кавычки"'), ('A2', 'changed'), ('A4', 'four')])
+
+    def test_direct_export(self):
+        for file_format in ('ndjson', 'csv'):
+            with self.subTest(file_format=file_format):
+                response = self.client.get(
+                    f'/api/export-elements?name=icd&version=2'
+                    f'&file_format={file_format}')
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.streaming)
+                content = b''.join(response.streaming_content)
+                self.assertEqual(parse(file_format, content),
+                                 self.expected())
+
+    def test_job_export(self):
+        for file_format in ('ndjson', 'csv'):
+            with self.subTest(file_format=file_format):
+                response = self.client.post(
+                    f'/api/jobs?kind=export&name=icd&version=2'
+                    f'&file_format={file_format}')
+                self.assertEqual(response.status_code, 202)
+                run_job(claim_job('test'))
+                job = Job.objects.get(pk=response.json()['id'])
+                self.assertEqual(job.status, Job.DONE)
+                self.assertEqual(job.result, {'rows': 3,
+                                              'file_format': file_format})
+                response = self.client.get(f'/api/jobs/{job.pk}/result')
+                self.assertEqual(response.status_code, 200)
+                content = b''.join(response.streaming_content)
+                self.assertEqual(parse(file_format, content),
+                                 self.expected())
+
+    def test_errors(self):
+        response = self.client.get('/api/export-elements')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            '/api/export-elements?name=icd&file_format=xml')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/export-elements?name=missing')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,47 @@
+import datetime as dt
+from unittest import mock
+
+from rest_framework.test import APIClient
+
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class FastReadTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[
+            (f'A{code:02}', f'значение "{code}" \\') for code in range(25)])
+        create_guide('icd', version='2', start_date=dt.date(2001, 1, 1),
+                     elements=[('B1', '')])
+        create_guide(None, version='1')
+        self.client = APIClient()
+
+    def assert_same_output(self, url):
+        response = self.client.get(url)
+        fast = self.client.get(f'{url}&fast=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast['Content-Type'], response['Content-Type'])
+        # Ссылки на соседние страницы сохраняют параметр fast
+        self.assertEqual(
+            fast.content.replace(b'fast=1&', b'').replace(b'&fast=1', b''),
+            response.content)
+
+    def test_get_guides(self):
+        for query in ('page_size=2', 'page_size=2&page=2',
+                      'date=actual', 'date=2000-06-01'):
+            with self.subTest(query=query):
+                self.assert_same_output(f'/api/get-guides?{query}')
+
+    def test_get_elements(self):
+        for query in ('name=icd', 'name=icd&version=1&page=2&page_size=7',
+                      'name=icd&version=1&page_size=100',
+                      'name=icd&version=2', 'name=missing'):
+            with self.subTest(query=query):
+                self.assert_same_output(f'/api/get-elements?{query}')
+
+    @mock.patch('guide.renderers.orjson', None)
+    def test_without_orjson(self):
+        self.assert_same_output('/api/get-guides?page_size=100')
+        self.assert_same_output('/api/get-elements?name=icd&version=1')
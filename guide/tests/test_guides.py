@@ -0,0 +1,105 @@
+import datetime as dt
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from guide.models import GuideCurrentVersion
+from guide.services import (actual_guides, resolve_guide,
+                            rollover_current_versions)
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class ActualGuidesTests(GuideTestCase):
+
+    def create_versions(self, names):
+        """
+        Создает по три версии каждого наименования, действующие с 2000,
+        2001 и 2002 годов. Возвращает версии по годам.
+        """
+        versions = {}
+        for name in names:
+            for number in range(3):
+                guide = create_guide(name, version=str(number + 1),
+                                     start_date=dt.date(2000 + number, 1, 1))
+                versions.setdefault(2000 + number, set()).add(guide.pk)
+        return versions
+
+    def test_one_query_on_date(self):
+        versions = self.create_versions(['icd', 'okved', 'oksm'])
+        with self.assertNumQueries(1):
+            guides = set(actual_guides(dt.date(2001, 6, 1)).values_list(
+                'pk', flat=True))
+        self.assertEqual(guides, versions[2001])
+
+    def test_one_query_today(self):
+        versions = self.create_versions(['icd', 'okved', 'oksm'])
+        with self.assertNumQueries(1):
+            guides = set(actual_guides(timezone.localdate()).values_list(
+                'pk', flat=True))
+        self.assertEqual(guides, versions[2002])
+
+    def test_api_queries_do_not_grow_with_guides(self):
+        client = APIClient()
+        self.create_versions(['icd', 'okved'])
+        with CaptureQueriesContext(connection) as few:
+            response = client.get('/api/get-guides?date=2001-06-01')
+        self.assertEqual(len(response.json()['results']), 2)
+        self.create_versions(['oksm', 'mkb', 'okato', 'okpd'])
+        with CaptureQueriesContext(connection) as many:
+            response = client.get('/api/get-guides?date=2001-06-01')
+        self.assertEqual(len(response.json()['results']), 6)
+        self.assertEqual(len(many), len(few))
+
+
+class CurrentVersionTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.tomorrow = self.today + dt.timedelta(days=1)
+        self.current = create_guide('icd')
+        self.future = create_guide('icd', version='2',
+                                   start_date=self.tomorrow)
+
+    def pointer(self):
+        pointer = GuideCurrentVersion.objects.get(name='icd')
+        return pointer.guide_id, pointer.refreshed_on, pointer.valid_until
+
+    def test_pointer_follows_changes(self):
+        self.assertEqual(self.pointer(),
+                         (self.current.pk, self.today, self.tomorrow))
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_guide('icd'), self.current)
+        self.future.delete()
+        self.assertEqual(self.pointer(), (self.current.pk, self.today, None))
+
+    def test_rollover(self):
+        with mock.patch('django.utils.timezone.localdate',
+                        return_value=self.tomorrow):
+            # Устаревший указатель не используется
+            self.assertEqual(resolve_guide('icd'), self.future)
+            self.assertEqual(
+                list(actual_guides(self.tomorrow).values_list('pk',
+                                                              flat=True)),
+                [self.future.pk])
+            self.assertEqual(rollover_current_versions(), ['icd'])
+            self.assertEqual(self.pointer(),
+                             (self.future.pk, self.tomorrow, None))
+            with self.assertNumQueries(1):
+                self.assertEqual(resolve_guide('icd'), self.future)
+            # Действующие указатели не пересчитываются
+            self.assertEqual(rollover_current_versions(), [])
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('rollover_guides', date=self.tomorrow.isoformat(),
+                     stdout=stdout)
+        self.assertIn('icd: актуальная версия пересчитана',
+                      stdout.getvalue())
+        self.assertEqual(self.pointer(),
+                         (self.future.pk, self.tomorrow, None))
@@ -0,0 +1,124 @@
+import json
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from guide.importers import import_elements, iter_csv_rows
+from guide.jobs import claim_job, run_job
+from guide.models import Job
+from guide.services import guide_elements
+from guide.tests.base import GuideTestCase, create_guide
+
+URL = '/api/import-elements?name=icd&version=1'
+
+
+def ndjson(*items):
+    return ''.join(
+        (item if isinstance(item, str) else json.dumps(item)) + '\n'
+        for item in items)
+
+
+class ImportTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guide = create_guide('icd', elements=[('A1', 'one')])
+        self.client = APIClient()
+
+    def elements(self):
+        return dict(guide_elements(self.guide).values_list(
+            'element_code', 'value'))
+
+    def test_ndjson_error_rows_are_rejected(self):
+        body = ndjson(
+            {'element_code': 'A1', 'value': 'changed'},
+            {'element_code': 'A2', 'value': 'two'},
+            '{"element_code": "A3", ',
+            '["A4", "four"]',
+            {'element_code': 'A5'},
+            {'element_code': '', 'value': 'empty'},
+            {'element_code': 'A' * 300, 'value': 'long code'},
+            {'element_code': 'A6', 'value': 6},
+            '',
+        )
+        response = self.client.post(URL, body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'inserted': 1, 'updated': 1,
+                                           'removed': 0, 'rejected': 6})
+        self.assertEqual(self.elements(), {'A1': 'changed', 'A2': 'two'})
+
+    def test_csv_error_rows_are_rejected(self):
+        body = ('element_code,value\n'
+                'A2,two\n'
+                'A3\n'
+                'A4,four,extra,columns\n'
+                '"A5,five\n')
+        response = self.client.post(URL + '&file_format=csv', body,
+                                    content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 1)
+        self.assertEqual(response.json()['rejected'], 3)
+        self.assertEqual(self.elements(), {'A1': 'one', 'A2': 'two'})
+
+    def test_invalid_encoding(self):
+        response = self.client.post(URL, b'\xff\xfe\xfa\n',
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.elements(), {'A1': 'one'})
+
+    def test_missing_params_and_guide(self):
+        response = self.client.post('/api/import-elements?name=icd', '',
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/import-elements?name=icd&version=2', '',
+            content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 404)
+
+    def test_batches_and_repeated_codes(self):
+        rows = [(f'B{number % 5}', str(number)) for number in range(12)]
+        result = import_elements(self.guide, rows, batch_size=2)
+        self.assertEqual(result, {'inserted': 5, 'updated': 7,
+                                  'removed': 0, 'rejected': 0})
+        # Побеждает последнее значение кода
+        self.assertEqual(self.elements(), {'A1': 'one', **dict(rows)})
+
+    def test_csv_header_and_bom(self):
+        rows = list(iter_csv_rows(['\ufeffelement_code,value\r\n',
+                                   'A2,two\r\n']))
+        self.assertEqual(rows, [('A2', 'two')])
+
+
+class ImportJobTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(GUIDE_JOBS={'DIR': directory})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.guide = create_guide('icd', elements=[('A1', 'one')])
+
+    def test_import_job(self):
+        client = APIClient()
+        body = ndjson({'element_code': 'A2', 'value': 'two'},
+                      'not json',
+                      {'element_code': 'A1', 'removed': True})
+        response = client.post('/api/jobs?kind=import&name=icd&version=1',
+                               body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 202)
+        run_job(claim_job('test'))
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'inserted': 1, 'updated': 0,
+                                      'removed': 1, 'rejected': 1})
+        response = client.get(f'/api/jobs/{job.pk}/result')
+        self.assertEqual(response.json(), job.result)
+        self.assertEqual(
+            list(guide_elements(self.guide).values_list('element_code',
+                                                        flat=True)),
+            ['A2'])
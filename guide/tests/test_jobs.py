@@ -0,0 +1,30 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import SimpleTestCase, override_settings
+
+from guide import jobs
+
+
+@override_settings(GUIDE_JOBS={'POLL_INTERVAL': 0})
+class WorkerTests(SimpleTestCase):
+
+    @mock.patch('guide.jobs.requeue_stale_jobs')
+    @mock.patch('guide.jobs.claim_job')
+    def test_database_error_does_not_stop_worker(self, claim_job, requeue):
+        claim_job.side_effect = [OperationalError('database is locked'),
+                                 None]
+        with self.assertLogs('guide.jobs', 'ERROR') as logs:
+            jobs.run_worker(once=True)
+        self.assertEqual(claim_job.call_count, 2)
+        self.assertIn('database is locked', logs.output[0])
+
+    @mock.patch('guide.jobs.run_job')
+    @mock.patch('guide.jobs.requeue_stale_jobs')
+    @mock.patch('guide.jobs.claim_job')
+    def test_finish_error_is_logged(self, claim_job, requeue, run_job):
+        claim_job.side_effect = [mock.Mock(), None]
+        run_job.side_effect = OperationalError('disk I/O error')
+        with self.assertLogs('guide.jobs', 'ERROR'):
+            jobs.run_worker(once=True)
+        run_job.assert_called_once()
@@ -0,0 +1,109 @@
+import gzip
+import logging
+import shutil
+import tempfile
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from guide.metrics import (COUNT, LATENCY_BUCKETS, QUERIES, RESPONSE_BYTES,
+                           registry)
+from guide.profiling import list_profiles
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class AsyncMiddlewareTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[
+            (f'A{code}', f'value {code}') for code in range(50)])
+
+    def assert_no_adaptation(self):
+        # Django сообщает о переключении промежуточного слоя в поток
+        # только при DEBUG
+        with override_settings(DEBUG=True), self.assertLogs(
+                'django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('loaded')
+        self.assertEqual(
+            [message for message in logs.output if 'adapted' in message],
+            [])
+
+    def test_middleware_chain_is_not_adapted(self):
+        self.assert_no_adaptation()
+
+    def test_profiling_middleware_is_not_adapted(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(GUIDE_PROFILING={
+                'ENABLED': True, 'DIR': directory, 'TOKEN': 'secret'}):
+            self.assert_no_adaptation()
+
+    def route_count(self, route):
+        stats = registry.collect()['routes'].get((route, 'GET', 200))
+        return 0 if stats is None else stats[len(LATENCY_BUCKETS) + COUNT]
+
+    async def test_async_view_through_middleware(self):
+        route = 'api/async/get-elements'
+        before = self.route_count(route)
+        response = await AsyncClient().get(
+            '/api/async/get-elements?name=icd&page_size=50',
+            headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'value 49', gzip.decompress(response.content))
+        self.assertEqual(self.route_count(route), before + 1)
+
+    async def test_async_view_profiling(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(GUIDE_PROFILING={
+                'ENABLED': True, 'DIR': directory, 'TOKEN': 'secret'}):
+            response = await AsyncClient().get(
+                '/api/async/get-elements?name=icd',
+                headers={'X-Guide-Profile': 'secret'})
+            self.assertTrue(response.has_header('X-Guide-Profile-Id'))
+            self.assertEqual(list_profiles()[0]['route'],
+                             'api/async/get-elements')
+
+
+class MetricsTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[
+            (f'A{code}', f'value {code}') for code in range(50)])
+
+    def route_stats(self, route):
+        stats = registry.collect()['routes'].get((route, 'GET', 200))
+        if stats is None:
+            return 0, 0, 0
+        base = len(LATENCY_BUCKETS)
+        return (stats[base + COUNT], stats[base + QUERIES],
+                stats[base + RESPONSE_BYTES])
+
+    def test_streaming_response(self):
+        route = 'api/export-elements'
+        count, queries, response_bytes = self.route_stats(route)
+        with CaptureQueriesContext(connection) as captured:
+            response = Client().get('/api/export-elements?name=icd')
+            self.assertTrue(response.streaming)
+            # Пока поток не прочитан, запрос не учтен
+            self.assertEqual(self.route_stats(route)[0], count)
+            content = b''.join(response.streaming_content)
+        self.assertIn(b'value 49', content)
+        self.assertEqual(self.route_stats(route), (
+            count + 1, queries + len(captured),
+            response_bytes + len(content)))
+
+    def test_response(self):
+        route = 'api/get-elements'
+        count, queries, response_bytes = self.route_stats(route)
+        with CaptureQueriesContext(connection) as captured:
+            response = Client().get('/api/get-elements?name=icd')
+        self.assertEqual(self.route_stats(route), (
+            count + 1, queries + len(captured),
+            response_bytes + len(response.content)))
@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from guide.importers import import_elements
+from guide.models import Guide, GuideElement
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class PageCacheTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.guide = create_guide('icd', elements=[('A1', 'first value'),
+                                                   ('A2', 'second value')])
+        self.client = Client()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def assert_cached(self, url):
+        with CaptureQueriesContext(connection) as rendered:
+            content = self.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(self.get(url), content)
+        self.assertLess(len(cached), len(rendered))
+
+    def test_element_save(self):
+        url = f'/guide-elements/{self.guide.pk}'
+        self.assert_cached(url)
+        element = GuideElement.objects.get(element_code='A1')
+        element.value = 'changed value'
+        element.save()
+        content = self.get(url)
+        self.assertIn('changed value', content)
+        self.assertNotIn('first value', content)
+
+    def test_import(self):
+        url = f'/guide-elements/{self.guide.pk}'
+        self.assert_cached(url)
+        # bulk_create не отправляет post_save
+        import_elements(self.guide, [('A3', 'imported value')])
+        self.assertIn('imported value', self.get(url))
+
+    def test_base_version_change(self):
+        derived = create_guide('icd', version='2', base=self.guide)
+        url = f'/guide-elements/{derived.pk}'
+        self.assertIn('first value', self.get(url))
+        import_elements(self.guide, [('A1', 'inherited value')])
+        self.assertIn('inherited value', self.get(url))
+
+    def test_guide_save(self):
+        self.assert_cached('/')
+        self.assert_cached(f'/guide-elements/{self.guide.pk}?page=1')
+        guide = Guide.objects.get(pk=self.guide.pk)
+        guide.short_name = 'Renamed guide'
+        guide.save()
+        self.assertIn('Renamed guide', self.get('/'))
+        create_guide('okved', elements=[('01', 'farming')])
+        self.assertIn('okved', self.get('/'))
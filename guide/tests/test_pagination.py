@@ -0,0 +1,30 @@
+from rest_framework.test import APIClient
+
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class PageSizeTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[(f'A{number}', str(number))
+                                      for number in range(1005)])
+        self.client = APIClient()
+
+    def test_oversized_page_size_is_clamped(self):
+        for url in ('/api/get-elements?name=icd',
+                    '/api/async/get-elements?name=icd'):
+            for mode in ('', '&pagination=cursor', '&fast=1'):
+                with self.subTest(url=url, mode=mode):
+                    response = self.client.get(
+                        f'{url}&page_size=100000000{mode}')
+                    self.assertEqual(response.status_code, 200)
+                    data = response.json()
+                    self.assertEqual(len(data['results']), 1000)
+                    self.assertIsNotNone(data['next'])
+
+    def test_page_size(self):
+        response = self.client.get('/api/get-elements?name=icd&page_size=5')
+        self.assertEqual(len(response.json()['results']), 5)
+        response = self.client.get('/api/get-elements?name=icd')
+        self.assertEqual(len(response.json()['results']), 10)
@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import Client, override_settings
+
+from guide.profiling import PROFILE_ID_HEADER, list_profiles, profiles_dir
+from guide.tests.base import GuideTestCase, create_guide
+
+TOKEN = 'secret'
+
+
+class ProfilingTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(GUIDE_PROFILING={
+            'ENABLED': True, 'DIR': directory, 'TOKEN': TOKEN,
+            'MAX_PROFILES': 2})
+        override.enable()
+        self.addCleanup(override.disable)
+        create_guide('icd', elements=[('A1', 'one')])
+        # Промежуточные слои загружаются при первом запросе клиента, уже
+        # с настройками теста
+        self.client = Client()
+
+    def profile(self, url='/api/get-elements?name=icd'):
+        return self.client.get(url, headers={'X-Guide-Profile': TOKEN})
+
+    def test_request_without_token(self):
+        response = self.client.get('/api/get-elements?name=icd')
+        self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        response = self.client.get('/api/get-elements?name=icd',
+                                   headers={'X-Guide-Profile': 'wrong'})
+        self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        self.assertEqual(list_profiles(), [])
+
+    def test_token_request(self):
+        response = self.profile()
+        self.assertEqual(response.status_code, 200)
+        profile_id = response[PROFILE_ID_HEADER]
+        profile, = list_profiles()
+        self.assertEqual(profile['id'], profile_id)
+        self.assertEqual(profile['route'], 'api/get-elements')
+        self.assertEqual(profile['status'], 200)
+        self.assertGreater(profile['queries'], 0)
+        self.assertEqual(len(profile['timeline']), profile['queries'])
+        self.assertTrue(profile['functions'])
+        self.assertTrue((profiles_dir() / f'{profile_id}.prof').exists())
+
+    def test_max_profiles(self):
+        ids = [self.profile()[PROFILE_ID_HEADER] for _ in range(3)]
+        self.assertEqual([profile['id'] for profile in list_profiles()],
+                         ids[:0:-1])
+        self.assertEqual(len(list(profiles_dir().glob('*.prof'))), 2)
+
+    def test_only_guide_urls(self):
+        response = self.profile('/metrics')
+        self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        self.assertEqual(list_profiles(), [])
+
+    def test_profile_pages_are_staff_only(self):
+        profile_id = self.profile()[PROFILE_ID_HEADER]
+        urls = ['/admin/profiles/', f'/admin/profiles/{profile_id}',
+                f'/admin/profiles/{profile_id}/stats']
+        for url in urls:
+            with self.subTest(user='anonymous', url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/admin/login/', response['Location'])
+        self.client.force_login(User.objects.create_user('user'))
+        for url in urls:
+            with self.subTest(user='user', url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/admin/login/', response['Location'])
+        self.client.force_login(
+            User.objects.create_user('staff', is_staff=True))
+        for url in urls:
+            with self.subTest(user='staff', url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get('/admin/profiles/missing')
+        self.assertEqual(response.status_code, 404)
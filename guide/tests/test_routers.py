@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from guide.models import ChangeLog, Guide, GuideElement, Job
+from guide.routers import PrimaryReplicaRouter, RoutingState, _state
+
+
+@override_settings(GUIDE_REPLICAS={'DATABASES': ['replica']})
+@mock.patch('guide.routers.replica_health.is_healthy', return_value=True)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        token = _state.set(RoutingState())
+        self.addCleanup(_state.reset, token)
+
+    def test_guide_models_read_from_replica(self, is_healthy):
+        for model in (Guide, GuideElement):
+            self.assertEqual(self.router.db_for_read(model), 'replica')
+
+    def test_other_models_read_from_primary(self, is_healthy):
+        for model in (User, Session, ContentType, Job, ChangeLog):
+            self.assertEqual(self.router.db_for_read(model), 'default')
+
+    def test_write_pins_reads(self, is_healthy):
+        self.assertEqual(self.router.db_for_write(Guide), 'default')
+        self.assertEqual(self.router.db_for_read(Guide), 'default')
+
+    def test_unhealthy_replica(self, is_healthy):
+        is_healthy.return_value = False
+        self.assertEqual(self.router.db_for_read(Guide), 'default')
+
+
+@override_settings(GUIDE_REPLICAS={'DATABASES': ['replica']})
+@mock.patch('guide.routers.replica_health.is_healthy', return_value=True)
+class AtomicRoutingTests(TestCase):
+
+    def test_atomic_block_reads_from_primary(self, is_healthy):
+        token = _state.set(RoutingState())
+        self.addCleanup(_state.reset, token)
+        with transaction.atomic():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Guide),
+                             'default')
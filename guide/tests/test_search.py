@@ -0,0 +1,61 @@
+from django.db import connection
+from rest_framework.test import APIClient
+
+from guide import search
+from guide.models import GuideElement
+from guide.search import ContainsBackend, filter_contains, search_table
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class SearchTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        search._installed_tables.clear()
+        self.guide = create_guide('icd', elements=[
+            ('A01', 'Острый синдром'),
+            ('A02', 'острый синдром'),
+            ('B01', 'ABC инфекция'),
+            ('B02', 'abc инфекция'),
+        ])
+
+    def tearDown(self):
+        search._installed_tables.clear()
+        super().tearDown()
+
+    def codes(self, queryset):
+        return sorted(queryset.values_list('element_code', flat=True))
+
+    def assert_same_as_like(self, field, term):
+        queryset = GuideElement.objects.filter(guide=self.guide)
+        expected = ContainsBackend(connection).filter(
+            queryset, (field,), term)
+        self.assertEqual(self.codes(filter_contains(queryset, field, term)),
+                         self.codes(expected))
+
+    def test_index_matches_like_for_any_term_length(self):
+        for term in ('Ос', 'Острый', 'остр', 'AB', 'ABC', 'abc', 'синдром'):
+            with self.subTest(term=term):
+                self.assert_same_as_like('value', term)
+
+    def test_without_index_table(self):
+        table = search_table(GuideElement)
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        search._installed_tables.clear()
+        self.assert_same_as_like('value', 'синдром')
+        response = APIClient().get(
+            '/api/search-elements?name=icd&q=инфекция')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        response = self.client.get(
+            f'/guide-elements/{self.guide.pk}?value=синдром')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_ranking(self):
+        response = APIClient().get('/api/search-elements?name=icd&q=A01')
+        results = response.json()['results']
+        self.assertEqual([row['element_code'] for row in results], ['A01'])
+        self.assertEqual(results[0]['rank'], 0)
@@ -0,0 +1,126 @@
+import io
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from guide.importers import REMOVED, import_elements
+from guide.models import GuideElement
+from guide.sharding import (ShardRouter, element_objects, guide_database,
+                            rebalance_shards, shard_for_name)
+from guide.tests.base import GuideTestCase, add_test_database, create_guide
+
+SHARDS = ['default', 'shard1', 'shard2']
+NAMES = [f'guide-{number}' for number in range(200)]
+
+
+@override_settings(GUIDE_SHARDS={'DATABASES': SHARDS})
+class ShardForNameTests(SimpleTestCase):
+
+    def test_names_spread_over_shards(self):
+        placement = {name: shard_for_name(name) for name in NAMES}
+        self.assertEqual(set(placement.values()), set(SHARDS))
+        self.assertEqual(placement,
+                         {name: shard_for_name(name) for name in NAMES})
+
+    def test_removed_shard_moves_only_its_guides(self):
+        before = {name: shard_for_name(name) for name in NAMES}
+        with self.settings(GUIDE_SHARDS={'DATABASES': SHARDS[:2]}):
+            after = {name: shard_for_name(name) for name in NAMES}
+        for name in NAMES:
+            if before[name] != 'shard2':
+                self.assertEqual(after[name], before[name])
+
+
+@override_settings(GUIDE_SHARDS={'DATABASES': SHARDS})
+class PlacementTests(GuideTestCase):
+
+    def test_new_guide_is_placed_by_name(self):
+        guide = create_guide('icd')
+        self.assertEqual(guide.shard, shard_for_name('icd'))
+        self.assertEqual(guide_database(guide), guide.shard)
+        self.assertEqual(guide_database(guide.pk), guide.shard)
+        self.assertEqual(element_objects(guide).db, guide.shard)
+
+    def test_derived_version_stays_with_base(self):
+        base = create_guide('icd')
+        name = next(name for name in NAMES
+                    if shard_for_name(name) != base.shard)
+        derived = create_guide(name, base=base)
+        self.assertEqual(derived.shard, base.shard)
+
+    def test_router_uses_guide_shard(self):
+        guide = create_guide('icd')
+        self.assertEqual(
+            ShardRouter().db_for_read(GuideElement, instance=guide),
+            guide.shard)
+        element = GuideElement(guide=guide, element_code='A1')
+        self.assertEqual(
+            ShardRouter().db_for_write(GuideElement, instance=element),
+            guide.shard)
+
+
+RETIRED = 'retired_shard'
+add_test_database(RETIRED)
+
+
+class ShardRetirementTests(GuideTestCase):
+    databases = {'default', RETIRED}
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        with self.settings(GUIDE_SHARDS={'DATABASES': ['default', RETIRED]}):
+            names = [name for name in NAMES
+                     if shard_for_name(name) == RETIRED]
+            self.guide = create_guide(names[0], elements=[
+                ('A1', 'one'), ('A2', 'two')])
+            self.derived = create_guide(names[0], version='2',
+                                        base=self.guide)
+            import_elements(self.derived, [('A2', 'changed'),
+                                           ('A1', REMOVED)])
+            self.other_name = names[1]
+        self.assertEqual(self.guide.shard, RETIRED)
+        self.assertEqual(self.derived.shard, RETIRED)
+
+    def get_elements(self, guide):
+        response = self.client.get(
+            f'/api/get-elements?name={guide.name}&version={guide.version}')
+        self.assertEqual(response.status_code, 200)
+        return {row['element_code']: row['value']
+                for row in response.json()['results']}
+
+    def test_drain_and_remove_shard(self):
+        with self.settings(GUIDE_SHARDS={'DATABASES': ['default', RETIRED],
+                                         'DRAINING': [RETIRED]}):
+            # Элементы выводимого шарда читаются, новые справочники в нем
+            # не размещаются
+            self.assertEqual(self.get_elements(self.derived),
+                             {'A2': 'changed'})
+            self.assertEqual(create_guide(self.other_name).shard, 'default')
+            stdout = io.StringIO()
+            call_command('rebalance_shards', stdout=stdout)
+            self.assertIn('Перенесено справочников: 2', stdout.getvalue())
+        self.assertFalse(GuideElement.objects.using(RETIRED).exists())
+        with self.settings(GUIDE_SHARDS={'DATABASES': ['default']}):
+            self.assertEqual(self.get_elements(self.guide),
+                             {'A1': 'one', 'A2': 'two'})
+            self.assertEqual(self.get_elements(self.derived),
+                             {'A2': 'changed'})
+            self.assertEqual(rebalance_shards(), [])
+
+    def test_removed_shard_is_reported(self):
+        with self.settings(GUIDE_SHARDS={'DATABASES': ['default']}):
+            with self.assertRaisesMessage(CommandError, RETIRED):
+                call_command('rebalance_shards', stdout=io.StringIO())
+        # Ничего не перенесено
+        self.assertEqual(
+            GuideElement.objects.using(RETIRED).filter(
+                guide=self.guide).count(), 2)
+
+    def test_all_shards_draining(self):
+        with self.settings(GUIDE_SHARDS={'DATABASES': ['default'],
+                                         'DRAINING': ['default']}):
+            with self.assertRaises(ImproperlyConfigured):
+                shard_for_name('icd')
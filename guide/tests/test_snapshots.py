@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from guide import snapshots
+from guide.cache import GuideSnapshot
+from guide.jobs import claim_job, run_job
+from guide.models import GuideElement, Job
+from guide.services import get_guide_source
+from guide.snapshots import (SnapshotFile, build_snapshot, open_snapshot,
+                             snapshot_path)
+from guide.tests.base import GuideTestCase, create_guide
+
+
+class SnapshotTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(
+            GUIDE_SNAPSHOTS={'ENABLED': True, 'DIR': directory},
+            GUIDE_JOBS={'DIR': directory})
+        override.enable()
+        self.addCleanup(override.disable)
+        snapshots._readers.clear()
+        self.guide = create_guide('icd', elements=[('A1', 'one'),
+                                                   ('A2', 'two')])
+
+    def change_element(self, code, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            element = GuideElement.objects.get(element_code=code)
+            element.value = value
+            element.save()
+        self.guide.refresh_from_db()
+
+    def test_lookup_uses_fresh_snapshot_file(self):
+        build_snapshot(self.guide)
+        source = get_guide_source('icd', '1', lookup=True)
+        self.assertIsInstance(source, SnapshotFile)
+        self.assertEqual(source.get('A1'), 'one')
+        self.assertIsNone(source.get('missing'))
+
+    def test_stale_snapshot_falls_back_to_database(self):
+        build_snapshot(self.guide)
+        self.change_element('A1', 'changed')
+        self.assertIsNone(open_snapshot(self.guide))
+        source = get_guide_source('icd', '1', lookup=True)
+        self.assertIsInstance(source, GuideSnapshot)
+        self.assertEqual(source.get('A1'), 'changed')
+
+    def test_changes_queue_one_rebuild_job(self):
+        self.change_element('A1', 'changed')
+        self.change_element('A2', 'changed')
+        jobs = Job.objects.filter(kind='snapshots', status=Job.QUEUED)
+        self.assertEqual(list(jobs.values_list('params', flat=True)),
+                         [{'guide': self.guide.pk}])
+        # Пересборка не выполняется в запросе
+        self.assertFalse(snapshot_path(self.guide.pk).exists())
+        run_job(claim_job('test'))
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        source = open_snapshot(self.guide)
+        self.assertIsInstance(source, SnapshotFile)
+        self.assertEqual(source.get('A2'), 'changed')
+
+    def test_delete_removes_snapshot(self):
+        build_snapshot(self.guide)
+        path = snapshot_path(self.guide.pk)
+        self.assertTrue(path.exists())
+        self.guide.delete()
+        self.assertFalse(path.exists())
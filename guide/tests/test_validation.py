@@ -0,0 +1,165 @@
+import json
+
+from rest_framework.test import APIClient
+
+from guide.models import GuideElement
+from guide.services import VALIDATION_CHUNK_SIZE, validate_elements
+from guide.tests.base import GuideTestCase, create_guide
+
+
+def validate_one_by_one(guide, items):
+    """
+    Проверка по одному запросу на элемент, как до перехода на поиск по
+    множеству кодов.
+    """
+    result = {}
+    for index, elem in enumerate(items):
+        if not isinstance(elem, dict) or elem.get('element_code') is None or (
+                elem.get('value') is None):
+            result[index] = False
+            continue
+        result[index] = GuideElement.objects.filter(
+            guide=guide, element_code=elem['element_code'],
+            value=elem['value']).exists()
+    return result
+
+
+class ValidateElementsTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.size = VALIDATION_CHUNK_SIZE * 2 + 1
+        self.guide = create_guide('icd', elements=[
+            (f'A{code}', f'value {code}') for code in range(self.size)])
+        self.client = APIClient()
+
+    def build_items(self):
+        items = []
+        for code in range(self.size):
+            value = f'value {code}' if code % 3 else 'wrong'
+            items.append({'element_code': f'A{code}', 'value': value})
+        items += [
+            # Повторы кодов и элементов
+            {'element_code': 'A1', 'value': 'value 1'},
+            {'element_code': 'A1', 'value': 'wrong'},
+            {'element_code': 'A1', 'value': 'value 1'},
+            # Отсутствующие коды и неполные элементы
+            {'element_code': 'missing', 'value': 'value 1'},
+            {'element_code': 'A2'},
+            {'value': 'value 2'},
+            {'element_code': None, 'value': None},
+            {},
+        ]
+        return items
+
+    def test_matches_per_item_queries(self):
+        items = self.build_items()
+        expected = validate_one_by_one(self.guide, items)
+        self.assertEqual(validate_elements(self.guide, items), expected)
+
+    def test_chunk_boundaries(self):
+        for count in (VALIDATION_CHUNK_SIZE - 1, VALIDATION_CHUNK_SIZE,
+                      VALIDATION_CHUNK_SIZE + 1):
+            items = [{'element_code': f'A{code}', 'value': f'value {code}'}
+                     for code in range(count)]
+            result = validate_elements(self.guide, items)
+            self.assertEqual(result, {index: True for index in range(count)})
+
+    def test_queries_per_chunk(self):
+        items = self.build_items()
+        # Поиск кодов в базе, без снимка из кэша: запрос на каждую пачку
+        with self.assertNumQueries(3):
+            validate_elements(self.guide, items)
+
+    def test_post_matches_per_item_queries(self):
+        items = self.build_items()
+        response = self.client.post('/api/get-elements?name=icd', items,
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        expected = validate_one_by_one(self.guide, items)
+        self.assertEqual(response.json(),
+                         {str(index): valid
+                          for index, valid in expected.items()})
+
+    def test_post_single_element(self):
+        response = self.client.post(
+            '/api/get-elements?name=icd&version=1',
+            {'element_code': 'A5', 'value': 'value 5'}, format='json')
+        self.assertEqual(response.json(), {'0': True})
+        response = self.client.post(
+            '/api/get-elements?name=icd&version=2',
+            {'element_code': 'A5', 'value': 'value 5'}, format='json')
+        self.assertEqual(response.json(), {'0': False})
+
+    def test_post_without_name(self):
+        response = self.client.post('/api/get-elements', [], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class NdjsonValidationTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_guide('icd', elements=[(f'A{code}', f'value {code}')
+                                      for code in range(1000)])
+        self.client = APIClient()
+
+    def post_lines(self, body):
+        response = self.client.post('/api/get-elements?name=icd', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        parts = list(response.streaming_content)
+        lines = b''.join(parts).decode().splitlines()
+        return parts, [json.loads(line) for line in lines]
+
+    def test_results_over_several_chunks(self):
+        lines = []
+        expected = []
+        for number in range(2 * VALIDATION_CHUNK_SIZE + 100):
+            code = f'A{number}'
+            if number % 7 == 0:
+                # Битая строка проверяется как неверный элемент
+                lines.append('{"element_code": ')
+                expected.append((None, False))
+            elif number % 5 == 0:
+                lines.append(json.dumps({'element_code': code,
+                                         'value': 'wrong'}))
+                expected.append((code, False))
+            else:
+                lines.append(json.dumps({'element_code': code,
+                                         'value': f'value {number}'}))
+                expected.append((code, number < 1000))
+        parts, results = self.post_lines('\n'.join(lines) + '\n')
+        # Результаты отправляются по пачкам, не дожидаясь конца тела
+        self.assertGreaterEqual(len(parts), 3)
+        summary = results.pop()
+        self.assertEqual(
+            [(result['index'], result['element_code'], result['valid'])
+             for result in results],
+            [(index, code, valid)
+             for index, (code, valid) in enumerate(expected)])
+        valid = sum(valid for _, valid in expected)
+        self.assertEqual(summary, {'summary': {
+            'valid': valid, 'invalid': len(expected) - valid}})
+
+    def test_unreadable_body(self):
+        body = (json.dumps({'element_code': 'A1', 'value': 'value 1'}) +
+                '\n').encode() + b'\xff\xfe\n'
+        _, results = self.post_lines(body)
+        self.assertEqual(results[0], {'index': 0, 'element_code': 'A1',
+                                      'valid': True})
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2],
+                         {'summary': {'valid': 1, 'invalid': 0}})
+
+    def test_unknown_guide(self):
+        response = self.client.post(
+            '/api/get-elements?name=missing',
+            json.dumps({'element_code': 'A1', 'value': 'value 1'}),
+            content_type='application/x-ndjson')
+        results = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual(results, [
+            {'index': 0, 'element_code': 'A1', 'valid': False},
+            {'summary': {'valid': 0, 'invalid': 1}}])
@@ -0,0 +1,99 @@
+import io
+
+from django.db.models import RestrictedError
+from rest_framework.test import APIClient
+
+from guide.importers import REMOVED, import_elements, iter_csv_rows
+from guide.models import Guide
+from guide.services import guide_elements
+from guide.tests.base import GuideTestCase, create_guide
+from guide.versions import compact_guides, flatten_guide
+
+
+class DeltaVersionTests(GuideTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.base = create_guide('icd', '1', [('A1', 'one'), ('A2', 'two'),
+                                              ('A3', 'three')])
+        self.derived = create_guide('icd', '2', [('A2', 'two v2'),
+                                                 ('A4', 'four')],
+                                    base=self.base)
+
+    def elements(self, guide):
+        guide.refresh_from_db()
+        return dict(guide_elements(guide).values_list('element_code',
+                                                      'value'))
+
+    def test_derived_version_overrides_base(self):
+        self.assertEqual(self.elements(self.derived), {
+            'A1': 'one', 'A2': 'two v2', 'A3': 'three', 'A4': 'four'})
+        self.assertEqual(self.elements(self.base), {
+            'A1': 'one', 'A2': 'two', 'A3': 'three'})
+
+    def test_chain_of_versions(self):
+        third = create_guide('icd', '3', [('A1', 'one v3')],
+                             base=self.derived)
+        self.assertEqual(self.elements(third), {
+            'A1': 'one v3', 'A2': 'two v2', 'A3': 'three', 'A4': 'four'})
+
+    def test_import_removes_inherited_element(self):
+        result = import_elements(self.derived, [('A1', REMOVED),
+                                                ('missing', REMOVED)])
+        self.assertEqual(result, {'inserted': 0, 'updated': 0,
+                                  'removed': 1, 'rejected': 0})
+        self.assertNotIn('A1', self.elements(self.derived))
+        self.assertIn('A1', self.elements(self.base))
+        # Повторная загрузка кода отменяет удаление
+        import_elements(self.derived, [('A1', 'back')])
+        self.assertEqual(self.elements(self.derived)['A1'], 'back')
+
+    def test_removal_hides_element_in_later_versions(self):
+        third = create_guide('icd', '3', base=self.derived)
+        import_elements(self.derived, [('A3', REMOVED)])
+        self.assertNotIn('A3', self.elements(third))
+
+    def test_import_counts_inherited_codes_as_inserted(self):
+        result = import_elements(self.derived, [
+            ('A1', 'one v2'), ('A2', 'two v2 again'), ('A5', 'five')])
+        self.assertEqual(result, {'inserted': 2, 'updated': 1,
+                                  'removed': 0, 'rejected': 0})
+
+    def test_import_endpoint_removal_rows(self):
+        body = ('{"element_code": "A1", "removed": true}\n'
+                '{"element_code": "A6", "value": "six"}\n')
+        response = APIClient().post(
+            '/api/import-elements?name=icd&version=2', body,
+            content_type='application/x-ndjson')
+        self.assertEqual(response.json(), {'inserted': 1, 'updated': 0,
+                                           'removed': 1, 'rejected': 0})
+        self.assertNotIn('A1', self.elements(self.derived))
+
+    def test_csv_removal_column(self):
+        rows = list(iter_csv_rows(
+            io.StringIO('element_code,value,removed\nA1,,1\nA2,x,0\n'),
+            removals=True))
+        self.assertEqual(rows, [('A1', REMOVED), ('A2', 'x')])
+
+    def test_flatten_keeps_elements(self):
+        import_elements(self.derived, [('A3', REMOVED)])
+        expected = self.elements(self.derived)
+        flatten_guide(self.derived)
+        self.derived.refresh_from_db()
+        self.assertIsNone(self.derived.base_id)
+        self.assertEqual(self.elements(self.derived), expected)
+
+    def test_compact_long_chains(self):
+        guide = self.derived
+        for version in range(3, 6):
+            guide = create_guide('icd', str(version), base=guide)
+        expected = self.elements(guide)
+        flattened = compact_guides(max_depth=2)
+        self.assertEqual([item.version for item in flattened], ['4'])
+        self.assertEqual(self.elements(guide), expected)
+
+    def test_delete_chain(self):
+        with self.assertRaises(RestrictedError):
+            self.base.delete()
+        Guide.objects.filter(pk__in=[self.base.pk, self.derived.pk]).delete()
+        self.assertFalse(Guide.objects.exists())
@@ -1,14 +1,29 @@
 from django.urls import path
 
+from guide.async_views import AsyncGuideElementsList, AsyncGuideList
 from guide.views import (EnterGuideElementView, EnterGuideView,
-                         GuideElementsList, GuideElementsListView, GuideList,
-                         GuideListView)
+                         GuideChanges, GuideElementsBatch, GuideElementsDiff,
+                         GuideElementsExport, GuideElementsImport,
+                         GuideElementsList, GuideElementsListView,
+                         GuideElementsSearch, GuideList, GuideListView,
+                         JobDetail, JobList, JobResult)
 
 app_name = 'guide'
 
 urlpatterns = [
     path('api/get-guides', GuideList.as_view()),
     path('api/get-elements', GuideElementsList.as_view()),
+    path('api/async/get-guides', AsyncGuideList.as_view()),
+    path('api/async/get-elements', AsyncGuideElementsList.as_view()),
+    path('api/check-elements', GuideElementsBatch.as_view()),
+    path('api/import-elements', GuideElementsImport.as_view()),
+    path('api/export-elements', GuideElementsExport.as_view()),
+    path('api/search-elements', GuideElementsSearch.as_view()),
+    path('api/diff-elements', GuideElementsDiff.as_view()),
+    path('api/changes', GuideChanges.as_view()),
+    path('api/jobs', JobList.as_view()),
+    path('api/jobs/<int:job_pk>', JobDetail.as_view()),
+    path('api/jobs/<int:job_pk>/result', JobResult.as_view()),
     path('', GuideListView.as_view(), name='guide_table'),
     path('enter-guide', EnterGuideView.as_view(), name='enter_guide'),
     path('guide-elements/<int:guide_pk>',
@@ -0,0 +1,36 @@
+import json
+
+from guide.services import VALIDATION_CHUNK_SIZE, validate_rows
+
+
+def _until_error(rows, errors):
+    # Ошибка чтения тела запроса завершает проверку, но элементы,
+    # прочитанные до нее, проверяются и попадают в ответ
+    try:
+        yield from rows
+    except (UnicodeDecodeError, OSError) as e:
+        errors.append(str(e))
+
+
+def validation_lines(guide, rows, batch_size=VALIDATION_CHUNK_SIZE):
+    """
+    Возвращает итератор строк NDJSON с результатами validate_rows, по
+    фрагменту на пачку. Последняя строка - итог
+    {"summary": {"valid": 0, "invalid": 0}}; если тело запроса не удалось
+    дочитать, перед итогом передается строка {"error": "..."}.
+    """
+    summary = {'valid': 0, 'invalid': 0}
+    errors = []
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    chunk = []
+    for result in validate_rows(guide, _until_error(rows, errors),
+                                batch_size):
+        summary['valid' if result['valid'] else 'invalid'] += 1
+        chunk.append(dumps(result) + '\n')
+        if len(chunk) >= batch_size:
+            yield ''.join(chunk)
+            chunk = []
+    for error in errors:
+        chunk.append(dumps({'error': error}) + '\n')
+    chunk.append(dumps({'summary': summary}) + '\n')
+    yield ''.join(chunk)
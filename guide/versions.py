@@ -0,0 +1,69 @@
+from django.db import transaction
+
+from guide.changes import record_elements, record_guide
+from guide.importers import IMPORT_BATCH_SIZE
+from guide.models import Guide, GuideElement
+from guide.services import elements_changed, guide_elements
+from guide.sharding import element_objects, guide_database
+
+# Длина цепочки базовых версий, после которой версия сворачивается
+# командой compact_guides
+MAX_CHAIN_DEPTH = 4
+
+
+def flatten_guide(guide, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Копирует в версию guide унаследованные элементы, удаляет отметки
+    удаления и отвязывает ее от базовой версии. Элементы версии для
+    чтения не меняются. Возвращает число скопированных элементов.
+    """
+    with transaction.atomic(using=guide_database(guide)), \
+            transaction.atomic():
+        guide = Guide.objects.select_for_update().get(pk=guide.pk)
+        if guide.base_id is None:
+            return 0
+        # Список читается целиком до вставки, так как вставка меняет
+        # результат запроса унаследованных элементов
+        inherited = list(guide_elements(guide).exclude(
+            guide=guide).values_list('element_code', 'value'))
+        for start in range(0, len(inherited), batch_size):
+            element_objects(guide).bulk_create(
+                GuideElement(guide=guide, element_code=code, value=value)
+                for code, value in inherited[start:start + batch_size])
+        record_elements(guide.pk, [code for code, _ in inherited])
+        element_objects(guide).filter(guide=guide, removed=True).delete()
+        Guide.objects.filter(pk=guide.pk).update(base=None)
+        record_guide(guide.pk)
+        elements_changed(guide.pk)
+    return len(inherited)
+
+
+def compact_guides(max_depth=MAX_CHAIN_DEPTH, stdout=None):
+    """
+    Сворачивает версии, элементы которых складываются из цепочки длиннее
+    max_depth базовых версий. Версии обходятся от коротких цепочек к
+    длинным, поэтому свернутая версия укорачивает цепочки построенных на
+    ней версий. Возвращает список свернутых версий.
+    """
+    bases = dict(Guide.objects.values_list('pk', 'base_id'))
+
+    def depth(pk):
+        seen = {pk}
+        while bases.get(pk) is not None and bases[pk] not in seen:
+            pk = bases[pk]
+            seen.add(pk)
+        return len(seen) - 1
+
+    flattened = []
+    for pk in sorted(bases, key=depth):
+        chain_depth = depth(pk)
+        if chain_depth <= max_depth:
+            continue
+        guide = Guide.objects.get(pk=pk)
+        count = flatten_guide(guide)
+        bases[pk] = None
+        flattened.append(guide)
+        if stdout is not None:
+            stdout.write(f'{guide}: скопировано {count} элементов '
+                         f'из {chain_depth} базовых версий')
+    return flattened
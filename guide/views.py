@@ -1,28 +1,95 @@
-import datetime as dt
+import csv
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.paginator import Paginator
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import redirect
+from django.utils import timezone
 from django.views.generic import FormView, ListView
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from guide.changes import changes_after
+from guide.conditional import conditional_get, guide_stamp, guides_list_stamp
+from guide.diff import diff_lines
 from guide.exceptions import UrlParamMissing
+from guide.exporters import EXPORT_FORMATS, export_elements
 from guide.filters import GuideElementFilter, GuideFilter
 from guide.forms import GuideElementEnterForm, GuideEnterForm
-from guide.models import Guide, GuideElement
-from guide.serializers import GuideElementSerializer, GuideSerializer
+from guide.importers import ROW_READERS, import_elements, iter_ndjson_rows
+from guide.jobs import (JOB_HANDLERS, cancel_job, export_path,
+                        load_progress, save_job_input, submit_job)
+from guide.models import Guide, GuideElement, Job
+from guide.page_cache import CachedPageMixin
+from guide.paginators import (KeysetPaginator, OptInCursorPagination,
+                              StandardResultsSetPagination, is_cursor_mode)
+from guide.renderers import (COMPACT_RENDERERS, FastJSONRenderer,
+                             is_fast_read)
+from guide.search import search_elements
+from guide.serializers import (ChangesQuerySerializer,
+                               GuideElementSearchSerializer,
+                               GuideElementSerializer, GuideSerializer,
+                               JobSerializer, RowEncoder)
+from guide.services import (actual_guides, base_chain, check_elements_batch,
+                            elements_changed, get_guide_source,
+                            guide_elements, resolve_guide,
+                            validate_elements)
+from guide.sharding import element_objects, guide_database
+from guide.validation import validation_lines
 
 
-class GuideList(generics.GenericAPIView):
+class FastReadMixin:
+    """
+    Быстрый путь GET-запросов: строки выбираются через values_list,
+    преобразуются в словари RowEncoder и рендерятся FastJSONRenderer.
+    Ответ совпадает с ответом обычного пути. Курсорная разбивка читает
+    позицию из экземпляров модели, поэтому в этом режиме быстрый путь
+    не используется.
+    """
+    row_encoder = None
+
+    def use_fast_read(self):
+        return (is_fast_read(self.request) and
+                not is_cursor_mode(self.request))
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.use_fast_read():
+            return renderers
+        return [FastJSONRenderer()] + [
+            renderer for renderer in renderers
+            if renderer.format != FastJSONRenderer.format]
+
+    def fast_response(self, source):
+        rows = source.values_list(*self.row_encoder.columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                self.row_encoder.encode_many(page))
+        return Response(self.row_encoder.encode_many(rows))
+
+
+class GuideList(FastReadMixin, generics.GenericAPIView):
     """
     Получение списка справочников.
     """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES,
+                        *COMPACT_RENDERERS]
     serializer_class = GuideSerializer
+    pagination_class = OptInCursorPagination
+    row_encoder = RowEncoder(GuideSerializer)
 
     def get_queryset(self, **kwargs):
         return Guide.objects.filter(**kwargs).order_by('id')
 
+    def get_change_stamp(self):
+        date = self.request.query_params.get('date', None)
+        if date == 'actual':
+            date = timezone.localdate()
+        return guides_list_stamp(date)
+
+    @conditional_get
     def get(self, request):
         """
         На GET запрос без параметров присылает список всех справочников.
@@ -36,23 +103,14 @@ class GuideList(generics.GenericAPIView):
             queryset = self.get_queryset()
         else:
             if date == 'actual':
-                date = dt.date.today()
+                date = timezone.localdate()
             try:
-                elems_pk = []
-                # Получаем список уникальных наименований справочников
-                names_unique = Guide.objects.values_list('name').distinct()
-                for name in names_unique:
-                    # Получаем по одному актуальные справочники по
-                    # наименованию и дате начала действия
-                    elem = Guide.objects.filter(
-                        name=name[0], start_date__lte=date
-                    ).latest('start_date')
-                    # Записываем ID полученных справочников
-                    elems_pk.append(elem.pk)
-                queryset = self.get_queryset(pk__in=elems_pk)
+                queryset = actual_guides(date).order_by('id')
             except ValidationError as e:
                 return Response({"error": e},
                                 status=status.HTTP_400_BAD_REQUEST)
+        if self.use_fast_read():
+            return self.fast_response(queryset)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -62,28 +120,42 @@ class GuideList(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class GuideElementsList(generics.GenericAPIView):
+class GuideElementsList(FastReadMixin, generics.GenericAPIView):
     """
     Получение элементов заданного справочника.
     """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES,
+                        *COMPACT_RENDERERS]
     serializer_class = GuideElementSerializer
+    pagination_class = OptInCursorPagination
+    row_encoder = RowEncoder(GuideElementSerializer)
 
-    def get_queryset(self):
+    # Справочник, найденный при проверке условного запроса
+    resolved_guide = None
+
+    def get_guide(self):
+        if self.resolved_guide is not None:
+            return self.resolved_guide
         guide_name = self.request.query_params.get('name', None)
         if guide_name is None:
             raise UrlParamMissing
         version = self.request.query_params.get('version', None)
-        if version is not None:
-            queryset = GuideElement.objects.filter(
-                guide__version=version, guide__name=guide_name)
-        else:
-            actual_guide = Guide.objects.filter(
-                start_date__lte=dt.date.today(),
-                name=guide_name
-            ).latest('start_date')
-            queryset = GuideElement.objects.filter(guide=actual_guide)
-        return queryset.order_by('id')
+        return resolve_guide(guide_name, version)
+
+    def get_change_stamp(self):
+        guide_name = self.request.query_params.get('name', None)
+        if guide_name is None:
+            return None
+        version = self.request.query_params.get('version', None)
+        self.resolved_guide = resolve_guide(guide_name, version)
+        return guide_stamp(self.resolved_guide, version is not None)
 
+    def get_queryset(self):
+        # Страницы читаются из базы: кэш процесса хранит только коды для
+        # проверки элементов
+        return guide_elements(self.get_guide()).order_by('id')
+
+    @conditional_get
     def get(self, request):
         """
         На GET запрос с url-параметром ?name=<Имя справочника> присылает все
@@ -93,6 +165,8 @@ class GuideElementsList(generics.GenericAPIView):
         """
         try:
             queryset = self.get_queryset()
+            if self.use_fast_read():
+                return self.fast_response(queryset)
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
@@ -114,51 +188,439 @@ class GuideElementsList(generics.GenericAPIView):
         Либо по одному:
         {"element_code":"Код элемента",
          "value":"Значение элемента"}
+        С Content-Type application/x-ndjson элементы передаются по объекту
+        на строку и проверяются по мере чтения тела запроса, а результаты
+        присылаются в формате NDJSON по строке на элемент:
+        {"index": 0, "element_code": "Код элемента", "valid": true}
+        Последняя строка содержит итог {"summary": {"valid": 0,
+        "invalid": 0}}.
         """
-        result_data = {}
+        guide_name = self.request.query_params.get('name', None)
+        if guide_name is None:
+            return Response({"error": "Не указан url-параметр name"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Справочник определяется один раз на весь запрос
+        guide = get_guide_source(
+            guide_name, self.request.query_params.get('version', None),
+            lookup=True)
+        if (request.content_type or '').startswith('application/x-ndjson'):
+            # Тело запроса не разбирается целиком: строки читаются по мере
+            # проверки
+            rows = iter_ndjson_rows(request.stream or [])
+            return StreamingHttpResponse(
+                validation_lines(guide, rows),
+                content_type='application/x-ndjson; charset=utf-8')
         if isinstance(request.data, list):
-            index = 0
-            for elem in request.data:
-                if (
-                    elem.get('element_code') is not None and
-                    elem.get('value') is not None
-                ):
-                    result_data = result_data | {
-                        index: self.get_queryset().filter(
-                            element_code=elem.get('element_code'),
-                            value=elem.get('value')
-                        ).exists()}
-                    index += 1
-                else:
-                    result_data = result_data | {index: False}
-                    index += 1
+            result_data = validate_elements(guide, request.data)
         else:
-            result_data = {0: self.get_queryset().filter(
-                element_code=request.data.get('element_code'),
-                value=request.data.get('value')
-            ).exists()}
+            result_data = validate_elements(guide, [request.data])
         return Response(result_data, status=status.HTTP_200_OK)
 
 
-class GuideListView(ListView):
-    model = Guide
-    filterset_class = GuideFilter
-    queryset = Guide.objects.order_by('pk')
-    template_name = 'guide_table.html'
+class GuideElementsBatch(generics.GenericAPIView):
+    """
+    Проверка элементов нескольких справочников одним запросом.
+    """
+
+    def post(self, request):
+        """
+        На POST запрос проверяет наличие элементов в справочниках, указанных
+        в самих элементах. Версия или дата актуальности необязательны, без
+        них используется актуальная на сегодня версия:
+        [{"name": "Имя справочника", "version": "version",
+          "element_code": "Код элемента", "value": "Значение элемента"},
+         {"name": "Имя справочника", "date": "YYYY-MM-DD",
+          "element_code": "Код элемента", "value": "Значение элемента"},...]
+        Присылает {индекс элемента: результат проверки}.
+        С url-параметром ?mode=resolve value не требуется, а ответ
+        содержит {индекс элемента: значение элемента с этим кодом или null}.
+        """
+        mode = request.query_params.get('mode', 'validate')
+        if mode not in ('validate', 'resolve'):
+            return Response(
+                {"error": "Параметр mode должен быть validate или resolve"},
+                status=status.HTTP_400_BAD_REQUEST)
+        items = request.data if isinstance(request.data, list) else [
+            request.data]
+        try:
+            result_data = check_elements_batch(items, mode == 'resolve')
+        except ValidationError as e:
+            return Response({"error": e.message},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(result_data, status=status.HTTP_200_OK)
+
+
+class GuideChanges(generics.GenericAPIView):
+    """
+    Журнал изменений справочников и элементов для инкрементальной
+    синхронизации.
+    """
+
+    def get(self, request):
+        """
+        На GET запрос с url-параметром ?after=<токен> присылает изменения
+        после токена (без параметра - с начала журнала), не более limit:
+        {"changes": [{"entity": "guide" | "element",
+                      "action": "save" | "delete",
+                      "id": id объекта, "guide": id справочника,
+                      "data": {...} | null}, ...],
+         "next": "токен", "has_more": true | false}
+        data содержит поля объекта после изменения. Элемент определяется
+        парой guide и id. Удаление справочника означает и удаление всех
+        его элементов. Следующий запрос выполняется с after из next.
+        """
+        query = ChangesQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes, token, has_more = changes_after(
+            query.validated_data.get('after', None),
+            query.validated_data.get('limit', None))
+        return Response({'changes': changes, 'next': token,
+                         'has_more': has_more})
+
+
+class ElementsUploadMixin:
+    """
+    Чтение загружаемых элементов из тела запроса или поля file формы.
+    """
+
+    def get_guide(self):
+        guide_name = self.request.query_params.get('name', None)
+        version = self.request.query_params.get('version', None)
+        if guide_name is None or version is None:
+            raise UrlParamMissing
+        return resolve_guide(guide_name, version)
+
+    def get_file_format(self):
+        file_format = self.request.query_params.get('file_format', None)
+        if file_format is not None:
+            return file_format
+        content_type = self.request.content_type or ''
+        if 'csv' in content_type:
+            return 'csv'
+        upload = self.request.FILES.get('file') if (
+            content_type.startswith('multipart/form-data')) else None
+        if upload is not None and upload.name.endswith('.csv'):
+            return 'csv'
+        return 'ndjson'
+
+    def get_lines(self):
+        # Файл из формы уже сохранен Django во временный файл, тело запроса
+        # читается построчно, не загружаясь в память целиком
+        if (self.request.content_type or '').startswith(
+                'multipart/form-data'):
+            return self.request.FILES.get('file') or []
+        return self.request.stream or []
+
+
+class GuideElementsImport(ElementsUploadMixin, generics.GenericAPIView):
+    """
+    Загрузка элементов в заданную версию справочника.
+    """
+
+    def post(self, request):
+        """
+        На POST запрос с параметрами ?name=<Имя справочника>&version=<version>
+        загружает элементы в указанную версию справочника. Существующие
+        элементы с тем же кодом обновляются.
+        Элементы передаются в теле запроса или в поле file формы в виде
+        CSV (колонки element_code,value) или NDJSON (по объекту
+        {"element_code":"Код элемента", "value":"Значение элемента"}
+        на строку). Формат задается параметром file_format=csv|ndjson,
+        иначе определяется по Content-Type.
+        Строка {"element_code":"Код элемента", "removed": true} (в CSV -
+        значение 1 в третьей колонке removed) удаляет элемент из версии.
+        """
+        try:
+            guide = self.get_guide()
+        except UrlParamMissing:
+            return Response(
+                {"error": "Не указаны url-параметры name и version"},
+                status=status.HTTP_400_BAD_REQUEST)
+        if guide is None:
+            return Response({"error": "Справочник не найден"},
+                            status=status.HTTP_404_NOT_FOUND)
+        reader = ROW_READERS.get(self.get_file_format())
+        if reader is None:
+            return Response({"error": "Неизвестный формат файла"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result_data = import_elements(
+                guide, reader(self.get_lines(), removals=True))
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(result_data, status=status.HTTP_200_OK)
+
+
+class GuideElementsExport(generics.GenericAPIView):
+    """
+    Потоковая выгрузка всех элементов заданного справочника.
+    """
+
+    def get(self, request):
+        """
+        На GET запрос с url-параметром ?name=<Имя справочника> выгружает все
+        элементы справочника "Имя справочника" актуальной версии, с
+        параметром version - указанной версии.
+        Формат задается параметром file_format=ndjson|csv (по умолчанию
+        ndjson). Постраничная разбивка не применяется.
+        """
+        guide_name = request.query_params.get('name', None)
+        if guide_name is None:
+            return Response({"error": "Не указан url-параметр name"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"error": "Неизвестный формат файла"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        guide = resolve_guide(guide_name,
+                              request.query_params.get('version', None))
+        if guide is None:
+            return Response({"error": "Справочник не найден"},
+                            status=status.HTTP_404_NOT_FOUND)
+        _, content_type = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            export_elements(guide, file_format), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="guide-{guide.pk}.{file_format}"')
+        return response
+
+
+class JobList(ElementsUploadMixin, generics.GenericAPIView):
+    """
+    Постановка фоновой задачи в очередь.
+    """
+    serializer_class = JobSerializer
+
+    # Методы get_<тип>_params возвращают параметры задачи и оценку объема
+    # работы или ответ с ошибкой
+
+    def get_import_params(self):
+        try:
+            guide = self.get_guide()
+        except UrlParamMissing:
+            return Response(
+                {"error": "Не указаны url-параметры name и version"},
+                status=status.HTTP_400_BAD_REQUEST)
+        file_format = self.get_file_format()
+        if guide is None:
+            return Response({"error": "Справочник не найден"},
+                            status=status.HTTP_404_NOT_FOUND)
+        if file_format not in ROW_READERS:
+            return Response({"error": "Неизвестный формат файла"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        path, lines = save_job_input(self.get_lines())
+        return {'guide': guide.pk, 'file_format': file_format,
+                'input': path}, lines
+
+    def get_export_params(self):
+        params = self.request.query_params
+        guide_name = params.get('name', None)
+        if guide_name is None:
+            return Response({"error": "Не указан url-параметр name"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        file_format = params.get('file_format', 'ndjson')
+        if file_format not in EXPORT_FORMATS:
+            return Response({"error": "Неизвестный формат файла"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        guide = resolve_guide(guide_name, params.get('version', None))
+        if guide is None:
+            return Response({"error": "Справочник не найден"},
+                            status=status.HTTP_404_NOT_FOUND)
+        return {'guide': guide.pk, 'file_format': file_format}, None
+
+    def get_snapshots_params(self):
+        return {'name': self.request.query_params.get('name', None)}, None
+
+    def get_search_index_params(self):
+        return {}, None
+
+    def post(self, request):
+        """
+        На POST запрос с url-параметром ?kind=<тип> ставит задачу в очередь
+        и присылает ее состояние. Типы задач:
+        import - загрузка элементов, параметры и тело запроса как у
+        api/import-elements;
+        export - выгрузка элементов, параметры как у api/export-elements;
+        snapshots - пересборка снимков справочников (всех или с
+        наименованием из параметра name);
+        search_index - пересборка индекса поиска.
+        Состояние задачи доступно по адресу из заголовка Location.
+        """
+        kind = request.query_params.get('kind', None)
+        get_params = getattr(self, f'get_{kind}_params', None)
+        if kind not in JOB_HANDLERS or get_params is None:
+            return Response({"error": "Неизвестный тип задачи"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        job_params = get_params()
+        if isinstance(job_params, Response):
+            return job_params
+        job = submit_job(kind, *job_params)
+        return Response(self.get_serializer(job).data,
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': f'/api/jobs/{job.pk}'})
+
+
+class JobDetail(generics.GenericAPIView):
+    """
+    Состояние и отмена фоновой задачи.
+    """
+    serializer_class = JobSerializer
+    queryset = Job.objects.all()
+    lookup_url_kwarg = 'job_pk'
+
+    def get(self, request, job_pk):
+        """
+        На GET запрос присылает состояние задачи: status
+        (queued, running, done, failed, cancelled), число обработанных
+        строк processed из total и оценку оставшегося времени eta_seconds.
+        """
+        job = load_progress(self.get_object())
+        return Response(self.get_serializer(job).data)
+
+    def delete(self, request, job_pk):
+        """
+        На DELETE запрос отменяет задачу. Задача из очереди отменяется
+        сразу, выполняемая - в течение нескольких секунд.
+        """
+        job = cancel_job(self.get_object())
+        return Response(self.get_serializer(job).data)
+
+
+class JobResult(generics.GenericAPIView):
+    """
+    Результат фоновой задачи.
+    """
+    queryset = Job.objects.all()
+    lookup_url_kwarg = 'job_pk'
+
+    def get(self, request, job_pk):
+        """
+        На GET запрос присылает результат выполненной задачи: для выгрузки -
+        файл выгрузки, для остальных задач - итоговую статистику.
+        """
+        job = self.get_object()
+        if job.status != Job.DONE:
+            return Response({"error": "Задача не выполнена"},
+                            status=status.HTTP_409_CONFLICT)
+        if job.kind != 'export':
+            return Response(job.result)
+        _, content_type = EXPORT_FORMATS[job.params['file_format']]
+        try:
+            source = open(export_path(job), 'rb')
+        except FileNotFoundError:
+            return Response({"error": "Файл выгрузки удален"},
+                            status=status.HTTP_410_GONE)
+        return FileResponse(source, content_type=content_type,
+                            as_attachment=True,
+                            filename=export_path(job).name)
+
+
+class GuideElementsDiff(generics.GenericAPIView):
+    """
+    Изменения элементов между двумя версиями справочника.
+    """
+
+    def get(self, request):
+        """
+        На GET запрос с параметрами ?name=<Имя справочника>&from_version=<v1>
+        &to_version=<v2> присылает в формате NDJSON добавленные, удаленные
+        и измененные элементы версии v2 относительно версии v1, по строке
+        на элемент:
+        {"change": "added", "element_code": "Код", "value": "Значение"}
+        {"change": "removed", "element_code": "Код", "value": "Значение"}
+        {"change": "changed", "element_code": "Код",
+         "old_value": "Старое значение", "value": "Новое значение"}
+        Последняя строка содержит итог {"summary": {...}}.
+        Без to_version сравнение выполняется с актуальной версией.
+        """
+        guide_name = request.query_params.get('name', None)
+        from_version = request.query_params.get('from_version', None)
+        if guide_name is None or from_version is None:
+            return Response(
+                {"error": "Не указаны url-параметры name и from_version"},
+                status=status.HTTP_400_BAD_REQUEST)
+        old_guide = resolve_guide(guide_name, from_version)
+        new_guide = resolve_guide(
+            guide_name, request.query_params.get('to_version', None))
+        if old_guide is None or new_guide is None:
+            return Response({"error": "Справочник не найден"},
+                            status=status.HTTP_404_NOT_FOUND)
+        return StreamingHttpResponse(
+            diff_lines(old_guide, new_guide),
+            content_type='application/x-ndjson; charset=utf-8')
+
+
+class GuideElementsSearch(generics.GenericAPIView):
+    """
+    Поиск элементов заданного справочника по подстроке.
+    """
+    serializer_class = GuideElementSearchSerializer
+    pagination_class = StandardResultsSetPagination
+
+    def get(self, request):
+        """
+        На GET запрос с url-параметрами ?name=<Имя справочника>&q=<строка>
+        присылает элементы справочника актуальной версии (или версии из
+        параметра version), код или значение которых содержит строку.
+        Результаты упорядочены по релевантности (поле rank): точное
+        совпадение кода, совпадение начала кода, вхождение в код,
+        совпадение начала значения, вхождение в значение.
+        С параметром match=prefix ищутся только совпадения по началу кода
+        или значения.
+        """
+        guide_name = request.query_params.get('name', None)
+        term = request.query_params.get('q', None)
+        if guide_name is None or not term:
+            return Response({"error": "Не указаны url-параметры name и q"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        guide = resolve_guide(guide_name,
+                              request.query_params.get('version', None))
+        queryset = search_elements(
+            guide_elements(guide), term,
+            prefix=request.query_params.get('match') == 'prefix')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class TablePaginationMixin:
+    """
+    Постраничная разбивка HTML-таблиц. По умолчанию - по номеру страницы,
+    при url-параметре ?pagination=cursor - курсорная по pk без COUNT(*).
+    """
+    table_page_size = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        guides = self.get_queryset()
-        paginator = Paginator(guides, 10)
-        page_number = self.request.GET.get('page', 1)
-        page = paginator.get_page(page_number)
-        page_range = paginator.get_elided_page_range(number=page_number)
+        if is_cursor_mode(self.request):
+            paginator = KeysetPaginator(self.object_list,
+                                        self.table_page_size)
+            page = paginator.get_page(after=self.request.GET.get('after'),
+                                      before=self.request.GET.get('before'))
+            context['keyset'] = True
+        else:
+            paginator = Paginator(self.object_list, self.table_page_size)
+            page_number = self.request.GET.get('page', 1)
+            page = paginator.get_page(page_number)
+            context['page_range'] = paginator.get_elided_page_range(
+                number=page.number)
         context['page'] = page
-        context['page_range'] = page_range
         context['paginator'] = paginator
         context['filter'] = self.filter
         return context
 
+
+class GuideListView(CachedPageMixin, TablePaginationMixin, ListView):
+    model = Guide
+    filterset_class = GuideFilter
+    queryset = Guide.objects.order_by('pk')
+    template_name = 'guide_table.html'
+
+    def get_change_stamp(self):
+        return guides_list_stamp()
+
     def get_queryset(self):
         qs = super().get_queryset()
         self.filter = self.filterset_class(self.request.GET, queryset=qs)
@@ -174,6 +636,20 @@ class EnterGuideView(FormView):
     form_class = GuideEnterForm
 
     def form_valid(self, form):
+        base = form.cleaned_data.get('base')
+        existing = Guide.objects.filter(
+            version=form.cleaned_data.get('version'),
+            name=form.cleaned_data.get('name')).first()
+        if base is not None and existing is not None and (
+                existing.pk in base_chain(base)):
+            form.add_error('base', 'Версия не может быть построена на себе')
+            return self.form_invalid(form)
+        if base is not None and existing is not None and (
+                guide_database(base) != guide_database(existing)):
+            # Элементы цепочки версий выбираются одним запросом к одной базе
+            form.add_error('base',
+                           'Базовая версия хранится в другой базе элементов')
+            return self.form_invalid(form)
         guide, _ = Guide.objects.update_or_create(
             version=form.cleaned_data.get('version'),
             name=form.cleaned_data.get('name'),
@@ -181,34 +657,37 @@ class EnterGuideView(FormView):
                 'short_name': form.cleaned_data.get('short_name'),
                 'description': form.cleaned_data.get('description'),
                 'start_date': form.cleaned_data.get('start_date'),
+                'base': base,
             }
         )
-        guide.save()
+        if existing is not None and existing.base_id != guide.base_id:
+            elements_changed(guide.pk)
         return redirect('guide:guide_table')
 
 
-class GuideElementsListView(ListView):
+class GuideElementsListView(CachedPageMixin, TablePaginationMixin,
+                            ListView):
     model = GuideElement
     filterset_class = GuideElementFilter
-    queryset = GuideElement.objects.order_by('pk')
     template_name = 'guide_element_table.html'
+    guide = None
+
+    def get_guide(self):
+        if self.guide is None:
+            self.guide = Guide.objects.filter(
+                pk=self.kwargs.get('guide_pk')).first()
+        return self.guide
+
+    def get_change_stamp(self):
+        return guide_stamp(self.get_guide(), versioned=False)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        guides = self.get_queryset()
-        paginator = Paginator(guides, 10)
-        page_number = self.request.GET.get('page', 1)
-        page = paginator.get_page(page_number)
-        page_range = paginator.get_elided_page_range(number=page_number)
-        context['page'] = page
-        context['page_range'] = page_range
-        context['paginator'] = paginator
-        context['filter'] = self.filter
         context['guide_pk'] = self.kwargs.get('guide_pk')
         return context
 
     def get_queryset(self):
-        qs = self.queryset.filter(guide__pk=self.kwargs.get('guide_pk'))
+        qs = guide_elements(self.get_guide()).order_by('pk')
         self.filter = self.filterset_class(self.request.GET, queryset=qs)
         return self.filter.qs
 
@@ -223,14 +702,15 @@ class EnterGuideElementView(FormView):
 
     def form_valid(self, form):
         try:
-            element, _ = GuideElement.objects.update_or_create(
-                guide=Guide.objects.get(pk=self.kwargs.get('guide_pk')),
+            guide = Guide.objects.get(pk=self.kwargs.get('guide_pk'))
+            element_objects(guide).update_or_create(
+                guide=guide,
                 element_code=form.cleaned_data.get('element_code'),
                 defaults={
                     'value': form.cleaned_data.get('value'),
+                    'removed': False,
                 }
             )
-            element.save()
             return redirect('guide:guide_elements_table',
                             self.kwargs.get('guide_pk'))
         except ObjectDoesNotExist:
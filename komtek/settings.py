@@ -35,6 +35,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'guide.routers.ReplicaPinMiddleware',
+    'guide.metrics.MetricsMiddleware',
+    'guide.profiling.ProfilingMiddleware',
+    'guide.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -47,12 +51,21 @@ ROOT_URLCONF = 'komtek.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Скомпилированные шаблоны хранятся в памяти процесса
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader',
+                         TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -69,10 +82,74 @@ WSGI_APPLICATION = 'komtek.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Соединения переиспользуются между запросами и проверяются перед
+# повторным использованием
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Реплики для чтения. Для локальной проверки реплики заменяются копиями
+# SQLite-файла: GUIDE_SQLITE_REPLICAS=replica1.sqlite3,replica2.sqlite3,
+# копии обновляет команда sync_sqlite_replicas. Копии открываются только
+# для чтения.
+REPLICA_DATABASES = []
+for number, path in enumerate(
+        filter(None, os.environ.get('GUIDE_SQLITE_REPLICAS', '').split(',')),
+        start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{BASE_DIR / path.strip()}?mode=ro',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+# Шарды элементов справочников. Для локальной проверки шарды задаются
+# SQLite-файлами: GUIDE_SQLITE_SHARDS=shard1.sqlite3,shard2.sqlite3, таблица
+# элементов в них создается командой migrate --database shard1. Элементы
+# распределяются между default и перечисленными шардами. Файлы из
+# GUIDE_SQLITE_DRAINING_SHARDS (из того же списка) выводятся из работы:
+# rebalance_shards переносит из них элементы.
+SHARD_DATABASES = []
+DRAINING_SHARDS = []
+draining_paths = {path.strip() for path in os.environ.get(
+    'GUIDE_SQLITE_DRAINING_SHARDS', '').split(',')}
+for number, path in enumerate(
+        filter(None, os.environ.get('GUIDE_SQLITE_SHARDS', '').split(',')),
+        start=1):
+    alias = f'shard{number}'
+    if path.strip() in draining_paths:
+        DRAINING_SHARDS.append(alias)
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / path.strip(),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+    SHARD_DATABASES.append(alias)
+if SHARD_DATABASES:
+    SHARD_DATABASES.insert(0, 'default')
+
+DATABASE_ROUTERS = [
+    'guide.sharding.ShardRouter',
+    'guide.routers.PrimaryReplicaRouter',
+]
+
+# Кэш процесса. При нескольких рабочих процессах лучше указать общий кэш
+# (Redis, Memcached), чтобы страницы GUI отрисовывались один раз для всех.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'komtek',
     }
 }
 
@@ -126,3 +203,93 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
+
+# Кэш кодов и значений элементов для проверки в памяти процесса
+GUIDE_ELEMENTS_CACHE = {
+    'MAX_VERSIONS': 32,
+    'MAX_ELEMENTS': 200_000,
+    'TTL': 300,
+}
+
+# Заголовки Cache-Control для API справочников
+GUIDE_HTTP_CACHE = {
+    'VERSIONED_MAX_AGE': 300,
+    'MAX_AGE': 0,
+}
+
+# Файлы снимков справочников, общие для всех рабочих процессов. После
+# изменения справочника снимок пересобирает фоновая задача (run_jobs)
+GUIDE_SNAPSHOTS = {
+    'ENABLED': True,
+    'DIR': BASE_DIR / 'snapshots',
+    'AUTO_REBUILD': True,
+    'BLOOM_BITS_PER_ELEMENT': 10,
+}
+
+# Метрики Prometheus (/metrics). При нескольких рабочих процессах задайте
+# общий каталог MULTIPROCESS_DIR
+GUIDE_METRICS = {
+    'MULTIPROCESS_DIR': os.environ.get('GUIDE_METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,
+}
+
+# Быстрый путь чтения GET api/get-guides и api/get-elements: строки
+# выбираются через values_list и сериализуются orjson. Включается для всех
+# запросов или для отдельного запроса url-параметром ?fast=1
+GUIDE_FAST_READ = {
+    'ENABLED': False,
+}
+
+# Фоновые задачи (api/jobs), выполняются командой run_jobs
+GUIDE_JOBS = {
+    'DIR': BASE_DIR / 'jobs',
+    'POLL_INTERVAL': 1,
+    'STALE_AFTER': 300,
+}
+
+# Сжатие ответов gzip или zstd (если установлен zstandard)
+GUIDE_COMPRESSION = {
+    'MIN_SIZE': 512,
+    'GZIP_LEVEL': 6,
+    'ZSTD_LEVEL': 3,
+}
+
+# Журнал изменений для инкрементальной синхронизации (api/changes)
+GUIDE_CHANGES = {
+    'ENABLED': True,
+    'PAGE_SIZE': 1000,
+    'MAX_PAGE_SIZE': 10000,
+}
+
+# Кэш отрисованных страниц GUI, ключ содержит отметку изменения данных
+GUIDE_PAGE_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Чтение с реплик (см. DATABASES): выбор по кругу среди доступных,
+# после записи клиент PIN_SECONDS читает с основной базы
+GUIDE_REPLICAS = {
+    'DATABASES': REPLICA_DATABASES,
+    'CHECK_INTERVAL': 5,
+    'PIN_SECONDS': 5,
+}
+
+# Шардирование элементов (см. DATABASES): элементы справочника хранятся
+# в одной из баз DATABASES, версии на базовой - в базе базовой версии
+GUIDE_SHARDS = {
+    'DATABASES': SHARD_DATABASES,
+    'DRAINING': DRAINING_SHARDS,
+}
+
+# Профилирование запросов к guide: запрос с заголовком
+# X-Guide-Profile: <TOKEN> или случайная доля SAMPLE_RATE запросов.
+# Последние MAX_PROFILES профилей доступны персоналу на admin/profiles/
+GUIDE_PROFILING = {
+    'ENABLED': bool(os.environ.get('GUIDE_PROFILE_TOKEN')),
+    'DIR': BASE_DIR / 'profiles',
+    'TOKEN': os.environ.get('GUIDE_PROFILE_TOKEN'),
+    'SAMPLE_RATE': 0,
+    'MAX_PROFILES': 50,
+}
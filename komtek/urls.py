@@ -1,10 +1,23 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from guide.metrics import metrics_view
+from guide.profiling import (profile_stats_view, profile_view,
+                             profiles_view)
+
 from .yasg import urlpatterns as doc_urls
 
 urlpatterns = [
+    # Страницы профилей доступны только персоналу, как admin
+    path('admin/profiles/', admin.site.admin_view(profiles_view),
+         name='guide_profiles'),
+    path('admin/profiles/<str:profile_id>',
+         admin.site.admin_view(profile_view), name='guide_profile'),
+    path('admin/profiles/<str:profile_id>/stats',
+         admin.site.admin_view(profile_stats_view),
+         name='guide_profile_stats'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),
     path('', include('guide.urls'))
 ]
 